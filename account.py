@@ -0,0 +1,114 @@
+"""
+계좌 상태 스냅샷
+
+잔고/평단가를 통화별로 get_balance()를 여러 번 호출해 조회하는 대신
+get_balances() 한 번으로 전체 계좌를 받아 통화별로 색인해 둔다.
+스냅샷은 사이클 시작 시 한 번, 그리고 주문이 체결된 뒤에만 갱신하므로
+마켓 여러 개를 처리해도 사이클당 private API 호출은 주문 수 + 1회다.
+
+분할 주문처럼 오래 걸리는 주문은 실행 전에 금액을 예약해 두고, 다른 마켓은
+available()로 예약을 뺀 잔고를 기준으로 주문 금액을 정한다.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Holding:
+    currency: str
+    balance: float = 0.0
+    locked: float = 0.0
+    avg_buy_price: float = 0.0
+
+
+@dataclass(frozen=True)
+class AccountSnapshot:
+    holdings: dict = field(default_factory=dict)
+    fetched_at: float = 0.0
+
+    @classmethod
+    def from_balances(cls, balances):
+        """upbit.get_balances() 응답을 통화별로 색인"""
+        if not isinstance(balances, list):
+            raise ValueError(f"Unexpected get_balances() response: {balances}")
+        holdings = {
+            item["currency"]: Holding(
+                currency=item["currency"],
+                balance=float(item.get("balance") or 0),
+                locked=float(item.get("locked") or 0),
+                avg_buy_price=float(item.get("avg_buy_price") or 0),
+            )
+            for item in balances
+        }
+        return cls(holdings=holdings, fetched_at=time.time())
+
+    def holding(self, currency):
+        return self.holdings.get(currency) or Holding(currency=currency)
+
+    def balance(self, currency):
+        return self.holding(currency).balance
+
+    def avg_buy_price(self, currency):
+        return self.holding(currency).avg_buy_price
+
+    @property
+    def krw_balance(self):
+        return self.balance("KRW")
+
+
+class AccountState:
+    """
+    여러 마켓이 공유하는 계좌 스냅샷
+
+    snapshot()은 캐시된 스냅샷을 반환하고, 없으면 한 번만 조회한다.
+    invalidate()는 다음 사이클 시작 시, refresh()는 주문 체결 후에 호출한다.
+    """
+
+    def __init__(self, upbit_factory):
+        self._upbit_factory = upbit_factory
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._reserved = {}
+        self.fetch_count = 0
+
+    def _fetch(self):
+        snapshot = AccountSnapshot.from_balances(self._upbit_factory().get_balances())
+        self.fetch_count += 1
+        return snapshot
+
+    def snapshot(self):
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = self._fetch()
+            return self._snapshot
+
+    def refresh(self):
+        with self._lock:
+            self._snapshot = self._fetch()
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def available(self, snapshot, currency):
+        """snapshot의 잔고에서 실행 중인 주문이 예약한 금액을 뺀 값"""
+        with self._lock:
+            return max(0.0, snapshot.balance(currency) - self._reserved.get(currency, 0.0))
+
+    def reserve(self, currency, amount):
+        with self._lock:
+            self._reserved[currency] = self._reserved.get(currency, 0.0) + amount
+
+    def release(self, currency, amount):
+        with self._lock:
+            left = self._reserved.get(currency, 0.0) - amount
+            if left > 1e-9:
+                self._reserved[currency] = left
+            else:
+                self._reserved.pop(currency, None)
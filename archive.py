@@ -0,0 +1,199 @@
+"""
+거래 기록 아카이브
+
+trades 테이블은 하루 24행씩 계속 늘어나고 행마다 reason/reflection 텍스트가
+크게 붙어 있다. 가격/잔고 차트에는 숫자 컬럼만 필요하므로
+- 오래된 행은 월 단위 Parquet 파일로 옮기되 지표 컬럼과 텍스트 컬럼을 다른 파일에 저장하고
+- 긴 구간은 일별 포트폴리오 가치 OHLC로 줄여서 제공한다.
+
+Parquet 입출력에는 pyarrow가 필요하다 (선택 의존성). 설치되지 않았으면
+아카이브는 건너뛰고 SQLite에 남아 있는 행만 사용한다.
+"""
+
+import glob
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = "archive"
+
+# 차트/통계용 컬럼 (행당 수십 바이트)
+METRIC_COLUMNS = [
+    "id",
+    "ticker",
+    "ts",
+    "decision",
+    "percentage",
+    "btc_balance",
+    "krw_balance",
+    "btc_avg_buy_price",
+    "btc_krw_price",
+]
+# 거래 상세 보기에서만 필요한 컬럼
+TEXT_COLUMNS = ["id", "timestamp", "reason", "reflection"]
+
+
+def _local_time(ts):
+    """epoch 초 -> timestamp 컬럼과 같은 로컬 시간"""
+    return pd.to_datetime(ts, unit="s") + pd.Timedelta(seconds=time.localtime().tm_gmtoff)
+
+
+def archive_available():
+    """Parquet 입출력이 가능한지 (pyarrow 설치 여부)"""
+    return pyarrow is not None
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise ImportError("pyarrow is required for the trade archive (pip install pyarrow)")
+
+
+def _part_dir(archive_dir, part):
+    return os.path.join(archive_dir, "trades", part)
+
+
+def _month_path(archive_dir, part, month):
+    return os.path.join(_part_dir(archive_dir, part), f"{month}.parquet")
+
+
+def _write_parquet(df, path):
+    """기존 월 파일과 합쳐 id 기준으로 중복을 제거한 뒤 원자적으로 교체"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        df = pd.concat([pd.read_parquet(path), df], ignore_index=True)
+        df = df.drop_duplicates(subset="id", keep="last")
+    tmp_path = f"{path}.tmp"
+    df.sort_values("id").to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def compact_trades(conn, older_than_days=90, archive_dir=ARCHIVE_DIR):
+    """
+    older_than_days보다 오래된 거래를 Parquet으로 옮기고 SQLite에서 삭제한다.
+
+    Returns:
+        int: 아카이브된 행 수
+    """
+    _require_pyarrow()
+    cutoff = int((datetime.now() - timedelta(days=older_than_days)).timestamp())
+    columns = list(dict.fromkeys(METRIC_COLUMNS + TEXT_COLUMNS))
+    df = pd.read_sql_query(
+        f"SELECT {', '.join(columns)} FROM trades WHERE ts < ? ORDER BY id",
+        conn,
+        params=(cutoff,),
+    )
+    if df.empty:
+        return 0
+
+    months = _local_time(df["ts"]).dt.strftime("%Y-%m")
+    for month, rows in df.groupby(months):
+        _write_parquet(rows[METRIC_COLUMNS], _month_path(archive_dir, "metrics", month))
+        _write_parquet(rows[TEXT_COLUMNS], _month_path(archive_dir, "text", month))
+
+    # 파일이 모두 기록된 뒤에만 삭제한다
+    with conn:
+        conn.execute("DELETE FROM reflections WHERE trade_id IN (SELECT id FROM trades WHERE ts < ?)", (cutoff,))
+        conn.execute("DELETE FROM trades WHERE ts < ?", (cutoff,))
+    logger.info(f"Archived {len(df)} trades older than {older_than_days} days to {archive_dir}")
+    return len(df)
+
+
+def _read_archive(archive_dir, part, columns, ticker=None, start_ts=None, end_ts=None, ids=None):
+    paths = sorted(glob.glob(os.path.join(_part_dir(archive_dir, part), "*.parquet")))
+    if not paths or pyarrow is None:
+        return pd.DataFrame(columns=columns)
+    filters = [("id", "in", list(ids))] if ids is not None else []
+    if part == "metrics":
+        if ticker is not None:
+            filters.append(("ticker", "==", ticker))
+        if start_ts is not None:
+            filters.append(("ts", ">=", start_ts))
+        if end_ts is not None:
+            filters.append(("ts", "<=", end_ts))
+    frames = [pd.read_parquet(path, columns=columns, filters=filters or None) for path in paths]
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_trades(conn, ticker=None, start_ts=None, end_ts=None, columns=None, archive_dir=ARCHIVE_DIR):
+    """
+    아카이브와 SQLite의 거래를 합쳐 ts 오름차순으로 반환한다.
+
+    columns를 지정하지 않으면 METRIC_COLUMNS만 읽는다. 텍스트 컬럼을 요청하면
+    아카이브의 텍스트 파일을 id로 이어 붙인다.
+    """
+    columns = list(columns or METRIC_COLUMNS)
+    metric_columns = [c for c in METRIC_COLUMNS if c in columns or c in ("id", "ts")]
+    text_columns = [c for c in TEXT_COLUMNS if c in columns and c != "id"]
+
+    where, params = [], []
+    if ticker is not None:
+        where.append("ticker = ?")
+        params.append(ticker)
+    if start_ts is not None:
+        where.append("ts >= ?")
+        params.append(start_ts)
+    if end_ts is not None:
+        where.append("ts <= ?")
+        params.append(end_ts)
+    query = f"SELECT {', '.join(metric_columns + text_columns)} FROM trades"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    live = pd.read_sql_query(query, conn, params=params)
+
+    archived = _read_archive(archive_dir, "metrics", metric_columns, ticker, start_ts, end_ts)
+    if text_columns and not archived.empty:
+        text = _read_archive(
+            archive_dir, "text", ["id"] + text_columns, ids=archived["id"].tolist()
+        )
+        archived = archived.merge(text, on="id", how="left")
+
+    frames = [frame for frame in (archived, live) if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates(subset="id", keep="last").sort_values(["ts", "id"])
+    return df[columns].reset_index(drop=True)
+
+
+def daily_portfolio_ohlc(conn, ticker=None, start_ts=None, end_ts=None, archive_dir=ARCHIVE_DIR):
+    """
+    거래 시점의 포트폴리오 가치를 일별 OHLC로 집계한다.
+
+    ticker를 지정하면 그 마켓의 KRW + 코인 평가액, 지정하지 않으면 rollups의 ACCOUNT 행과
+    같이 공유 KRW 잔고에 마켓별 마지막 코인 평가액을 더한 계좌 전체 가치를 쓴다.
+    계좌 전체 가치는 구간 이전의 포지션도 필요하므로 처음부터 읽은 뒤 구간을 자른다.
+
+    Returns:
+        DataFrame: index=날짜, columns=[open, high, low, close, trades]
+    """
+    df = load_trades(
+        conn,
+        ticker=ticker,
+        start_ts=start_ts if ticker is not None else None,
+        end_ts=end_ts,
+        columns=["ticker", "ts", "krw_balance", "btc_balance", "btc_krw_price"],
+        archive_dir=archive_dir,
+    )
+    if df.empty:
+        return pd.DataFrame(columns=["open", "high", "low", "close", "trades"])
+    coin = (df["btc_balance"] * df["btc_krw_price"]).to_frame("value")
+    if ticker is None:
+        # 마켓별 마지막 코인 평가액 (KRW는 한 번만 더한다)
+        coin = coin.assign(ticker=df["ticker"]).pivot(columns="ticker", values="value").ffill().fillna(0)
+    value = df["krw_balance"] + coin.sum(axis=1)
+    value.index = _local_time(df["ts"])
+    if start_ts is not None:
+        value = value[df["ts"].to_numpy() >= start_ts]
+    daily = value.resample("D").ohlc()
+    daily["trades"] = value.resample("D").count()
+    return daily.dropna(subset=["close"])
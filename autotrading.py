@@ -1,47 +1,75 @@
 import os
-import json
 import requests
 import logging
+import threading
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from dotenv import load_dotenv
 import pandas as pd
 import ta
 from ta.utils import dropna
 from pydantic import BaseModel
-from openai import OpenAI
 import pyupbit
 import sqlite3
-import schedule
-import tiktoken
-
-
-def count_tokens(messages):
-    """
-    Count tokens for the messages to be sent to the GPT-4 API.
-    """
-    encoding = tiktoken.encoding_for_model("gpt-4")
-
-    num_tokens = 0
-
-    for message in messages:
-        # Add tokens for message role
-        num_tokens += len(encoding.encode(message["role"]))
-
-        # Handle content based on type
-        if isinstance(message["content"], str):
-            num_tokens += len(encoding.encode(message["content"]))
-        elif isinstance(message["content"], list):
-            for content_item in message["content"]:
-                if content_item["type"] == "text":
-                    num_tokens += len(encoding.encode(content_item["text"]))
-                # Add handling for other content types if needed
-
-    # Add tokens for message formatting
-    # Each message follows format: {"role": role, "content": content}
-    num_tokens += 4  # Add 4 tokens for message format per message
-
-    return num_tokens
+import asyncio
+from contextlib import nullcontext
+from market_data import DEFAULT_TIMEOUT, DEFAULT_TIMEOUTS, submit, submit_sources, collect_sources
+from candle_store import DB_PATH as CANDLE_DB_PATH, init_candle_store, get_candles, sync_candles
+from indicators import apply_indicators
+from prompt_serializer import build_market_prompt
+from token_accounting import count_text_tokens
+from prompt_builder import PromptBuilder
+from clients import clients
+from signal_cache import signal_cache
+from multi_market import fresh_quote, get_trading_tickers, get_currency, run_markets
+from account import AccountState
+from scheduler import Scheduler, init_schedule_log
+from streaming import ReplaySource, StreamMonitor, TriggerConfig, build_source
+from prefilter import PreFilter, extract_features, init_prefilter
+from llm_cache import LLMCacheMiss, llm_cache
+from trade_store import TradeStore, connect, migrate
+from archive import archive_available, compact_trades, load_trades
+from rollups import init_rollups, rebuild_rollups, update_rollups
+from tracing import CycleTrace, export_trace, init_tracing
+from execution import OrderExecutor, init_executions, save_fills
+from resilience import Deadline, call_timeout, resilience
+
+# 지표 계산용으로 캔들 저장소에서 읽어오는 이력 길이
+INDICATOR_HISTORY = 200
+
+# 시장 데이터 소스별 외부 의존 서비스 (resilience.POLICIES의 키)
+SOURCE_DEPENDENCIES = {
+    "status": "upbit_account",
+    "df_daily": "upbit_quotation",
+    "df_hourly": "upbit_quotation",
+    "orderbook": "upbit_quotation",
+    "fear_greed_index": "alternative_me",
+    "news_headlines": "serpapi",
+}
+
+# 고정 프롬프트(지시문, 매매기법)는 스케줄 실행 간에 재사용
+prompt_builder = PromptBuilder()
+
+# 여러 마켓이 동시에 KRW 잔고를 사용하지 않도록 주문은 하나씩 실행
+_order_lock = threading.Lock()
+
+# 같은 마켓의 정각 사이클과 스트리밍 트리거 사이클은 동시에 실행하지 않는다
+_market_locks = {}
+_market_locks_guard = threading.Lock()
+# 마켓별 마지막 사이클 시작 시각 (time.monotonic)
+_last_cycle_started = {}
+
+# 계좌 잔고 스냅샷은 사이클 내 모든 마켓이 공유하고 주문 체결 후에만 갱신
+account_state = AccountState(clients.upbit)
+
+# 시장가 주문을 체결 확인까지 실행 (큰 주문은 호가 기준으로 분할)
+executor = OrderExecutor(clients.upbit)
+
+# 직전 hold 이후 변화가 없으면 LLM 호출을 건너뛰는 사전 필터
+# (임계값은 처음 사용할 때 .env를 포함한 환경 변수에서 읽는다)
+prefilter = PreFilter()
+
+logger = logging.getLogger(__name__)
 
 
 class TradingDecision(BaseModel):
@@ -65,28 +93,25 @@ def validate_environment():
         )
 
 
-def init_db():
-    conn = sqlite3.connect("trading_history.db")
-    c = conn.cursor()
-    c.execute(
-        """CREATE TABLE IF NOT EXISTS trades
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  timestamp TEXT,
-                  decision TEXT,
-                  percentage INTEGER,
-                  reason TEXT,
-                  btc_balance REAL,
-                  krw_balance REAL,
-                  btc_avg_buy_price REAL,
-                  btc_krw_price REAL,
-                  reflection TEXT)"""
-    )
-    conn.commit()
+def init_db(db_path="trading_history.db"):
+    # WAL 모드로 열고 trades/reflections 스키마를 최신 버전으로 마이그레이션
+    conn = migrate(connect(db_path))
+    init_candle_store(conn)
+    init_schedule_log(conn)
+    init_prefilter(conn)
+    init_rollups(conn)
+    init_tracing(conn)
+    init_executions(conn)
+    # 집계 테이블 도입 이전의 거래(아카이브 포함)를 한 번 반영한다
+    if conn.execute("SELECT COUNT(*) FROM trade_metrics").fetchone()[0] == 0:
+        trades = load_trades(conn)
+        if not trades.empty:
+            rebuild_rollups(conn, trades)
     return conn
 
 
-def get_db_connection():
-    return sqlite3.connect("trading_history.db")
+# 봇 프로세스 전체에서 공유하는 거래 기록 DB 연결
+trade_store = TradeStore(setup=init_db)
 
 
 def log_trade(
@@ -99,15 +124,19 @@ def log_trade(
     btc_avg_buy_price,
     btc_krw_price,
     reflection="",
+    ticker="KRW-BTC",
 ):
     c = conn.cursor()
-    timestamp = datetime.now().isoformat()
+    now = datetime.now()
+    ts = int(now.timestamp())
     c.execute(
         """INSERT INTO trades 
-                 (timestamp, decision, percentage, reason, btc_balance, krw_balance, btc_avg_buy_price, btc_krw_price, reflection) 
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                 (ticker, ts, timestamp, decision, percentage, reason, btc_balance, krw_balance, btc_avg_buy_price, btc_krw_price, reflection) 
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
         (
-            timestamp,
+            ticker,
+            ts,
+            now.isoformat(),
             decision,
             percentage,
             reason,
@@ -118,29 +147,47 @@ def log_trade(
             reflection,
         ),
     )
+    # 대시보드용 집계를 같은 트랜잭션에서 갱신
+    update_rollups(
+        conn,
+        c.lastrowid,
+        ticker,
+        ts,
+        decision,
+        percentage,
+        btc_balance,
+        krw_balance,
+        btc_avg_buy_price,
+        btc_krw_price,
+    )
     conn.commit()
+    return c.lastrowid
 
 
-def get_recent_trades(conn, limit=24):
+def get_recent_trades(conn, limit=24, ticker="KRW-BTC"):
     c = conn.cursor()
-    c.execute("SELECT * FROM trades ORDER BY timestamp DESC LIMIT ?", (limit,))
+    c.execute(
+        "SELECT * FROM trades WHERE ticker = ? ORDER BY ts DESC, id DESC LIMIT ?",
+        (ticker, limit),
+    )
     columns = [column[0] for column in c.description]
 
     return pd.DataFrame.from_records(data=c.fetchall(), columns=columns)
 
 
-def get_current_status(upbit, ticker):
-    """현재 계좌 상태 조회"""
+def get_current_status(account, ticker, current_price=None):
+    """현재 계좌 상태 조회 (공유 스냅샷 사용)"""
     try:
-        krw_balance = float(upbit.get_balance("KRW"))
-        btc_balance = float(upbit.get_balance(ticker))
-        avg_buy_price = float(upbit.get_avg_buy_price(ticker))
-        current_price = pyupbit.get_current_price(ticker)
+        snapshot = account.snapshot()
+        currency = get_currency(ticker)
+        if current_price is None:
+            current_price = pyupbit.get_current_price(ticker)
 
         return {
-            "krw_balance": krw_balance,
-            "btc_balance": btc_balance,
-            "avg_buy_price": avg_buy_price,
+            "ticker": ticker,
+            "krw_balance": snapshot.krw_balance,
+            "coin_balance": snapshot.balance(currency),
+            "avg_buy_price": snapshot.avg_buy_price(currency),
             "current_price": current_price,
         }
     except Exception as e:
@@ -150,7 +197,7 @@ def get_current_status(upbit, ticker):
 
 def get_fear_and_greed_index():
     url = "https://api.alternative.me/fng/"
-    response = requests.get(url)
+    response = clients.session("alternative_me").get(url)
     if response.status_code == 200:
         data = response.json()
         return data["data"][0]
@@ -161,13 +208,13 @@ def get_fear_and_greed_index():
         return None
 
 
-def get_bitcoin_news():
+def get_bitcoin_news(query="btc"):
     serpapi_key = os.getenv("SERPAPI_API_KEY")
     url = "https://serpapi.com/search.json"
-    params = {"engine": "google_news", "q": "btc", "api_key": serpapi_key}
+    params = {"engine": "google_news", "q": query, "api_key": serpapi_key}
 
     try:
-        response = requests.get(url, params=params)
+        response = clients.session("serpapi").get(url, params=params)
         response.raise_for_status()
         data = response.json()
 
@@ -226,81 +273,123 @@ def calculate_performance(trades_df):
     return (final_balance - initial_balance) / initial_balance * 100
 
 
-def generate_reflection(trades_df, current_market_data):
-    performance = calculate_performance(trades_df)
+def openai_client():
+    # 재시도는 resilience가 맡으므로 클라이언트 자체 재시도는 끈다
+    return clients.openai().with_options(
+        timeout=call_timeout(clients.setting("openai", "timeout")), max_retries=0
+    )
 
-    client = OpenAI()
 
-    messages = [
-        {
-            "role": "developer",
-            "content": "You are an AI trading assistant tasked with analyzing recent trading performance and current market conditions to generate insights and improvements for future trading decisions.",
-        },
-        {
-            "role": "user",
-            "content": f"""
-                Last 24 trades data:
-                {trades_df.to_json(orient='records')}
-                
-                Current market data:
-                {current_market_data}
-                
-                Overall performance: {performance:.2f}%
-                
-                Please analyze this data and provide:
-                1. A brief reflection on the recent 24 trading decisions
-                2. Patterns in successful and unsuccessful trades
-                3. Key market conditions that influenced these trades
-                4. Specific suggestions for improvement in future trading decisions
-                
-                Limit your response to 250 words or less, focusing on actionable insights.
-                """,
-        },
-    ]
-    token_count = count_tokens(messages)
-    logger.info(f"Estimated token count for reflection: {token_count}")
-
-    response = client.chat.completions.create(
-        model="gpt-4o-2024-11-20",
-        messages=[
-            {
-                "role": "developer",
-                "content": "You are an AI trading assistant tasked with analyzing recent trading performance and current market conditions to generate insights and improvements for future trading decisions.",
-            },
-            {
-                "role": "user",
-                "content": f"""
-                    Last 24 trades data:
-                    {trades_df.to_json(orient='records')}
-                    
-                    Current market data:
-                    {current_market_data}
-                    
-                    Overall performance: {performance:.2f}%
-                    
-                    Please analyze this data and provide:
-                    1. A brief reflection on the recent 24 trading decisions
-                    2. Patterns in successful and unsuccessful trades
-                    3. Key market conditions that influenced these trades
-                    4. Specific suggestions for improvement in future trading decisions
-                    
-                    Limit your response to 250 words or less, focusing on actionable insights.
-                    """,
-            },
-        ],
+def complete_llm(request, deadline=None):
+    """OpenAI 호출 (시도별 타임아웃, 재시도, 회로 차단기). 재생 모드의 캐시 미스는 그대로 전달"""
+    return resilience.call(
+        "openai",
+        lambda: llm_cache.complete(request, openai_client),
+        deadline=deadline,
+        no_retry=(LLMCacheMiss,),
     )
 
+
+def generate_reflection(trades_df, current_market_data, trace=None, deadline=None):
+    performance = calculate_performance(trades_df)
+
+    prompt = prompt_builder.reflection_prompt(
+        trades_df, current_market_data, performance
+    )
+    logger.info(f"Estimated token count for reflection: {prompt.token_count}")
+
+    with trace.stage("llm.reflection") if trace else nullcontext():
+        response = complete_llm(prompt.request(), deadline)
+    if trace is not None:
+        trace.add_usage("reflection", response.usage)
+
     return response.choices[0].message.content
 
 
-def run_scheduled_trading():
+def get_reflection_mode():
+    """
+    반성 내용 생성 방식
+    - sync: 시장 데이터 수집 후 순차적으로 생성
+    - async: 차트 데이터가 도착하는 즉시 호가/뉴스/지표 계산과 병렬로 생성 (기본값)
+    - precompute: async + 거래 기록 직후 다음 사이클용 반성 내용을 미리 생성해 DB에 캐시
+    """
+    mode = os.getenv("REFLECTION_MODE", "async").lower()
+    if mode not in ("sync", "async", "precompute"):
+        logger.warning(f"Unknown REFLECTION_MODE '{mode}', falling back to 'async'")
+        mode = "async"
+    return mode
+
+
+def get_last_trade_id(trades_df):
+    if trades_df.empty:
+        return None
+    return int(trades_df["id"].max())
+
+
+def get_latest_reflection(conn, ticker):
+    """마켓의 가장 최근 반성 내용 (반성 내용 생성 실패 시 대체 값)"""
+    c = conn.cursor()
+    c.execute(
+        """SELECT r.reflection FROM reflections r JOIN trades t ON t.id = r.trade_id
+           WHERE t.ticker = ? ORDER BY r.trade_id DESC LIMIT 1""",
+        (ticker,),
+    )
+    row = c.fetchone()
+    return row[0] if row else None
+
+
+def get_cached_reflection(conn, trade_id):
+    if trade_id is None:
+        return None
+    c = conn.cursor()
+    c.execute("SELECT reflection FROM reflections WHERE trade_id = ?", (trade_id,))
+    row = c.fetchone()
+    return row[0] if row else None
+
+
+def save_reflection(conn, trade_id, reflection):
+    if trade_id is None:
+        return
+    c = conn.cursor()
+    c.execute(
+        "INSERT OR REPLACE INTO reflections (trade_id, reflection, created_at) VALUES (?, ?, ?)",
+        (trade_id, reflection, datetime.now().isoformat()),
+    )
+    conn.commit()
+
+
+def precompute_reflection(trade_id, current_market_data, ticker="KRW-BTC"):
+    """
+    방금 기록된 거래(trade_id)까지 반영한 반성 내용을 미리 생성해 캐시한다.
+    다음 사이클은 마지막 거래 id가 같으면 LLM 호출 없이 캐시를 사용한다.
+    """
+    try:
+        with trade_store.connection() as conn:
+            recent_trades = get_recent_trades(conn, ticker=ticker)
+        if get_last_trade_id(recent_trades) != trade_id:
+            return
+        reflection = generate_reflection(recent_trades, current_market_data)
+        with trade_store.connection() as conn:
+            save_reflection(conn, trade_id, reflection)
+        logger.info(f"Precomputed reflection for trade {trade_id}")
+    except Exception as e:
+        logger.error(f"Reflection precompute failed: {e}")
+
+
+def run_scheduled_trading(cancel_event=None):
     """스케줄된 거래 실행 함수"""
     try:
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        logger.info(f"Starting hourly trading at {current_time}")
+        logger.info(f"Starting scheduled trading at {current_time}")
 
-        # 실제 거래 로직 실행
-        ai_trading()
+        # 잔고는 사이클마다 한 번 새로 조회한다
+        account_state.invalidate()
+
+        # 실제 거래 로직 실행 (TRADING_TICKERS의 모든 마켓)
+        run_markets(
+            get_trading_tickers(),
+            lambda ticker, quote: ai_trading(ticker, quote, cancel_event=cancel_event),
+        )
 
         logger.info(f"Completed trading execution at {current_time}")
     except Exception as e:
@@ -308,6 +397,37 @@ def run_scheduled_trading():
         logger.exception("상세 에러:")
 
 
+def run_triggered_trading(ticker, reasons):
+    """스트리밍 트리거로 정각 사이클 사이에 한 마켓의 결정 파이프라인을 실행"""
+    logger.info(f"Starting triggered trading for {ticker}: {'; '.join(reasons)}")
+    account_state.invalidate()
+    # 트리거 자체가 큰 변화를 뜻하므로 사전 필터를 거치지 않는다
+    ai_trading(ticker, force=True)
+
+
+def log_replay_trigger(ticker, reasons):
+    """재생 소스의 트리거는 과거 데이터이므로 주문 없이 기록만 한다"""
+    logger.info(f"[{ticker}] Replay trigger (dry run): {'; '.join(reasons)}")
+
+
+def _market_lock(ticker):
+    with _market_locks_guard:
+        return _market_locks.setdefault(ticker, threading.Lock())
+
+
+def run_candle_sync(cancel_event=None):
+    """거래 사이클 사이에 캔들 저장소를 미리 갱신해 사이클의 조회량을 줄인다"""
+    conn = sqlite3.connect(CANDLE_DB_PATH, timeout=10)
+    try:
+        for ticker in get_trading_tickers():
+            for interval in ("minute60", "day"):
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                sync_candles(conn, ticker, interval, INDICATOR_HISTORY)
+    finally:
+        conn.close()
+
+
 def get_simplified_market_data(df_daily, df_hourly):
     """
     OHLCV 데이터만 포함한 단순화된 시장 데이터 생성
@@ -341,264 +461,363 @@ def get_simplified_market_data(df_daily, df_hourly):
     return {"daily_ohlcv": daily_ohlcv, "hourly_ohlcv": hourly_ohlcv}
 
 
-def ai_trading():
-    # Upbit 초기화 및 DB 연결
-    access = os.getenv("UPBIT_ACCESS_KEY")
-    secret = os.getenv("UPBIT_SECRET_KEY")
-    upbit = pyupbit.Upbit(access=access, secret=secret)
-    conn = get_db_connection()
+def ai_trading(ticker="KRW-BTC", quote=None, cancel_event=None, force=False):
+    """
+    한 마켓에 대한 거래 사이클
+
+    단계별 소요 시간과 LLM 토큰 사용량은 cycle_traces 테이블에 기록한다.
+    외부 호출은 사이클 마감 시간(CYCLE_DEADLINE) 안에서 재시도하고, 실패하면 마지막
+    성공 값으로 대신하거나 hold로 기록한다.
+
+    Args:
+        ticker (str): Upbit 마켓 코드 (예: KRW-BTC)
+        quote (dict, optional): 배치로 미리 조회한 orderbook/current_price
+        cancel_event (threading.Event, optional): 설정되면 주문 전에 사이클을 중단한다
+        force (bool): True면 사전 필터 없이 항상 LLM으로 결정한다 (스트리밍 트리거).
+            같은 마켓의 사이클이 실행 중이거나 STREAM_COOLDOWN 안에 시작됐으면 건너뛴다
+    """
+    lock = _market_lock(ticker)
+    # 정각 사이클은 실행 중인 트리거 사이클이 끝나기를 기다리고, 트리거는 기다리지 않는다
+    if not lock.acquire(blocking=not force):
+        logger.info(f"[{ticker}] Cycle already running, skipping stream trigger")
+        return
+    try:
+        if force:
+            cooldown = TriggerConfig.from_env().cooldown
+            since = time.monotonic() - _last_cycle_started.get(ticker, float("-inf"))
+            if since < cooldown:
+                logger.info(
+                    f"[{ticker}] Last cycle started {since:.0f}s ago, skipping stream trigger "
+                    f"(STREAM_COOLDOWN {cooldown:g}s)"
+                )
+                return
+        _last_cycle_started[ticker] = time.monotonic()
+        _traced_cycle(ticker, quote, cancel_event, force)
+    finally:
+        lock.release()
 
-    # 1. 현재 계좌 상태 조회
-    status = get_current_status(upbit=upbit, ticker="KRW-BTC")
 
-    # 2. 시장 데이터 수집
-    df_daily = pyupbit.get_ohlcv("KRW-BTC", interval="day", count=30)
-    df_hourly = pyupbit.get_ohlcv("KRW-BTC", interval="minute60", count=24)
+def _traced_cycle(ticker, quote, cancel_event, force):
+    trace = CycleTrace(ticker, trigger="stream" if force else "schedule")
+    deadline = Deadline.from_env()
+    try:
+        _trading_cycle(ticker, quote or {}, cancel_event, force, trace, deadline)
+    except Exception:
+        trace.status = "error"
+        raise
+    finally:
+        trace.finish()
+        logger.info(trace.summary())
+        try:
+            with trade_store.connection() as conn:
+                export_trace(conn, trace)
+        except Exception as e:
+            logger.error(f"Failed to save cycle trace: {e}")
+
+
+def _resilient_source(name, fetch, ticker, deadline):
+    """소스별 수집 타임아웃과 사이클 마감 시간 안에서 재시도하고, 실패하면 마지막 성공 값을 쓴다"""
+    source_deadline = Deadline(DEFAULT_TIMEOUTS.get(name, DEFAULT_TIMEOUT)).earliest(deadline)
+    return lambda: resilience.call(
+        SOURCE_DEPENDENCIES[name], fetch, key=f"{name}:{ticker}", deadline=source_deadline
+    )
 
-    if df_daily is None or df_hourly is None:
-        raise Exception("차트 데이터 조회 실패")
 
-    df_daily = dropna(df_daily)
-    df_hourly = dropna(df_hourly)
+def _trading_cycle(ticker, quote, cancel_event, force, trace, deadline):
+    currency = get_currency(ticker)
+    # 라운드 시작 때 배치로 받은 시세가 오래되었으면 이 마켓만 다시 조회한다
+    quote = fresh_quote(quote)
 
-    df_daily = add_indicators(df_daily)
-    df_hourly = add_indicators(df_hourly)
+    reflection_mode = get_reflection_mode()
 
-    # 3. 추가 데이터 수집
-    orderbook = pyupbit.get_orderbook("KRW-BTC")
-    if orderbook is None:
-        raise Exception("호가 데이터 조회 실패")
-    fear_greed_index = get_fear_and_greed_index()
-    news_headlines = get_bitcoin_news()
+    # 1~3. 계좌 상태 및 시장 데이터 병렬 수집 (소스마다 source.<이름> 단계로 측정, 잔고 조회는 source.status)
+    started_at = time.monotonic()
+    sources = {
+        "status": lambda: get_current_status(
+            account_state, ticker=ticker, current_price=quote.get("current_price")
+        ),
+        "df_daily": lambda: get_candles(
+            ticker, interval="day", count=INDICATOR_HISTORY
+        ),
+        "df_hourly": lambda: get_candles(
+            ticker, interval="minute60", count=INDICATOR_HISTORY
+        ),
+        "orderbook": lambda: quote.get("orderbook")
+        or pyupbit.get_orderbook(ticker),
+        "fear_greed_index": lambda: signal_cache.get(
+            "fear_greed_index", get_fear_and_greed_index
+        ),
+        "news_headlines": lambda: signal_cache.get(
+            f"news_headlines:{currency}",
+            lambda: get_bitcoin_news(query=currency.lower()),
+        ),
+    }
+    futures = submit_sources(
+        {
+            name: trace.timed(f"source.{name}", _resilient_source(name, fn, ticker, deadline))
+            for name, fn in sources.items()
+        }
+    )
 
-    # 6. YOUTUBE 워뇨띠 매매기법 가져오기
-    with open("strategy.txt", "r", encoding="utf-8") as f:
-        youtube_transcript = f.read()
+    # 반성 내용은 최근 거래 내역과 차트 데이터에만 의존하므로 차트가 먼저 도착하면 바로 시작
+    # (계좌 상태는 사전 필터 판단에 필요하므로 함께 기다린다)
+    chart_data, _ = collect_sources(
+        {name: futures.pop(name) for name in ("status", "df_daily", "df_hourly")},
+        started_at=started_at,
+    )
+    status = chart_data["status"]
+    df_daily = chart_data["df_daily"]
+    df_hourly = chart_data["df_hourly"]
+    if df_daily is None or df_hourly is None:
+        raise Exception("차트 데이터 조회 실패")
+    if status is None:
+        raise Exception("계좌 상태 조회 실패")
+
+    with trace.stage("indicators"):
+        df_daily = dropna(df_daily)
+        df_hourly = dropna(df_hourly)
+
+        # 현재 시장 데이터 수집
+        current_market_data = get_simplified_market_data(df_daily, df_hourly)
+
+        # 저장된 이력으로 지표를 계산한 뒤 프롬프트에 넣을 구간만 남긴다
+        df_daily = apply_indicators(df_daily, ticker, "day").tail(30)
+        df_hourly = apply_indicators(df_hourly, ticker, "minute60").tail(24)
+
+    # 직전 hold 이후 변화가 없으면 반성/결정 LLM 호출 없이 hold로 기록
+    features = extract_features(df_hourly, status)
+    if not force:
+        with trace.stage("prefilter"), trade_store.connection() as conn:
+            skip, reason = prefilter.should_skip(conn, ticker, features)
+        if skip:
+            with trace.stage("db_write"), trade_store.connection() as conn:
+                log_trade(
+                    conn,
+                    "hold",
+                    0,
+                    f"Pre-filter: {reason}",
+                    status["coin_balance"],
+                    status["krw_balance"],
+                    status["avg_buy_price"],
+                    status["current_price"],
+                    ticker=ticker,
+                )
+            trace.status = "skipped"
+            return
 
     # 최근 거래 내역 가져오기
-    recent_trades = get_recent_trades(conn)
+    with trace.stage("db_read"), trade_store.connection() as conn:
+        recent_trades = get_recent_trades(conn, ticker=ticker)
+        last_trade_id = get_last_trade_id(recent_trades)
+        reflection = get_cached_reflection(conn, last_trade_id)
+
+    reflection_future = None
+    if reflection is not None:
+        logger.info(f"Using cached reflection for trade {last_trade_id}")
+    elif reflection_mode != "sync":
+        reflection_future = submit(
+            generate_reflection, recent_trades, current_market_data, trace, deadline
+        )
 
-    # 현재 시장 데이터 수집
-    current_market_data = get_simplified_market_data(df_daily, df_hourly)
+    market_data, _ = collect_sources(futures, started_at=started_at)
+    orderbook = market_data["orderbook"]
+    fear_greed_index = market_data["fear_greed_index"]
+    news_headlines = market_data["news_headlines"] or []
 
-    # AI 분석 시작
-    client = OpenAI()
+    if orderbook is None:
+        raise Exception("호가 데이터 조회 실패")
 
     # 반성 및 개선 내용 생성
-    reflection = generate_reflection(recent_trades, current_market_data)
+    if reflection is None:
+        try:
+            if reflection_future is not None:
+                # 결정 호출 전에 반성 내용을 기다리는 시간 (병렬화로 숨기지 못한 부분)
+                with trace.stage("reflection_wait"):
+                    reflection = reflection_future.result()
+            else:
+                reflection = generate_reflection(
+                    recent_trades, current_market_data, trace, deadline
+                )
+        except LLMCacheMiss:
+            raise
+        except Exception as e:
+            # 최근 반성 내용으로 대신하고 캐시하지 않는다 (다음 사이클에서 다시 생성)
+            logger.error(f"[{ticker}] Reflection unavailable, using the latest saved one: {e}")
+            trace.status = "degraded"
+            with trade_store.connection() as conn:
+                reflection = get_latest_reflection(conn, ticker) or ""
+        else:
+            with trace.stage("db_write"), trade_store.connection() as conn:
+                save_reflection(conn, last_trade_id, reflection)
+
+    # 토큰 예산 안에서 시장 데이터 직렬화
+    # prompt_build에는 예산 계산을 위한 토큰 계산(token_count) 시간도 포함된다
+    with trace.stage("prompt_build"):
+        market_prompt, prompt_usage = build_market_prompt(
+            ticker,
+            status,
+            df_daily,
+            df_hourly,
+            orderbook,
+            news_headlines,
+            fear_greed_index,
+            count_fn=trace.timed("token_count", count_text_tokens),
+            token_budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "4000")),
+        )
+        logger.info(f"Market data prompt token usage: {prompt_usage}")
 
-    ############
-    messages = [
-        {
-            "role": "developer",
-            "content": f"""You are an expert in Bitcoin investing. Analyze the provided data and determine whether to buy, sell, or hold at the current moment. Consider the following in your analysis:
+        ############
+        prompt = prompt_builder.decision_prompt(reflection, market_prompt, ticker)
+    logger.info(f"Estimated token count for trading: {prompt.token_count}")
 
-                - Technical indicators and market data
-                - Recent news headlines and their potential impact on Bitcoin price
-                - The Fear and Greed Index and its implications
-                - Overall market sentiment
-                - Patterns and trends visible in the chart image
-                - Recent trading performance and reflection
+    try:
+        with trace.stage("llm.decision"):
+            response = complete_llm(prompt.request(), deadline)
+        trace.add_usage("decision", response.usage)
+        result = TradingDecision.model_validate_json(response.choices[0].message.content)
+    except LLMCacheMiss:
+        raise
+    except Exception as e:
+        # 결정을 받지 못하면 주문 없이 hold로 기록한다 (사전 필터 기준 상태는 갱신하지 않는다)
+        logger.error(f"[{ticker}] Decision unavailable, holding: {e}")
+        trace.status = "degraded"
+        result = TradingDecision(decision="hold", percentage=0, reason=f"Decision unavailable: {e}")
+    else:
+        with trade_store.connection() as conn:
+            prefilter.record_decision(conn, ticker, features, result.decision)
+
+    print(f"### [{ticker}] AI Decision: {result.decision.upper()} ###")
+    print(f"### [{ticker}] Reason: {result.reason} ###")
+
+    # 다음 사이클이 이 사이클을 대체한 경우 오래된 판단으로 주문하지 않는다
+    if cancel_event is not None and cancel_event.is_set():
+        logger.warning(f"[{ticker}] Cycle cancelled before placing orders")
+        trace.status = "cancelled"
+        return
+
+    execution = None
+    order = None
+    reserved = 0.0
+
+    with trace.stage("order"):
+        # 주문 금액 계산과 KRW 예약만 잠금 안에서 하고, 체결 확인(분할 주문 포함)은
+        # 잠금 밖에서 실행해 다른 마켓의 주문을 막지 않는다
+        with _order_lock:
+            # 다른 마켓의 주문이 반영된 최신 스냅샷 기준으로 주문 금액을 정한다
+            # (잔고는 주문 금액에 직접 쓰이므로 오래된 값으로 대신하지 않는다)
+            snapshot = resilience.call(
+                "upbit_account", account_state.snapshot, key="account", deadline=deadline, max_stale=0
+            )
+            if result.decision == "buy":
+                my_krw = account_state.available(snapshot, "KRW")
+                buy_amount = my_krw * (result.percentage / 100) * 0.9995  # 수수료 고려
+                if buy_amount > 5000:
+                    print(f"### Buy Order Executed: {result.percentage}% of available KRW ###")
+                    order = ("bid", buy_amount, None)
+                    reserved = my_krw * (result.percentage / 100)
+                    account_state.reserve("KRW", reserved)
+                else:
+                    print("### Buy Order Failed: Insufficient KRW (less than 5000 KRW) ###")
+            elif result.decision == "sell":
+                my_coin = snapshot.balance(currency)
+                sell_amount = my_coin * (result.percentage / 100)
+                current_price = status["current_price"]
+                if sell_amount * current_price > 5000:
+                    print(f"### Sell Order Executed: {result.percentage}% of held {currency} ###")
+                    order = ("ask", sell_amount, current_price)
+                else:
+                    print(
+                        f"### Sell Order Failed: Insufficient {currency} (less than 5000 KRW worth) ###"
+                    )
+
+        try:
+            if order is not None:
+                side, amount, price = order
+                execution = executor.execute(
+                    ticker, side, amount, orderbook, price, cancel_event=cancel_event
+                )
+
+            # 체결이 확인된 경우에만 잔고를 다시 조회한다
+            order_executed = execution is not None and execution.executed
+            if order_executed:
+                print(f"### {execution.summary()} ###")
+                try:
+                    snapshot = resilience.call(
+                        "upbit_account", account_state.refresh, key="account", deadline=deadline, max_stale=0
+                    )
+                except Exception as e:
+                    # 체결은 확인되었으므로 거래는 기록하고, 잔고는 다음 조회에서 다시 받는다
+                    logger.error(f"[{ticker}] Balance refresh failed after fill, logging pre-order balances: {e}")
+                    account_state.invalidate()
+                    trace.status = "degraded"
+            elif execution is not None and execution.fills:
+                # 체결 확인 시간 안에 끝나지 않은 주문도 나중에 체결될 수 있으므로 잔고를 다시 받게 한다
+                account_state.invalidate()
+        finally:
+            if order is not None and execution is None:
+                # 주문 실행 중 예외: 일부 주문이 접수됐을 수 있다
+                account_state.invalidate()
+            if reserved:
+                account_state.release("KRW", reserved)
+
+    # 체결된 경우 확정 평균 체결가를 기록한다 (체결 금액을 알 수 없으면 현재가)
+    current_coin_price = (execution.avg_price if order_executed else None) or status["current_price"]
+    coin_balance = snapshot.balance(currency)
+    krw_balance = snapshot.krw_balance
+    coin_avg_buy_price = snapshot.avg_buy_price(currency)
 
-                Recent trading reflection:
-                {reflection}
+    # 거래 정보 및 반성 내용 로깅
+    with trace.stage("db_write"), trade_store.connection() as conn:
+        trade_id = log_trade(
+            conn,
+            result.decision,
+            result.percentage if order_executed else 0,
+            result.reason,
+            coin_balance,
+            krw_balance,
+            coin_avg_buy_price,
+            current_coin_price,
+            reflection,
+            ticker=ticker,
+        )
+        if execution is not None and execution.fills:
+            save_fills(conn, trade_id, execution)
 
-                Particularly important is to always refer to the trading method of 'Wonyyotti', a legendary Korean investor, to assess the current situation and make trading decisions. Wonyyotti's trading method is as follows:
+    # 다음 사이클의 반성 내용을 미리 생성
+    if reflection_mode == "precompute":
+        submit(precompute_reflection, trade_id, current_market_data, ticker)
 
-                {youtube_transcript}
 
-                Based on this trading method, analyze the current market situation and make a judgment by synthesizing it with the provided data and recent performance reflection.
+def run_archive(cancel_event=None):
+    """ARCHIVE_AFTER_DAYS보다 오래된 거래를 Parquet 아카이브로 옮긴다"""
+    with trade_store.connection() as conn:
+        compact_trades(conn, older_than_days=float(os.getenv("ARCHIVE_AFTER_DAYS")))
 
-                Response format:
-                1. Decision (buy, sell, or hold)
-                2. If the decision is 'buy', provide a percentage (1-100) of available KRW to use for buying.
-                If the decision is 'sell', provide a percentage (1-100) of held BTC to sell.
-                If the decision is 'hold', set the percentage to 0.
-                3. Reason for your decision
 
-                Ensure that the percentage is an integer between 1 and 100 for buy/sell decisions, and exactly 0 for hold decisions.
-                Your percentage should reflect the strength of your conviction in the decision based on the analyzed data.""",
-        },
-        {
-            "role": "user",
-            "content": [
-                {
-                    "type": "text",
-                    "text": f"""Current Balance Status:
-                                    - KRW Balance: {status['krw_balance']}
-                                    - BTC Balance: {status['btc_balance']}
-                                    - Average Buy Price: {status['avg_buy_price']}
-                                    - Current Price: {status['current_price']}
-
-                                    Technical Analysis Data:
-                                    - Daily Chart: {df_daily.to_json()}
-                                    - Hourly Chart: {df_hourly.to_json()}
-                                    - Order Book: {json.dumps(orderbook)}
-                                    - News Headlines: {json.dumps(news_headlines)}
-                                    - Fear and Greed Index: {json.dumps(fear_greed_index)}
-                        """,
-                }
-            ],
-        },
-    ]
-    token_count = count_tokens(messages)
-    logger.info(f"Estimated token count for trading: {token_count}")
-
-    response = client.chat.completions.create(
-        model="gpt-4o-2024-11-20",
-        messages=[
-            {
-                "role": "developer",
-                "content": f"""You are an expert in Bitcoin investing. Analyze the provided data and determine whether to buy, sell, or hold at the current moment. Consider the following in your analysis:
-
-                - Technical indicators and market data
-                - Recent news headlines and their potential impact on Bitcoin price
-                - The Fear and Greed Index and its implications
-                - Overall market sentiment
-                - Patterns and trends visible in the chart image
-                - Recent trading performance and reflection
-
-                Recent trading reflection:
-                {reflection}
-
-                Particularly important is to always refer to the trading method of 'Wonyyotti', a legendary Korean investor, to assess the current situation and make trading decisions. Wonyyotti's trading method is as follows:
-
-                {youtube_transcript}
-
-                Based on this trading method, analyze the current market situation and make a judgment by synthesizing it with the provided data and recent performance reflection.
-
-                Response format:
-                1. Decision (buy, sell, or hold)
-                2. If the decision is 'buy', provide a percentage (1-100) of available KRW to use for buying.
-                If the decision is 'sell', provide a percentage (1-100) of held BTC to sell.
-                If the decision is 'hold', set the percentage to 0.
-                3. Reason for your decision
-
-                Ensure that the percentage is an integer between 1 and 100 for buy/sell decisions, and exactly 0 for hold decisions.
-                Your percentage should reflect the strength of your conviction in the decision based on the analyzed data.""",
-            },
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": f"""Current Balance Status:
-                                    - KRW Balance: {status['krw_balance']}
-                                    - BTC Balance: {status['btc_balance']}
-                                    - Average Buy Price: {status['avg_buy_price']}
-                                    - Current Price: {status['current_price']}
-
-                                    Technical Analysis Data:
-                                    - Daily Chart: {df_daily.to_json()}
-                                    - Hourly Chart: {df_hourly.to_json()}
-                                    - Order Book: {json.dumps(orderbook)}
-                                    - News Headlines: {json.dumps(news_headlines)}
-                                    - Fear and Greed Index: {json.dumps(fear_greed_index)}
-                        """,
-                    }
-                ],
-            },
-        ],
-        response_format={
-            "type": "json_schema",
-            "json_schema": {
-                "name": "trading_decision",
-                "strict": True,
-                "schema": {
-                    "type": "object",
-                    "properties": {
-                        "decision": {
-                            "type": "string",
-                            "enum": ["buy", "sell", "hold"],
-                        },
-                        "percentage": {"type": "integer"},
-                        "reason": {"type": "string"},
-                    },
-                    "required": ["decision", "percentage", "reason"],
-                    "additionalProperties": False,
-                },
-            },
-        },
-        max_tokens=4095,
+def build_scheduler():
+    """
+    환경 변수로 스케줄 설정
+    - TRADING_CADENCE: 거래 주기 (기본 1h, 예: 15m)
+    - OVERLAP_POLICY: 실행이 겹칠 때 skip/queue/cancel (기본 skip)
+    - CANDLE_SYNC_CADENCE: 설정 시 캔들 저장소를 이 주기로 미리 갱신 (예: 5m)
+    - ARCHIVE_AFTER_DAYS: 설정 시 매일 이보다 오래된 거래를 Parquet으로 아카이브 (pyarrow 필요)
+    """
+    scheduler = Scheduler()
+    scheduler.add_job(
+        "trading",
+        run_scheduled_trading,
+        cadence=os.getenv("TRADING_CADENCE", "1h"),
+        overlap=os.getenv("OVERLAP_POLICY", "skip").lower(),
     )
-    # initial_analysis = json.loads(response.choices[0].message.content)
-    result = TradingDecision.model_validate_json(response.choices[0].message.content)
-
-    print(f"### AI Decision: {result.decision.upper()} ###")
-    print(f"### Reason: {result.reason} ###")
-
-    order_executed = False
-
-    if result.decision == "buy":
-        my_krw = upbit.get_balance("KRW")
-        buy_amount = my_krw * (result.percentage / 100) * 0.9995  # 수수료 고려
-        if buy_amount > 5000:
-            print(f"### Buy Order Executed: {result.percentage}% of available KRW ###")
-            order = upbit.buy_market_order("KRW-BTC", buy_amount)
-            if order:
-                order_executed = True
-            print(order)
+    candle_sync_cadence = os.getenv("CANDLE_SYNC_CADENCE")
+    if candle_sync_cadence:
+        scheduler.add_job("candle_sync", run_candle_sync, cadence=candle_sync_cadence)
+    if os.getenv("ARCHIVE_AFTER_DAYS"):
+        if archive_available():
+            scheduler.add_job("archive", run_archive, cadence="1d")
         else:
-            print("### Buy Order Failed: Insufficient KRW (less than 5000 KRW) ###")
-    elif result.decision == "sell":
-        my_btc = upbit.get_balance("KRW-BTC")
-        sell_amount = my_btc * (result.percentage / 100)
-        current_price = pyupbit.get_current_price("KRW-BTC")
-        if sell_amount * current_price > 5000:
-            print(f"### Sell Order Executed: {result.percentage}% of held BTC ###")
-            order = upbit.sell_market_order("KRW-BTC", sell_amount)
-            if order:
-                order_executed = True
-            print(order)
-        else:
-            print(
-                "### Sell Order Failed: Insufficient BTC (less than 5000 KRW worth) ###"
-            )
-
-    # 거래 실행 여부와 관계없이 현재 잔고 조회
-    time.sleep(1)  # API 호출 제한을 고려하여 잠시 대기
-    balances = upbit.get_balances()
-    btc_balance = next(
-        (
-            float(balance["balance"])
-            for balance in balances
-            if balance["currency"] == "BTC"
-        ),
-        0,
-    )
-    krw_balance = next(
-        (
-            float(balance["balance"])
-            for balance in balances
-            if balance["currency"] == "KRW"
-        ),
-        0,
-    )
-    btc_avg_buy_price = next(
-        (
-            float(balance["avg_buy_price"])
-            for balance in balances
-            if balance["currency"] == "BTC"
-        ),
-        0,
-    )
-    current_btc_price = pyupbit.get_current_price("KRW-BTC")
-
-    # 거래 정보 및 반성 내용 로깅
-    log_trade(
-        conn,
-        result.decision,
-        result.percentage if order_executed else 0,
-        result.reason,
-        btc_balance,
-        krw_balance,
-        btc_avg_buy_price,
-        current_btc_price,
-        reflection,
-    )
-
-    # 데이터베이스 연결 종료
-    conn.close()
+            logger.warning("ARCHIVE_AFTER_DAYS is set but pyarrow is not installed; trade archiving is disabled")
+    return scheduler
 
 
 def main():
@@ -614,33 +833,48 @@ def main():
     load_dotenv()
 
     try:
-        # 데이터베이스 초기화
-        init_db()
+        # Upbit/외부 API 호출에 커넥션 풀 사용
+        clients.install_upbit_session()
+
+        # 데이터베이스 초기화 (마이그레이션 포함)
+        trade_store.open()
 
         # 환경 변수 검증
         validate_environment()
 
-        # 1시간마다 실행되도록 스케줄 설정
-        logger.info("Setting up schedule to run every hour...")
-        schedule.every().hour.at(":00").do(run_scheduled_trading)
-
-        # 시작 메시지 출력
-        logger.info("Trading bot started. Will execute every hour at :00")
+        scheduler = build_scheduler()
+        for job in scheduler.jobs:
+            logger.info(
+                f"Scheduled '{job.name}' every {job.cadence} (overlap: {job.overlap})"
+            )
+        logger.info(f"Trading bot started for {', '.join(get_trading_tickers())}")
         logger.info("Press Ctrl+C to stop the bot.")
 
-        # 현재 분이 0분이면 즉시 실행
-        current_minute = datetime.now().minute
-        if current_minute == 0:
-            logger.info("Current time is on the hour, executing initial trade...")
-            run_scheduled_trading()
-        else:
-            next_run = schedule.next_run()
-            logger.info(f"Next trade will execute at {next_run}")
-
-        # 스케줄러 실행
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        # STREAMING_MODE가 설정되면 정각 사이클 사이에도 트리거 조건을 감시한다
+        tickers = get_trading_tickers()
+        source = build_source(tickers)
+        monitor = None
+        if source is not None:
+            on_trigger = run_triggered_trading
+            # 과거 캔들 재생으로 실제 주문을 내지 않는다 (모의 서버를 쓸 때만 사이클을 실행)
+            if isinstance(source, ReplaySource) and not clients.setting("upbit", "base_url"):
+                logger.warning("Replay streaming runs as a dry run; set UPBIT_BASE_URL to a mock server to run cycles")
+                on_trigger = log_replay_trigger
+            monitor = StreamMonitor(tickers, source, on_trigger)
+            logger.info(f"Streaming mode enabled ({type(source).__name__})")
+
+        async def run():
+            tasks = [scheduler.run()]
+            if monitor is not None:
+                tasks.append(monitor.run())
+            await asyncio.gather(*tasks)
+
+        # 정각 직후에 시작하면 해당 회차를 바로 실행하고, 이후 다음 실행 시각까지 대기
+        try:
+            asyncio.run(run())
+        finally:
+            if monitor is not None:
+                monitor.close()
 
     except KeyboardInterrupt:
         logger.info("Trading bot stopped by user")
@@ -648,6 +882,9 @@ def main():
         logger.error(f"Critical error in main loop: {str(e)}")
         logger.exception("상세 에러:")
     finally:
+        clients.close()
+        llm_cache.close()
+        trade_store.close()
         logger.info("Trading bot shutdown complete")
 
 
@@ -0,0 +1,340 @@
+"""
+백테스트 엔진
+
+캔들 저장소의 과거 캔들을 재생하면서 주입된 의사결정 함수를 실행하고,
+ai_trading()의 매수/매도 로직(수수료 0.9995, 최소 주문 5000원)을 그대로
+시뮬레이션한다. 결과는 trades 테이블과 같은 스키마로 별도 DB에 기록한다.
+결과 DB는 backtest_runs 테이블로 표시하며, 표시가 없는 DB(예: 실거래
+trading_history.db)에 거래가 있으면 덮어쓰지 않는다.
+
+의사결정 함수는 지표가 추가된 캔들 DataFrame을 받아
+(decisions, percentages, reasons) 배열을 반환한다. 규칙 기반 전략은 전체
+구간을 한 번에 벡터 연산으로 계산하고, LLM처럼 한 시점씩 판단하는 함수는
+stepwise()로 감싸서 사용한다.
+
+    python backtest.py --strategy sma --start 2024-01-01 --krw 1000000
+"""
+
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+import pyupbit
+
+from autotrading import add_indicators, init_db
+from trade_store import backfill_ts, connect, migrate
+from archive import METRIC_COLUMNS, load_trades
+from rollups import rebuild_rollups
+from candle_store import init_candle_store, load_candles, save_candles
+
+logger = logging.getLogger(__name__)
+
+# ai_trading()과 같은 주문 조건
+FEE_FACTOR = 0.9995
+FEE_RATE = 0.0005
+MIN_ORDER_KRW = 5000
+
+HOLD, BUY, SELL = 0, 1, 2
+DECISION_NAMES = np.array(["hold", "buy", "sell"])
+DECISION_CODES = {"hold": HOLD, "buy": BUY, "sell": SELL}
+
+
+def sma_cross_strategy(df, percentage=50):
+    """종가가 SMA-20을 상향 돌파하면 매수, 하향 돌파하면 매도"""
+    above = (df["close"] > df["sma_20"]).to_numpy()
+    prev = np.roll(above, 1)
+    prev[0] = above[0]
+    valid = df["sma_20"].notna().to_numpy()
+
+    decisions = np.full(len(df), HOLD)
+    decisions[valid & above & ~prev] = BUY
+    decisions[valid & ~above & prev] = SELL
+    percentages = np.where(decisions == HOLD, 0, percentage)
+    reasons = np.where(
+        decisions == BUY,
+        "Close crossed above SMA-20",
+        np.where(decisions == SELL, "Close crossed below SMA-20", "No SMA-20 cross"),
+    )
+    return decisions, percentages, reasons
+
+
+def rsi_strategy(df, low=30, high=70, percentage=30):
+    """RSI 과매도 구간에서 매수, 과매수 구간에서 매도"""
+    rsi = df["rsi"].to_numpy()
+    decisions = np.full(len(df), HOLD)
+    decisions[rsi < low] = BUY
+    decisions[rsi > high] = SELL
+    percentages = np.where(decisions == HOLD, 0, percentage)
+    reasons = np.where(
+        decisions == BUY,
+        f"RSI below {low}",
+        np.where(decisions == SELL, f"RSI above {high}", "RSI in range"),
+    )
+    return decisions, percentages, reasons
+
+
+def recorded_strategy(trades_df):
+    """
+    trades 테이블에 기록된 실제 결정을 해당 캔들 시점에 그대로 재생한다.
+    기록이 없는 캔들은 hold로 처리한다.
+    """
+    trades = trades_df[["timestamp", "decision", "percentage", "reason"]].copy()
+    trades["timestamp"] = pd.to_datetime(trades["timestamp"], format="ISO8601")
+    trades = trades.sort_values("timestamp")
+
+    def decide(df):
+        candles = pd.DataFrame({"candle": df.index}, index=range(len(df)))
+        merged = pd.merge_asof(
+            trades,
+            candles,
+            left_on="timestamp",
+            right_on="candle",
+            direction="backward",
+        ).dropna(subset=["candle"])
+        # 같은 캔들에 여러 기록이 있으면 마지막 결정을 사용
+        merged = merged.drop_duplicates("candle", keep="last").set_index("candle")
+        aligned = merged.reindex(df.index)
+
+        decisions = (
+            aligned["decision"].map(DECISION_CODES).fillna(HOLD).to_numpy(dtype=int)
+        )
+        percentages = aligned["percentage"].fillna(0).to_numpy(dtype=int)
+        reasons = aligned["reason"].fillna("No recorded decision").to_numpy()
+        return decisions, percentages, reasons
+
+    return decide
+
+
+def stepwise(decide, lookback=24):
+    """
+    한 시점씩 판단하는 함수를 벡터 전략 인터페이스로 감싼다.
+
+    decide(window_df)는 decision/percentage/reason 속성을 가진 객체
+    (예: TradingDecision)를 반환해야 한다.
+    """
+
+    def run(df):
+        decisions = np.full(len(df), HOLD)
+        percentages = np.zeros(len(df), dtype=int)
+        reasons = np.empty(len(df), dtype=object)
+        for i in range(len(df)):
+            result = decide(df.iloc[max(0, i - lookback + 1) : i + 1])
+            decisions[i] = DECISION_CODES.get(result.decision, HOLD)
+            percentages[i] = result.percentage
+            reasons[i] = result.reason
+        return decisions, percentages, reasons
+
+    return run
+
+
+def simulate(close, decisions, percentages, krw_balance, coin_balance=0.0, avg_buy_price=0.0):
+    """
+    주문 시뮬레이션
+
+    hold와 최소 주문 금액 미달 주문은 잔고를 바꾸지 않으므로, 잔고 점화식은
+    매수/매도 신호가 있는 시점만 순회하고 나머지 구간은 NumPy로 직전 값을 채운다.
+
+    Returns:
+        dict: 캔들별 krw_balance, coin_balance, avg_buy_price, executed 배열과
+        초기 잔고 initial_krw, initial_coin
+    """
+    close = np.asarray(close, dtype=float)
+    decisions = np.asarray(decisions)
+    pct = np.clip(np.asarray(percentages, dtype=float), 0, 100) / 100
+    n = len(close)
+
+    # 0번 행은 초기 잔고, i+1번 행은 i번째 캔들 처리 후 잔고
+    krw = np.empty(n + 1)
+    coin = np.empty(n + 1)
+    avg = np.empty(n + 1)
+    krw[0], coin[0], avg[0] = krw_balance, coin_balance, avg_buy_price
+    executed = np.zeros(n, dtype=bool)
+
+    for i in np.flatnonzero((decisions != HOLD) & (pct > 0)):
+        price = close[i]
+        if decisions[i] == BUY:
+            buy_amount = krw_balance * pct[i] * FEE_FACTOR  # 수수료 고려
+            if buy_amount <= MIN_ORDER_KRW:
+                continue
+            volume = buy_amount / price
+            avg_buy_price = (avg_buy_price * coin_balance + buy_amount) / (
+                coin_balance + volume
+            )
+            krw_balance -= buy_amount * (1 + FEE_RATE)
+            coin_balance += volume
+        else:
+            sell_amount = coin_balance * pct[i]
+            if sell_amount * price <= MIN_ORDER_KRW:
+                continue
+            krw_balance += sell_amount * price * (1 - FEE_RATE)
+            coin_balance -= sell_amount
+            if coin_balance <= 0:
+                avg_buy_price = 0.0
+        krw[i + 1], coin[i + 1], avg[i + 1] = krw_balance, coin_balance, avg_buy_price
+        executed[i] = True
+
+    # 체결이 없는 캔들은 직전 체결 시점(없으면 초기값)의 잔고를 유지
+    idx = np.where(np.concatenate(([True], executed)), np.arange(n + 1), 0)
+    np.maximum.accumulate(idx, out=idx)
+    idx = idx[1:]
+    return {
+        "krw_balance": krw[idx],
+        "coin_balance": coin[idx],
+        "avg_buy_price": avg[idx],
+        "executed": executed,
+        "initial_krw": float(krw[0]),
+        "initial_coin": float(coin[0]),
+    }
+
+
+def summarize(close, result):
+    """수익률, 최대 낙폭, 체결 횟수 및 단순 보유 대비 성과"""
+    close = np.asarray(close, dtype=float)
+    equity = result["krw_balance"] + result["coin_balance"] * close
+    # 첫 캔들에서 체결된 주문도 반영되도록 첫 캔들 가격으로 평가한 초기 잔고를 기준으로 한다
+    initial = result["initial_krw"] + result["initial_coin"] * close[0]
+    peak = np.maximum.accumulate(np.concatenate(([initial], equity)))[1:]
+    drawdown = (equity - peak) / peak
+    return {
+        "candles": len(close),
+        "orders": int(result["executed"].sum()),
+        "initial_value": float(initial),
+        "final_value": float(equity[-1]),
+        "return_pct": float((equity[-1] / initial - 1) * 100),
+        "buy_and_hold_pct": float((close[-1] / close[0] - 1) * 100),
+        "max_drawdown_pct": float(drawdown.min() * 100),
+    }
+
+
+def run_backtest(df, strategy, krw_balance, coin_balance=0.0, avg_buy_price=0.0):
+    """
+    지표를 추가한 캔들에 전략을 적용하고 결과를 trades 스키마의 DataFrame으로 반환한다.
+    """
+    df = add_indicators(df.copy())
+    decisions, percentages, reasons = strategy(df)
+    close = df["close"].to_numpy(dtype=float)
+    result = simulate(
+        close, decisions, percentages, krw_balance, coin_balance, avg_buy_price
+    )
+
+    trades = pd.DataFrame(
+        {
+            "timestamp": df.index.map(lambda ts: ts.isoformat()),
+            "decision": DECISION_NAMES[np.asarray(decisions)],
+            "percentage": np.where(result["executed"], percentages, 0),
+            "reason": reasons,
+            "btc_balance": result["coin_balance"],
+            "krw_balance": result["krw_balance"],
+            "btc_avg_buy_price": result["avg_buy_price"],
+            "btc_krw_price": close,
+            "reflection": "",
+        }
+    )
+    return trades, summarize(close, result)
+
+
+def is_backtest_db(conn):
+    """백테스트 결과 DB이거나 아직 거래가 없는 DB면 True"""
+    marked = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'backtest_runs'"
+    ).fetchone()
+    return marked is not None or conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0] == 0
+
+
+def write_results(conn, trades, ticker):
+    """백테스트 결과로 trades 테이블을 바꾼다. 백테스트 결과 DB가 아니면 ValueError"""
+    if not is_backtest_db(conn):
+        raise ValueError("Refusing to overwrite trades in a DB that is not a backtest result DB")
+    c = conn.cursor()
+    c.execute(
+        """CREATE TABLE IF NOT EXISTS backtest_runs
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  ticker TEXT,
+                  trades INTEGER,
+                  created_at TEXT)"""
+    )
+    c.execute(
+        "INSERT INTO backtest_runs (ticker, trades, created_at) VALUES (?, ?, datetime('now'))",
+        (ticker, len(trades)),
+    )
+    c.execute("DELETE FROM trades")
+    c.executemany(
+        """INSERT INTO trades
+                 (ticker, timestamp, decision, percentage, reason, btc_balance, krw_balance, btc_avg_buy_price, btc_krw_price, reflection)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        ((ticker, *row) for row in trades.itertuples(index=False, name=None)),
+    )
+    backfill_ts(conn)
+    conn.commit()
+    # 결과 DB의 손익/낙폭/승률 집계
+    rebuild_rollups(
+        conn,
+        pd.read_sql_query(f"SELECT {', '.join(METRIC_COLUMNS)} FROM trades ORDER BY ts, id", conn),
+    )
+
+
+def fetch_history(conn, ticker, interval, count):
+    """Upbit에서 과거 캔들 count개를 받아 캔들 저장소에 채운다"""
+    df = pyupbit.get_ohlcv(ticker, interval=interval, count=count)
+    if df is None:
+        raise Exception("차트 데이터 조회 실패")
+    return save_candles(conn, ticker, interval, df)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Replay stored candles through a trading strategy")
+    parser.add_argument("--ticker", default="KRW-BTC")
+    parser.add_argument("--interval", default="minute60")
+    parser.add_argument("--start", help="KST start time, e.g. 2024-01-01")
+    parser.add_argument("--end", help="KST end time")
+    parser.add_argument("--strategy", choices=["sma", "rsi", "recorded"], default="sma")
+    parser.add_argument("--krw", type=float, default=1_000_000, help="initial KRW balance")
+    parser.add_argument("--db", default="trading_history.db", help="candle store / recorded trades")
+    parser.add_argument("--out", default="backtest_results.db", help="result DB (trades schema)")
+    parser.add_argument("--fetch", type=int, default=0, help="download this many candles first")
+    args = parser.parse_args()
+
+    # 녹화된 거래를 ticker로 읽으므로 이전 스키마의 DB도 마이그레이션한다
+    conn = migrate(connect(args.db))
+    init_candle_store(conn)
+    if args.fetch:
+        saved = fetch_history(conn, args.ticker, args.interval, args.fetch)
+        logger.info(f"Stored {saved} {args.interval} candles for {args.ticker}")
+
+    df = load_candles(conn, args.ticker, args.interval, start=args.start, end=args.end)
+    if df.empty:
+        raise SystemExit("No candles in store; run with --fetch N first")
+
+    if args.strategy == "sma":
+        strategy = sma_cross_strategy
+    elif args.strategy == "rsi":
+        strategy = rsi_strategy
+    else:
+        recorded = load_trades(
+            conn,
+            ticker=args.ticker,
+            columns=["timestamp", "decision", "percentage", "reason"],
+        )
+        strategy = recorded_strategy(recorded)
+    conn.close()
+
+    trades, summary = run_backtest(df, strategy, args.krw)
+
+    out = init_db(args.out)
+    try:
+        write_results(out, trades, args.ticker)
+    except ValueError as e:
+        raise SystemExit(f"{e}: {args.out} (choose another --out)")
+    finally:
+        out.close()
+
+    for key, value in summary.items():
+        print(f"{key:<18}: {value:,.2f}" if isinstance(value, float) else f"{key:<18}: {value}")
+    print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
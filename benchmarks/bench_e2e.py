@@ -0,0 +1,190 @@
+"""
+종단 간 거래 사이클 벤치마크
+
+mock_services.MockServer를 띄우고 봇의 모든 외부 요청(Upbit, alternative.me,
+SerpAPI, OpenAI)을 그쪽으로 보낸 뒤 ai_trading()을 여러 마켓에 대해 반복 실행한다.
+네트워크 없이 실행되며, 임시 디렉터리에서 DB/캐시 파일을 새로 만든다.
+
+처리량(마켓 사이클/초), 마켓 사이클과 라운드의 p50/p99 지연 시간, 단계별 p50/p99
+(cycle_traces), 메모리(tracemalloc, 최대 RSS), 모의 서버의 요청/오류/요청 제한 수를 출력한다.
+
+    python benchmarks/bench_e2e.py --rounds 20 --tickers KRW-BTC,KRW-ETH,KRW-XRP
+    python benchmarks/bench_e2e.py --openai-latency 0 --error-rate 0.02 --json result.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import mock_services  # noqa: E402
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+def stage_breakdown(traces):
+    stages = {}
+    for trace in traces:
+        for stage, ms in trace["stages"].items():
+            stages.setdefault(stage, []).append(ms)
+    return {
+        stage: {"p50_ms": percentile(values, 50), "p99_ms": percentile(values, 99), "count": len(values)}
+        for stage, values in sorted(stages.items())
+    }
+
+
+def run(args, server):
+    # 봇 모듈은 import 시점에 환경 변수와 상대 경로(DB, 캐시 파일)를 읽으므로
+    # 서버 주소와 작업 디렉터리를 정한 뒤 import한다
+    os.environ.update(server.env())
+    os.environ["TRADING_TICKERS"] = args.tickers
+    os.environ["MAX_CONCURRENT_MARKETS"] = str(args.concurrency)
+    os.environ["REFLECTION_MODE"] = args.reflection_mode
+    os.environ["PREFILTER_ENABLED"] = "true" if args.prefilter else "false"
+    os.environ["LLM_CACHE_MODE"] = "passthrough"
+    # 오프라인에서는 tiktoken 인코딩 파일을 받을 수 없으므로 글자 수로 추정한다
+    os.environ.setdefault("TOKEN_COUNT_MODE", "estimate")
+    os.environ.setdefault("OPENAI_MAX_RETRIES", "0")
+
+    import autotrading
+    from multi_market import get_trading_tickers, run_markets
+    from tracing import load_traces
+
+    tickers = get_trading_tickers()
+    autotrading.clients.install_upbit_session()
+    autotrading.trade_store.open()
+
+    market_latencies = []
+    round_latencies = []
+    failures = 0
+
+    def trade(ticker, quote):
+        started = time.perf_counter()
+        try:
+            autotrading.ai_trading(ticker, quote)
+        finally:
+            market_latencies.append(time.perf_counter() - started)
+
+    # 첫 라운드는 캔들 저장소 초기 적재가 포함되므로 측정에서 뺀다
+    for _ in range(args.warmup):
+        autotrading.account_state.invalidate()
+        run_markets(tickers, trade)
+    market_latencies.clear()
+
+    if args.trace_memory:
+        tracemalloc.start()
+    memory_after_first = None
+    started = time.perf_counter()
+    for i in range(args.rounds):
+        round_started = time.perf_counter()
+        autotrading.account_state.invalidate()
+        results = run_markets(tickers, trade)
+        failures += sum(1 for error in results.values() if error is not None)
+        round_latencies.append(time.perf_counter() - round_started)
+        if args.trace_memory and i == 0:
+            memory_after_first = tracemalloc.get_traced_memory()[0]
+    elapsed = time.perf_counter() - started
+
+    memory = {"max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    if args.trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory.update(
+            traced_current_mb=current / 2**20,
+            traced_peak_mb=peak / 2**20,
+            # 첫 라운드 이후 증가량이 라운드 수에 비례하면 누수를 의심한다
+            traced_growth_mb=(current - memory_after_first) / 2**20,
+        )
+
+    with autotrading.trade_store.connection() as conn:
+        traces = load_traces(conn, limit=args.rounds * len(tickers))
+
+    autotrading.clients.close()
+    autotrading.trade_store.close()
+    autotrading.llm_cache.close()
+
+    market_cycles = args.rounds * len(tickers)
+    return {
+        "tickers": tickers,
+        "rounds": args.rounds,
+        "market_cycles": market_cycles,
+        "failures": failures,
+        "elapsed_s": elapsed,
+        "throughput_cycles_per_s": market_cycles / elapsed if elapsed else float("nan"),
+        "market_cycle_p50_s": percentile(market_latencies, 50),
+        "market_cycle_p99_s": percentile(market_latencies, 99),
+        "round_p50_s": percentile(round_latencies, 50),
+        "round_p99_s": percentile(round_latencies, 99),
+        "statuses": {s: sum(t["status"] == s for t in traces) for s in {t["status"] for t in traces}},
+        "llm_tokens": sum(t["total_tokens"] or 0 for t in traces),
+        "stages": stage_breakdown(traces),
+        "memory": memory,
+        "mock": server.stats,
+    }
+
+
+def report(result):
+    print(f"markets            : {', '.join(result['tickers'])}")
+    print(f"market cycles      : {result['market_cycles']} ({result['failures']} failed) in {result['elapsed_s']:.2f}s")
+    print(f"throughput         : {result['throughput_cycles_per_s']:.2f} market cycles/s")
+    print(f"market cycle       : p50 {result['market_cycle_p50_s']:.3f}s  p99 {result['market_cycle_p99_s']:.3f}s")
+    print(f"round (all markets): p50 {result['round_p50_s']:.3f}s  p99 {result['round_p99_s']:.3f}s")
+    print(f"cycle status       : {result['statuses']}")
+    print(f"llm tokens         : {result['llm_tokens']:,}")
+    print("stages (ms)        :")
+    for stage, values in result["stages"].items():
+        print(f"  {stage:<24} p50 {values['p50_ms']:9.1f}  p99 {values['p99_ms']:9.1f}  n={values['count']}")
+    print("memory (MB)        : " + ", ".join(f"{k}={v:.1f}" for k, v in result["memory"].items()))
+    print("mock services      :")
+    for service, stats in result["mock"].items():
+        print(f"  {service:<24} " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--tickers", default="KRW-BTC,KRW-ETH,KRW-XRP")
+    parser.add_argument("--concurrency", type=int, default=3, help="MAX_CONCURRENT_MARKETS")
+    parser.add_argument("--reflection-mode", default="async", choices=["sync", "async", "precompute"])
+    parser.add_argument("--prefilter", action="store_true", help="사전 필터를 켠다 (기본은 항상 LLM 호출)")
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false")
+    parser.add_argument("--json", help="결과를 JSON으로 저장할 경로 (CI 비교용)")
+    parser.add_argument("--verbose", action="store_true")
+    mock_services.add_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    shutil.copy(os.path.join(REPO_DIR, "strategy.txt"), workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with mock_services.MockServer(mock_services.config_from_args(args)) as server:
+            result = run(args, server)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
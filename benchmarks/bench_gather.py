@@ -0,0 +1,92 @@
+"""
+시장 데이터 수집 벤치마크
+
+실제 API 대신 지연 시간을 주입한 가짜 소스로 순차 수집과
+gather_market_data() 병렬 수집의 사이클 지연 시간을 비교한다.
+
+    python benchmarks/bench_gather.py --rounds 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from market_data import gather_market_data  # noqa: E402
+
+# 실제 사이클에서 관측되는 수준의 소스별 지연 시간 (초)
+LATENCIES = {
+    "status": 0.25,
+    "df_daily": 0.15,
+    "df_hourly": 0.15,
+    "orderbook": 0.10,
+    "fear_greed_index": 0.40,
+    "news_headlines": 0.80,
+}
+
+
+def make_source(name, latency, fail=False):
+    def fetch():
+        time.sleep(latency)
+        if fail:
+            raise RuntimeError(f"{name} unavailable")
+        return name
+
+    return fetch
+
+
+def make_sources(latencies, failing=()):
+    return {
+        name: make_source(name, latency, fail=name in failing)
+        for name, latency in latencies.items()
+    }
+
+
+def run_sequential(sources):
+    results = {}
+    for name, fetch in sources.items():
+        try:
+            results[name] = fetch()
+        except Exception:
+            results[name] = None
+    return results
+
+
+def measure(func, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    sources = make_sources(LATENCIES)
+    seq_best, seq_avg = measure(lambda: run_sequential(sources), args.rounds)
+    par_best, par_avg = measure(lambda: gather_market_data(sources), args.rounds)
+
+    print(f"sum of latencies   : {sum(LATENCIES.values()):.3f}s")
+    print(f"slowest source     : {max(LATENCIES.values()):.3f}s")
+    print(f"sequential (best)  : {seq_best:.3f}s  avg {seq_avg:.3f}s")
+    print(f"gather     (best)  : {par_best:.3f}s  avg {par_avg:.3f}s")
+    print(f"speedup            : {seq_best / par_best:.2f}x")
+
+    # 부분 실패 + 타임아웃: 뉴스는 타임아웃, 공포탐욕지수는 예외
+    sources = make_sources({**LATENCIES, "news_headlines": 2.0}, failing={"fear_greed_index"})
+    started = time.perf_counter()
+    results, errors = gather_market_data(sources, timeouts={"news_headlines": 0.5})
+    elapsed = time.perf_counter() - started
+    print(f"partial failure    : {elapsed:.3f}s, errors={errors}")
+    assert results["news_headlines"] is None and results["fear_greed_index"] is None
+    assert results["orderbook"] == "orderbook"
+
+
+if __name__ == "__main__":
+    main()
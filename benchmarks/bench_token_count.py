@@ -0,0 +1,103 @@
+"""
+토큰 계산 마이크로벤치마크
+
+한 사이클의 토큰 계산 비용을 기존 방식(호출마다 encoding_for_model,
+반성/결정 프롬프트를 각각 인코딩)과 token_accounting의 캐시된 인코더 +
+메모이즈 방식으로 비교한다. 두 번째 사이클부터는 고정 시스템 프롬프트가
+캐시에서 반환된다.
+
+    python benchmarks/bench_token_count.py --cycles 24
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import tiktoken
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from token_accounting import count_tokens, count_text_tokens  # noqa: E402
+
+
+def legacy_count_tokens(messages):
+    """이전 autotrading.count_tokens() 구현"""
+    encoding = tiktoken.encoding_for_model("gpt-4")
+    num_tokens = 0
+    for message in messages:
+        num_tokens += len(encoding.encode(message["role"]))
+        if isinstance(message["content"], str):
+            num_tokens += len(encoding.encode(message["content"]))
+        elif isinstance(message["content"], list):
+            for content_item in message["content"]:
+                if content_item["type"] == "text":
+                    num_tokens += len(encoding.encode(content_item["text"]))
+    num_tokens += 4
+    return num_tokens
+
+
+def load_strategy():
+    with open(os.path.join(ROOT, "strategy.txt"), "r", encoding="utf-8") as f:
+        text = f.read()
+    # strategy.txt가 비어 있으면 비슷한 길이의 대체 텍스트 사용
+    return text or ("Wonyyotti trading method transcript line. " * 400)
+
+
+def make_cycle(strategy, cycle):
+    system = f"You are an expert in Bitcoin investing.\n{strategy}"
+    reflection = f"Reflection for cycle {cycle}: " + "hold and wait. " * 80
+    market = "\n".join(
+        f"2026-01-01 {h:02d}:00,{150000000 + cycle * 1000 + h},{0.123 + h}" for h in range(24)
+    )
+    reflection_messages = [
+        {"role": "developer", "content": "You are an AI trading assistant."},
+        {"role": "user", "content": f"Last 24 trades data: {market * 3}"},
+    ]
+    decision_messages = [
+        {"role": "developer", "content": system},
+        {"role": "developer", "content": reflection},
+        {"role": "user", "content": [{"type": "text", "text": market}]},
+    ]
+    return reflection_messages, decision_messages, market
+
+
+def run_legacy(cycles):
+    for reflection_messages, decision_messages, _ in cycles:
+        legacy_count_tokens(reflection_messages)
+        legacy_count_tokens(decision_messages)
+
+
+def run_cached(cycles):
+    for reflection_messages, decision_messages, market in cycles:
+        count_text_tokens(market)  # 시장 데이터 예산 확인
+        count_tokens(reflection_messages)
+        count_tokens(decision_messages)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cycles", type=int, default=24)
+    args = parser.parse_args()
+
+    strategy = load_strategy()
+    cycles = [make_cycle(strategy, i) for i in range(args.cycles)]
+
+    started = time.perf_counter()
+    run_legacy(cycles)
+    legacy = (time.perf_counter() - started) / args.cycles
+
+    count_text_tokens.cache_clear()
+    started = time.perf_counter()
+    run_cached(cycles)
+    cached = (time.perf_counter() - started) / args.cycles
+
+    print(f"legacy : {legacy * 1e3:.3f} ms/cycle")
+    print(f"cached : {cached * 1e3:.3f} ms/cycle")
+    print(f"saving : {(legacy - cached) * 1e3:.3f} ms/cycle ({legacy / cached:.1f}x)")
+    print(f"cache  : {count_text_tokens.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
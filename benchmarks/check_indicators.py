@@ -0,0 +1,105 @@
+"""
+스트리밍 지표 엔진 검증 및 벤치마크
+
+indicators.py의 결과를 add_indicators()(ta)와 비교하고,
+캔들 하나가 추가될 때의 갱신 비용을 전체 재계산과 비교한다.
+캔들 저장소에 데이터가 있으면 그것을, 없으면 합성 데이터를 사용한다.
+
+    python benchmarks/check_indicators.py --candles 2000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from autotrading import add_indicators  # noqa: E402
+from candle_store import load_candles  # noqa: E402
+from indicators import INDICATOR_COLUMNS, IndicatorEngine, compute_indicators  # noqa: E402
+
+
+def load_history(count):
+    db_path = os.path.join(ROOT, "trading_history.db")
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        df = load_candles(conn, "KRW-BTC", "minute60", count=count)
+        if len(df) >= 100:
+            return df, "candle store"
+    except sqlite3.OperationalError:
+        pass
+    finally:
+        conn.close()
+
+    rng = np.random.default_rng(42)
+    close = 1.5e8 * np.exp(np.cumsum(rng.normal(0, 0.005, count)))
+    df = pd.DataFrame(
+        {
+            "open": close,
+            "high": close * 1.002,
+            "low": close * 0.998,
+            "close": close,
+            "volume": rng.random(count),
+            "value": rng.random(count),
+        },
+        index=pd.date_range("2024-01-01", periods=count, freq="h"),
+    )
+    return df, "synthetic"
+
+
+def check(df, rtol=1e-8):
+    expected = add_indicators(df.copy())
+    actual = compute_indicators(df)
+    ok = True
+    for column in INDICATOR_COLUMNS:
+        e = expected[column].to_numpy(dtype=float)
+        a = actual[column].to_numpy(dtype=float)
+        same = np.allclose(e, a, rtol=rtol, atol=1e-6, equal_nan=True)
+        ok &= same
+        err = np.nanmax(np.abs(e - a)) if np.isfinite(e).any() else 0.0
+        print(f"  {column:<12} {'ok' if same else 'MISMATCH'}  max abs err {err:.3e}")
+    return ok
+
+
+def bench(df, ticks):
+    # ta: 캔들이 추가될 때마다 전체 재계산
+    started = time.perf_counter()
+    for i in range(len(df) - ticks, len(df)):
+        add_indicators(df.iloc[: i + 1].copy())
+    full = (time.perf_counter() - started) / ticks
+
+    engine = IndicatorEngine()
+    closes = df["close"].to_numpy(dtype=float)
+    for close in closes[:-ticks]:
+        engine.push(close)
+    started = time.perf_counter()
+    for close in closes[-ticks:]:
+        engine.push(close)
+    incremental = (time.perf_counter() - started) / ticks
+
+    print(f"  full recompute : {full * 1e3:.3f} ms/tick")
+    print(f"  incremental    : {incremental * 1e6:.2f} us/tick")
+    print(f"  speedup        : {full / incremental:.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candles", type=int, default=2000)
+    parser.add_argument("--ticks", type=int, default=100)
+    args = parser.parse_args()
+
+    df, source = load_history(args.candles)
+    print(f"{len(df)} candles ({source})")
+    ok = check(df)
+    bench(df, min(args.ticks, len(df) - 1))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+로컬 OHLCV 캔들 저장소
+
+trading_history.db의 candles 테이블에 캔들을 저장해 두고, 매 사이클마다
+마지막으로 저장된 캔들 이후의 데이터만 Upbit에서 받아온다.
+add_indicators()에 필요한 구간은 로컬 DB에서 읽어 반환하며,
+쌓인 이력은 백테스트에도 사용할 수 있다.
+
+타임스탬프(ts)는 pyupbit가 반환하는 KST 기준 캔들 시각을 epoch 초로 저장한다.
+"""
+
+import logging
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pyupbit
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "trading_history.db"
+
+# 저장소가 비어 있을 때 처음 받아올 캔들 수 (지표 계산용 이력 확보)
+INITIAL_HISTORY = 200
+
+# 한 번에 메우는 최대 누락 캔들 수
+MAX_BACKFILL = 2000
+
+COLUMNS = ["open", "high", "low", "close", "volume", "value"]
+
+
+def init_candle_store(conn):
+    c = conn.cursor()
+    c.execute(
+        """CREATE TABLE IF NOT EXISTS candles
+                 (ticker TEXT NOT NULL,
+                  interval TEXT NOT NULL,
+                  ts INTEGER NOT NULL,
+                  open REAL,
+                  high REAL,
+                  low REAL,
+                  close REAL,
+                  volume REAL,
+                  value REAL,
+                  PRIMARY KEY (ticker, interval, ts))"""
+    )
+    conn.commit()
+
+
+def interval_seconds(interval):
+    """pyupbit interval 문자열을 초 단위 길이로 변환"""
+    if interval in ("day", "days"):
+        return 86400
+    if interval in ("week", "weeks"):
+        return 7 * 86400
+    if interval.startswith("minute"):
+        return int(interval.rstrip("s").replace("minute", "")) * 60
+    raise ValueError(f"Unsupported candle interval: {interval}")
+
+
+def _to_ts(index):
+    return (pd.DatetimeIndex(index).as_unit("s").asi8).tolist()
+
+
+def _now_kst():
+    return datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=9)
+
+
+def get_last_ts(conn, ticker, interval):
+    c = conn.cursor()
+    c.execute(
+        "SELECT MAX(ts) FROM candles WHERE ticker = ? AND interval = ?",
+        (ticker, interval),
+    )
+    return c.fetchone()[0]
+
+
+def save_candles(conn, ticker, interval, df):
+    """캔들 DataFrame을 저장한다. 진행 중이던 마지막 캔들은 새 값으로 덮어쓴다."""
+    if df is None or df.empty:
+        return 0
+    df = df.reindex(columns=COLUMNS)
+    rows = [
+        (ticker, interval, ts, *values)
+        for ts, values in zip(_to_ts(df.index), df.itertuples(index=False, name=None))
+    ]
+    c = conn.cursor()
+    c.executemany(
+        """INSERT OR REPLACE INTO candles
+                 (ticker, interval, ts, open, high, low, close, volume, value)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        rows,
+    )
+    conn.commit()
+    return len(rows)
+
+
+def sync_candles(conn, ticker, interval, count=INITIAL_HISTORY):
+    """
+    마지막으로 저장된 캔들 이후의 캔들만 받아와 저장한다.
+
+    마지막 저장 캔들은 조회 당시 아직 진행 중이었을 수 있으므로 함께 다시 받는다.
+
+    Returns:
+        int: 저장(갱신)된 캔들 수. 조회 실패 시 -1
+    """
+    last_ts = get_last_ts(conn, ticker, interval)
+    if last_ts is None:
+        fetch_count = max(count, INITIAL_HISTORY)
+    else:
+        elapsed = _now_kst() - pd.Timestamp(last_ts, unit="s").to_pydatetime()
+        missing = int(elapsed.total_seconds() // interval_seconds(interval)) + 1
+        fetch_count = min(max(missing, 1), MAX_BACKFILL)
+
+    df = pyupbit.get_ohlcv(ticker, interval=interval, count=fetch_count)
+    if df is None:
+        logger.warning(f"Candle fetch failed for {ticker} {interval}")
+        return -1
+    saved = save_candles(conn, ticker, interval, df)
+    logger.info(f"Synced {saved} {interval} candles for {ticker}")
+    return saved
+
+
+def load_candles(conn, ticker, interval, count=None, start=None, end=None):
+    """
+    저장된 캔들을 pyupbit.get_ohlcv()와 같은 형태의 DataFrame으로 반환한다.
+
+    Args:
+        count (int, optional): 최근 count개만 반환
+        start, end (datetime, optional): KST 기준 조회 구간
+    """
+    query = "SELECT ts, open, high, low, close, volume, value FROM candles WHERE ticker = ? AND interval = ?"
+    params = [ticker, interval]
+    if start is not None:
+        query += " AND ts >= ?"
+        params.append(_to_ts([start])[0])
+    if end is not None:
+        query += " AND ts <= ?"
+        params.append(_to_ts([end])[0])
+    query += " ORDER BY ts DESC"
+    if count is not None:
+        query += " LIMIT ?"
+        params.append(count)
+
+    c = conn.cursor()
+    c.execute(query, params)
+    rows = c.fetchall()
+    df = pd.DataFrame.from_records(rows, columns=["ts"] + COLUMNS)
+    df.index = pd.to_datetime(df.pop("ts"), unit="s")
+    df.index.name = None
+    return df.sort_index()
+
+
+def get_candles(ticker, interval, count, db_path=DB_PATH):
+    """
+    로컬 저장소를 갱신한 뒤 최근 count개의 캔들을 반환한다.
+
+    Upbit 조회에 실패해도 저장된 캔들이 있으면 그대로 반환한다.
+    워커 스레드에서 호출되므로 호출마다 별도 연결을 사용한다.
+    """
+    conn = sqlite3.connect(db_path, timeout=10)
+    try:
+        init_candle_store(conn)
+        synced = sync_candles(conn, ticker, interval, count)
+        df = load_candles(conn, ticker, interval, count=count)
+        if df.empty:
+            return None
+        if synced < 0:
+            logger.warning(
+                f"Serving stored {interval} candles for {ticker} up to {df.index[-1]}"
+            )
+        return df
+    finally:
+        conn.close()
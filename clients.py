@@ -0,0 +1,155 @@
+"""
+장기 실행용 클라이언트 레지스트리
+
+스케줄 실행마다 OpenAI/Upbit 객체를 새로 만들고 requests.get으로 매번 새 TLS
+연결을 여는 대신, 서비스별로 keep-alive 커넥션 풀을 가진 세션과 클라이언트를
+프로세스 전체에서 공유한다.
+
+서비스별 타임아웃과 풀 크기는 환경 변수로 바꿀 수 있다.
+    {SERVICE}_TIMEOUT, {SERVICE}_POOL_SIZE (예: UPBIT_TIMEOUT=5, OPENAI_POOL_SIZE=4)
+
+{SERVICE}_BASE_URL을 지정하면 해당 서비스 요청의 scheme/host를 바꿔 보낸다
+(예: UPBIT_BASE_URL=http://127.0.0.1:8765, mock_services.py 참고).
+OpenAI 클라이언트는 OPENAI_BASE_URL을 직접 읽는다.
+
+Upbit 세션의 요청은 rate_limiter.RateLimiter를 거친다 (UPBIT_RATE_LIMIT=off로 끌 수 있다).
+"""
+
+import logging
+import os
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+import pyupbit
+import pyupbit.request_api
+import requests
+from openai import DefaultHttpxClient, OpenAI
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import RateLimiter
+from resilience import call_timeout
+
+logger = logging.getLogger(__name__)
+
+# 서비스별 기본 설정
+CLIENT_SETTINGS = {
+    "upbit": {"timeout": 5.0, "pool_size": 16, "rate_limit": "on"},
+    "alternative_me": {"timeout": 5.0, "pool_size": 2},
+    "serpapi": {"timeout": 10.0, "pool_size": 2},
+    "openai": {"timeout": 60.0, "pool_size": 8, "max_retries": 2},
+}
+
+
+class PooledSession(requests.Session):
+    """기본 타임아웃과 커넥션 풀 크기가 지정된 requests 세션"""
+
+    def __init__(self, timeout, pool_size, base_url=None, limiter=None):
+        super().__init__()
+        self.timeout = timeout
+        self.base_url = urlsplit(base_url) if base_url else None
+        self.limiter = limiter
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        # resilience.call() 안에서는 남은 시도 시간을 넘기지 않는다
+        kwargs.setdefault("timeout", call_timeout(self.timeout))
+        if self.base_url is not None:
+            url = urlunsplit(urlsplit(url)._replace(scheme=self.base_url.scheme, netloc=self.base_url.netloc))
+        if self.limiter is None:
+            return super().request(method, url, **kwargs)
+        # 토큰 대기도 요청 타임아웃 안에서 끝나야 한다
+        timeout = kwargs["timeout"]
+        return self.limiter.request(
+            lambda: super(PooledSession, self).request(method, url, **kwargs),
+            method,
+            url,
+            timeout=timeout if isinstance(timeout, (int, float)) else None,
+        )
+
+
+class ClientRegistry:
+    def __init__(self, settings=None):
+        self.settings = {
+            name: dict(values) for name, values in (settings or CLIENT_SETTINGS).items()
+        }
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._openai = None
+        self._upbit = None
+
+    def setting(self, service, key):
+        env = os.getenv(f"{service.upper()}_{key.upper()}")
+        default = self.settings.get(service, {}).get(key)
+        if env is None:
+            return default
+        return type(default)(env) if default is not None else env
+
+    def session(self, service):
+        with self._lock:
+            if service not in self._sessions:
+                self._sessions[service] = PooledSession(
+                    timeout=self.setting(service, "timeout"),
+                    pool_size=self.setting(service, "pool_size"),
+                    base_url=self.setting(service, "base_url"),
+                    limiter=self._limiter(service),
+                )
+            return self._sessions[service]
+
+    def _limiter(self, service):
+        if service != "upbit" or str(self.setting(service, "rate_limit")).lower() in ("off", "false", "0"):
+            return None
+        return RateLimiter()
+
+    def openai(self):
+        with self._lock:
+            if self._openai is None:
+                pool_size = self.setting("openai", "pool_size")
+                self._openai = OpenAI(
+                    timeout=self.setting("openai", "timeout"),
+                    max_retries=self.setting("openai", "max_retries"),
+                    http_client=DefaultHttpxClient(
+                        limits=httpx.Limits(
+                            max_connections=pool_size,
+                            max_keepalive_connections=pool_size,
+                        )
+                    ),
+                )
+            return self._openai
+
+    def install_upbit_session(self):
+        """
+        pyupbit는 모듈 수준의 requests.get/post/delete를 호출하므로
+        같은 인터페이스를 가진 풀링 세션으로 교체한다.
+        """
+        session = self.session("upbit")
+        if pyupbit.request_api.requests is not session:
+            pyupbit.request_api.requests = session
+        return session
+
+    def upbit(self):
+        self.install_upbit_session()
+        with self._lock:
+            if self._upbit is None:
+                self._upbit = pyupbit.Upbit(
+                    access=os.getenv("UPBIT_ACCESS_KEY"),
+                    secret=os.getenv("UPBIT_SECRET_KEY"),
+                )
+            return self._upbit
+
+    def close(self):
+        with self._lock:
+            if pyupbit.request_api.requests is self._sessions.get("upbit"):
+                pyupbit.request_api.requests = requests
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            if self._openai is not None:
+                self._openai.close()
+                self._openai = None
+            self._upbit = None
+
+
+clients = ClientRegistry()
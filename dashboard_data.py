@@ -0,0 +1,175 @@
+"""
+대시보드 데이터 로딩
+
+- 차트용 지표 컬럼은 한 번 읽어 메모리에 두고, 새로고침 때는 마지막으로 본
+  id 이후의 행만 추가로 읽는다 (타임스탬프 파싱도 새 행에만 한다)
+- 거래 기록 표는 필터(마켓, 결정, 기간)를 SQL WHERE로 넘기고 페이지 단위로 읽는다.
+  SQLite의 행을 다 넘기면 아카이브(Parquet)로 옮겨진 행을 이어서 읽는다
+
+streamlit에 의존하지 않으므로 대시보드 밖에서도 사용할 수 있다.
+"""
+
+import threading
+import time
+from datetime import datetime, time as dt_time
+
+import pandas as pd
+
+from archive import ARCHIVE_DIR, METRIC_COLUMNS, load_trades
+from trade_store import connect
+
+HISTORY_COLUMNS = [
+    "id",
+    "timestamp",
+    "ticker",
+    "decision",
+    "percentage",
+    "reason",
+    "btc_balance",
+    "krw_balance",
+    "btc_krw_price",
+]
+
+
+def _add_derived(df, positions):
+    """
+    positions(마켓 -> 마지막 코인 평가액)는 이전 행까지의 상태이며 새 행을 반영해 갱신된다.
+    """
+    # timestamp 컬럼과 같은 로컬 시간
+    offset = pd.Timedelta(seconds=time.localtime().tm_gmtoff)
+    df["datetime"] = pd.to_datetime(df["ts"], unit="s") + offset
+    # 코인 평가액과 총 KRW 가치는 새 행을 읽을 때 한 번만 계산한다
+    df["btc_value_in_krw"] = df["btc_balance"] * df["btc_krw_price"]
+    # 계좌 전체 가치: 공유 KRW 잔고 + 마켓별 마지막 코인 평가액 (KRW는 한 번만 더한다)
+    coin = df.pivot(columns="ticker", values="btc_value_in_krw")
+    coin = pd.concat([pd.DataFrame([positions], columns=coin.columns.union(list(positions))), coin])
+    coin = coin.ffill().fillna(0).iloc[1:]
+    df["total_value_in_krw"] = df["krw_balance"] + coin.sum(axis=1).to_numpy()
+    if not coin.empty:
+        positions.update(coin.iloc[-1].to_dict())
+    return df
+
+
+class TradeCache:
+    """프로세스 안에서 공유되는 증분 갱신 DataFrame (ts 오름차순)"""
+
+    def __init__(self, db_path, archive_dir=ARCHIVE_DIR):
+        self.db_path = db_path
+        self.archive_dir = archive_dir
+        self._lock = threading.Lock()
+        self.df = None
+        self.last_id = 0
+        self._positions = {}
+
+    def refresh(self):
+        with self._lock:
+            conn = connect(self.db_path, readonly=True)
+            try:
+                if self.df is None:
+                    # 처음에는 아카이브까지 포함해 전체 지표 컬럼을 읽는다
+                    new = load_trades(conn, columns=METRIC_COLUMNS, archive_dir=self.archive_dir)
+                else:
+                    new = pd.read_sql_query(
+                        f"SELECT {', '.join(METRIC_COLUMNS)} FROM trades WHERE id > ? ORDER BY ts, id",
+                        conn,
+                        params=(self.last_id,),
+                    )
+            finally:
+                conn.close()
+
+            if not new.empty:
+                new = _add_derived(new, self._positions)
+                self.df = new if self.df is None else pd.concat([self.df, new], ignore_index=True)
+                self.last_id = int(self.df["id"].max())
+            elif self.df is None:
+                self.df = _add_derived(new, self._positions)
+            return self.df
+
+
+def _ts_range(date_range):
+    """(시작일, 종료일) -> 로컬 자정 기준 epoch 초 구간"""
+    start, end = date_range
+    start_ts = int(datetime.combine(start, dt_time.min).timestamp())
+    end_ts = int(datetime.combine(end, dt_time.max).timestamp())
+    return start_ts, end_ts
+
+
+def filter_trades(df, tickers=None, decisions=None, date_range=None):
+    """캐시된 DataFrame에 query_history()와 같은 필터를 적용 (차트/요약 지표용)"""
+    mask = pd.Series(True, index=df.index)
+    if tickers is not None:
+        mask &= df["ticker"].isin(tickers)
+    if decisions is not None:
+        mask &= df["decision"].isin(decisions)
+    if date_range:
+        start_ts, end_ts = _ts_range(date_range)
+        mask &= df["ts"].between(start_ts, end_ts)
+    return df[mask]
+
+
+def _where(tickers=None, decisions=None, date_range=None):
+    clauses, params = [], []
+    # None은 필터 없음, 빈 리스트는 아무것도 선택하지 않은 것
+    for column, values in (("ticker", tickers), ("decision", decisions)):
+        if values is not None:
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})" if values else "0")
+            params += list(values)
+    if date_range:
+        clauses.append("ts BETWEEN ? AND ?")
+        params += list(_ts_range(date_range))
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _archived(conn, archive_dir, columns, tickers=None, decisions=None, start_ts=None, end_ts=None):
+    """
+    아카이브로 옮겨진 거래 중 필터에 맞는 행 (ts 오름차순).
+    아카이브된 행은 모두 SQLite에 남은 가장 오래된 행보다 오래되었으므로 구간 끝을 그 앞으로 자른다.
+    """
+    live_start = conn.execute("SELECT MIN(ts) FROM trades").fetchone()[0]
+    if live_start is not None:
+        end_ts = live_start - 1 if end_ts is None else min(end_ts, live_start - 1)
+    if start_ts is not None and end_ts is not None and start_ts > end_ts:
+        return pd.DataFrame(columns=columns)
+    df = load_trades(conn, start_ts=start_ts, end_ts=end_ts, columns=columns, archive_dir=archive_dir)
+    return filter_trades(df, tickers=tickers, decisions=decisions)
+
+
+def count_history(conn, archive_dir=ARCHIVE_DIR, tickers=None, decisions=None, date_range=None):
+    """필터에 맞는 거래 수 (아카이브 포함)"""
+    where, params = _where(tickers=tickers, decisions=decisions, date_range=date_range)
+    live = conn.execute(f"SELECT COUNT(*) FROM trades{where}", params).fetchone()[0]
+    start_ts, end_ts = _ts_range(date_range) if date_range else (None, None)
+    archived = _archived(conn, archive_dir, ["id", "ts", "ticker", "decision"], tickers, decisions, start_ts, end_ts)
+    return live + len(archived)
+
+
+def query_history(conn, page=1, page_size=50, archive_dir=ARCHIVE_DIR, tickers=None, decisions=None, date_range=None):
+    """
+    필터를 적용한 거래 기록 한 페이지 (최신순).
+    SQLite의 행을 먼저 보여 주고, 그 뒤 페이지는 아카이브에서 읽는다.
+    """
+    where, params = _where(tickers=tickers, decisions=decisions, date_range=date_range)
+    offset = (page - 1) * page_size
+    query = (
+        f"SELECT {', '.join(HISTORY_COLUMNS)} FROM trades{where} "
+        "ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?"
+    )
+    live = pd.read_sql_query(query, conn, params=params + [page_size, offset])
+    remaining = page_size - len(live)
+    if not remaining:
+        return live
+
+    # 아카이브에서는 지표 컬럼으로 페이지의 행을 고른 뒤 그 구간의 텍스트만 읽는다
+    live_total = conn.execute(f"SELECT COUNT(*) FROM trades{where}", params).fetchone()[0]
+    archived_offset = max(0, offset - live_total)
+    start_ts, end_ts = _ts_range(date_range) if date_range else (None, None)
+    keys = _archived(conn, archive_dir, ["id", "ts", "ticker", "decision"], tickers, decisions, start_ts, end_ts)
+    keys = keys.sort_values(["ts", "id"], ascending=False).iloc[archived_offset : archived_offset + remaining]
+    if keys.empty:
+        return live
+    rows = _archived(
+        conn, archive_dir, HISTORY_COLUMNS + ["ts"], tickers, decisions, int(keys["ts"].min()), int(keys["ts"].max())
+    )
+    rows = rows[rows["id"].isin(keys["id"])].sort_values(["ts", "id"], ascending=False)[HISTORY_COLUMNS]
+    frames = [frame for frame in (live, rows) if not frame.empty]
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,308 @@
+"""
+주문 실행
+
+시장가 주문 후 고정 1초를 기다리고 잔고를 다시 조회하는 대신, 주문 UUID로
+체결 상태를 백오프하며 조회해 확정된 체결가/수량/수수료를 받는다.
+
+이미 받아 둔 호가로 예상 슬리피지를 계산해 EXECUTION_MAX_IMPACT를 넘는 큰 주문은
+최대 EXECUTION_MAX_SLICES개로 나누어 EXECUTION_SLICE_INTERVAL초 간격으로
+실행한다 (TWAP). 각 조각은 최소 주문 금액(5,000 KRW) 이상이어야 한다.
+
+체결 내역은 order_fills 테이블에 trades 행의 id와 함께 저장한다.
+"""
+
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+MIN_ORDER_KRW = 5000
+# 체결이 끝난 주문 상태 (시장가 매수는 남은 금액이 취소되며 cancel로 끝날 수 있다)
+FINAL_STATES = ("done", "cancel")
+
+
+def init_executions(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS order_fills
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  trade_id INTEGER,
+                  ticker TEXT,
+                  order_uuid TEXT,
+                  side TEXT,
+                  slice INTEGER,
+                  state TEXT,
+                  price REAL,
+                  volume REAL,
+                  funds REAL,
+                  fee REAL,
+                  created_at TEXT)"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_fills_trade_id ON order_fills (trade_id)")
+    conn.commit()
+
+
+@dataclass
+class ExecutionConfig:
+    # 체결 확인 조회 간격 (초): initial부터 두 배씩, max까지
+    poll_initial: float = 0.1
+    poll_max: float = 1.0
+    fill_timeout: float = 10.0
+    # 호가 기준 예상 가격 영향이 이보다 크면 나누어 실행한다
+    max_impact: float = 0.002
+    max_slices: int = 5
+    slice_interval: float = 2.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            poll_initial=float(os.getenv("EXECUTION_POLL_INITIAL", cls.poll_initial)),
+            poll_max=float(os.getenv("EXECUTION_POLL_MAX", cls.poll_max)),
+            fill_timeout=float(os.getenv("EXECUTION_FILL_TIMEOUT", cls.fill_timeout)),
+            max_impact=float(os.getenv("EXECUTION_MAX_IMPACT", cls.max_impact)),
+            max_slices=int(os.getenv("EXECUTION_MAX_SLICES", cls.max_slices)),
+            slice_interval=float(os.getenv("EXECUTION_SLICE_INTERVAL", cls.slice_interval)),
+        )
+
+
+@dataclass
+class Fill:
+    """주문 하나의 체결 결과"""
+
+    order_uuid: str
+    side: str
+    state: str
+    volume: float = 0.0
+    # 체결 금액을 알 수 없으면 None (가격을 0으로 기록하지 않도록)
+    funds: float = 0.0
+    fee: float = 0.0
+    slice: int = 0
+
+    @property
+    def price(self):
+        return self.funds / self.volume if self.volume and self.funds else None
+
+    @classmethod
+    def from_order(cls, order, slice=0):
+        """get_individual_order() 응답의 체결 목록을 합산"""
+        trades = order.get("trades") or []
+        if trades:
+            volume = sum(float(t["volume"]) for t in trades)
+            funds = sum(float(t["funds"]) for t in trades)
+        else:
+            # 체결 목록이 없는 응답은 주문 자체의 체결 수량/금액을 쓴다
+            volume = float(order.get("executed_volume") or 0)
+            funds = _executed_funds(order, volume)
+        return cls(
+            order_uuid=order["uuid"],
+            side=order["side"],
+            state=order["state"],
+            volume=volume,
+            funds=funds,
+            fee=float(order.get("paid_fee") or 0),
+            slice=slice,
+        )
+
+
+def _executed_funds(order, volume):
+    """체결 목록 없이 주문 응답만으로 구한 체결 금액. 알 수 없으면 None"""
+    if not volume:
+        return 0.0
+    if order.get("executed_funds") is not None:
+        return float(order["executed_funds"])
+    # 지정가 주문의 price는 단가다 (시장가 매수의 price는 주문 총액, 시장가 매도는 없음)
+    if order.get("ord_type") == "limit" and order.get("price"):
+        return float(order["price"]) * volume
+    return None
+
+
+@dataclass
+class ExecutionResult:
+    ticker: str
+    side: str
+    fills: list = field(default_factory=list)
+
+    @property
+    def executed(self):
+        return self.volume > 0
+
+    @property
+    def volume(self):
+        return sum(f.volume for f in self.fills)
+
+    @property
+    def funds(self):
+        return sum(f.funds or 0.0 for f in self.fills)
+
+    @property
+    def fee(self):
+        return sum(f.fee for f in self.fills)
+
+    @property
+    def avg_price(self):
+        """수수료를 제외한 평균 체결가. 체결 금액을 모르는 주문이 있으면 None"""
+        if not self.volume or any(f.volume and f.price is None for f in self.fills):
+            return None
+        return self.funds / self.volume
+
+    def summary(self):
+        if not self.executed:
+            return f"[{self.ticker}] {self.side} not filled"
+        price = f"{self.avg_price:,.2f}" if self.avg_price is not None else "unknown price"
+        return (
+            f"[{self.ticker}] {self.side} filled {self.volume:.8f} @ {price} "
+            f"(funds {self.funds:,.0f}, fee {self.fee:,.2f}, {len(self.fills)} orders)"
+        )
+
+
+def estimate_impact(side, amount, orderbook):
+    """
+    호가를 따라 체결했을 때 최우선 호가 대비 평균 체결가의 차이 비율.
+    매수는 amount(KRW)만큼 매도 호가를, 매도는 amount(수량)만큼 매수 호가를 소진한다.
+    호가 잔량이 부족하면 inf를 반환한다.
+    """
+    units = (orderbook or {}).get("orderbook_units") or []
+    if not units or amount <= 0:
+        return 0.0
+    price_key, size_key = ("ask_price", "ask_size") if side == "bid" else ("bid_price", "bid_size")
+    best = units[0][price_key]
+    remaining, volume, funds = amount, 0.0, 0.0
+    for unit in units:
+        price, size = unit[price_key], unit[size_key]
+        if side == "bid":
+            take = min(remaining, price * size)
+            volume += take / price
+            funds += take
+        else:
+            take = min(remaining, size)
+            volume += take
+            funds += take * price
+        remaining -= take
+        if remaining <= 1e-12:
+            break
+    else:
+        return float("inf")
+    return abs(funds / volume - best) / best
+
+
+def plan_slices(side, amount, orderbook, price, config):
+    """
+    주문을 나눌 조각 수. 조각 하나의 예상 가격 영향이 max_impact 이하가 될 때까지
+    늘리되 max_slices와 최소 주문 금액을 넘지 않는다.
+    """
+    notional = amount if side == "bid" else amount * price
+    limit = max(1, min(config.max_slices, int(notional // MIN_ORDER_KRW)))
+    slices = 1
+    while slices < limit and estimate_impact(side, amount / slices, orderbook) > config.max_impact:
+        slices += 1
+    return slices
+
+
+class OrderExecutor:
+    def __init__(self, upbit_factory, config=None, sleep=time.sleep):
+        self._upbit_factory = upbit_factory
+        self._config = config
+        self._sleep = sleep
+
+    @property
+    def config(self):
+        """지정하지 않았으면 처음 사용할 때 EXECUTION_* 환경 변수(.env 포함)에서 읽는다"""
+        if self._config is None:
+            self._config = ExecutionConfig.from_env()
+        return self._config
+
+    def wait_for_fill(self, order_uuid):
+        """주문이 끝날 때까지 백오프하며 조회한다. 시간 안에 끝나지 않으면 마지막 상태를 반환"""
+        upbit = self._upbit_factory()
+        delay = self.config.poll_initial
+        deadline = time.monotonic() + self.config.fill_timeout
+        order = None
+        while True:
+            order = upbit.get_individual_order(order_uuid) or order
+            if order is not None and order.get("state") in FINAL_STATES:
+                return order
+            if time.monotonic() + delay > deadline:
+                logger.warning(f"Order {order_uuid} not final after {self.config.fill_timeout}s")
+                return order
+            self._sleep(delay)
+            delay = min(delay * 2, self.config.poll_max)
+
+    def _place(self, ticker, side, amount):
+        upbit = self._upbit_factory()
+        if side == "bid":
+            order = upbit.buy_market_order(ticker, amount)
+        else:
+            order = upbit.sell_market_order(ticker, amount)
+        if not order or "uuid" not in order:
+            logger.error(f"[{ticker}] Order rejected: {order}")
+            return None
+        return order
+
+    def execute(self, ticker, side, amount, orderbook=None, price=None, cancel_event=None):
+        """
+        시장가 주문을 실행하고 체결을 확인한다.
+
+        Args:
+            side (str): "bid"(매수, amount는 KRW) 또는 "ask"(매도, amount는 수량)
+            orderbook (dict, optional): 분할 여부 판단에 사용할 호가
+            price (float, optional): 매도 금액 환산용 현재가
+            cancel_event (threading.Event, optional): 설정되면 남은 조각을 실행하지 않는다
+        """
+        result = ExecutionResult(ticker=ticker, side=side)
+        slices = plan_slices(side, amount, orderbook, price or 0, self.config) if orderbook else 1
+        if slices > 1:
+            logger.info(
+                f"[{ticker}] Splitting {side} order into {slices} slices "
+                f"(estimated impact {estimate_impact(side, amount, orderbook):.4%})"
+            )
+
+        remaining = amount
+        for i in range(slices):
+            if i > 0:
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.warning(f"[{ticker}] Execution cancelled after {i}/{slices} slices")
+                    break
+                self._sleep(self.config.slice_interval)
+            # 마지막 조각은 남은 전부 (매도 수량의 반올림 잔여분 포함)
+            slice_amount = remaining if i == slices - 1 else amount / slices
+            order = self._place(ticker, side, slice_amount)
+            if order is None:
+                break
+            final = self.wait_for_fill(order["uuid"]) or order
+            fill = Fill.from_order(final, slice=i)
+            result.fills.append(fill)
+            if side == "bid":
+                remaining -= slice_amount
+            else:
+                remaining -= fill.volume if fill.volume else slice_amount
+
+        logger.info(result.summary())
+        return result
+
+
+def save_fills(conn, trade_id, result):
+    """체결 내역을 trades 행과 연결해 저장한다. 커밋은 호출한 쪽에서 한다."""
+    now = datetime.now().isoformat()
+    conn.executemany(
+        """INSERT INTO order_fills
+                 (trade_id, ticker, order_uuid, side, slice, state, price, volume, funds, fee, created_at)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        [
+            (
+                trade_id,
+                result.ticker,
+                fill.order_uuid,
+                fill.side,
+                fill.slice,
+                fill.state,
+                fill.price,
+                fill.volume,
+                fill.funds,
+                fill.fee,
+                now,
+            )
+            for fill in result.fills
+        ],
+    )
@@ -0,0 +1,294 @@
+"""
+스트리밍 기술적 지표 엔진
+
+add_indicators()는 매번 ta 라이브러리로 전체 DataFrame을 다시 계산한다.
+여기서는 지표마다 O(1) 상태(이동 합계, EMA 상태, Wilder RSI 상태)를 유지하고
+새 캔들이 하나 추가될 때마다 갱신한다. 저장된 캔들 이력으로 시드하면
+24개 시간봉만 프롬프트에 넣더라도 MACD(26)/볼린저(20) 값이 NaN이 되지 않는다.
+
+출력 컬럼과 값은 add_indicators()(ta, fillna=False)와 동일하다.
+"""
+
+import logging
+import math
+import threading
+from collections import deque
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+NAN = float("nan")
+
+INDICATOR_COLUMNS = [
+    "bb_bbm",
+    "bb_bbh",
+    "bb_bbl",
+    "rsi",
+    "macd",
+    "macd_signal",
+    "macd_diff",
+    "sma_20",
+    "ema_12",
+]
+
+
+class EMA:
+    """pandas ewm(adjust=False, min_periods=min_periods)과 같은 지수 이동평균"""
+
+    def __init__(self, span=None, alpha=None, min_periods=None):
+        self.alpha = alpha if alpha is not None else 2 / (span + 1)
+        self.min_periods = min_periods if min_periods is not None else span
+        self.value = None
+        self.count = 0
+
+    def _next(self, x):
+        if self.value is None:
+            return x
+        return self.value + self.alpha * (x - self.value)
+
+    def _output(self, value, count):
+        return value if count >= self.min_periods else NAN
+
+    def update(self, x):
+        if isinstance(x, float) and math.isnan(x):
+            return self._output(self.value, self.count) if self.value is not None else NAN
+        self.value = self._next(x)
+        self.count += 1
+        return self._output(self.value, self.count)
+
+    def preview(self, x):
+        """상태를 바꾸지 않고 x가 추가됐을 때의 값을 반환"""
+        if isinstance(x, float) and math.isnan(x):
+            return self._output(self.value, self.count) if self.value is not None else NAN
+        return self._output(self._next(x), self.count + 1)
+
+
+class RollingStats:
+    """
+    고정 길이 윈도우의 평균/모집단 표준편차 (ddof=0)
+
+    누적 오차를 줄이기 위해 첫 값을 기준으로 이동한 합계를 쓰고,
+    윈도우 길이만큼 갱신될 때마다 합계를 다시 계산한다 (분할 상환 O(1)).
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.shift = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.updates = 0
+
+    def _recompute(self):
+        self.total = sum(v - self.shift for v in self.values)
+        self.total_sq = sum((v - self.shift) ** 2 for v in self.values)
+
+    def _stats(self, total, total_sq, shift):
+        n = self.window
+        mean = total / n
+        var = max(total_sq / n - mean * mean, 0.0)
+        return mean + shift, math.sqrt(var)
+
+    def update(self, x):
+        if self.shift is None:
+            self.shift = x
+        if len(self.values) == self.window:
+            old = self.values[0] - self.shift
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(x)
+        d = x - self.shift
+        self.total += d
+        self.total_sq += d * d
+        self.updates += 1
+        if self.updates % self.window == 0:
+            self._recompute()
+        if len(self.values) < self.window:
+            return NAN, NAN
+        return self._stats(self.total, self.total_sq, self.shift)
+
+    def preview(self, x):
+        if len(self.values) + 1 < self.window:
+            return NAN, NAN
+        shift = self.shift if self.shift is not None else x
+        total, total_sq = self.total, self.total_sq
+        if len(self.values) == self.window:
+            old = self.values[0] - shift
+            total -= old
+            total_sq -= old * old
+        d = x - shift
+        return self._stats(total + d, total_sq + d * d, shift)
+
+
+class RSI:
+    """Wilder RSI (ta.momentum.RSIIndicator와 동일한 초기화)"""
+
+    def __init__(self, window=14):
+        self.up = EMA(alpha=1 / window, min_periods=window)
+        self.down = EMA(alpha=1 / window, min_periods=window)
+        self.prev_close = None
+
+    @staticmethod
+    def _moves(prev_close, close):
+        # ta는 첫 diff(NaN)를 상승/하락 0으로 취급한다
+        diff = 0.0 if prev_close is None else close - prev_close
+        return max(diff, 0.0), max(-diff, 0.0)
+
+    @staticmethod
+    def _rsi(up, down):
+        if math.isnan(up) or math.isnan(down):
+            return NAN
+        if down == 0:
+            return 100.0
+        return 100 - 100 / (1 + up / down)
+
+    def update(self, close):
+        up, down = self._moves(self.prev_close, close)
+        self.prev_close = close
+        return self._rsi(self.up.update(up), self.down.update(down))
+
+    def preview(self, close):
+        up, down = self._moves(self.prev_close, close)
+        return self._rsi(self.up.preview(up), self.down.preview(down))
+
+
+class MACD:
+    """ta.trend.MACD(12, 26, 9)와 동일한 MACD/시그널/히스토그램"""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(span=fast)
+        self.slow = EMA(span=slow)
+        self.signal = EMA(span=signal)
+
+    @staticmethod
+    def _combine(macd, signal):
+        return macd, signal, macd - signal
+
+    def update(self, close):
+        macd = self.fast.update(close) - self.slow.update(close)
+        # 시그널선은 MACD가 유효해진 시점부터 누적된다 (pandas ewm은 선행 NaN을 건너뜀)
+        signal = self.signal.update(macd)
+        return self._combine(macd, signal)
+
+    def preview(self, close):
+        macd = self.fast.preview(close) - self.slow.preview(close)
+        return self._combine(macd, self.signal.preview(macd))
+
+
+class IndicatorEngine:
+    """
+    캔들 단위로 갱신되는 지표 묶음
+
+    push()는 마감된 캔들을 반영해 상태를 갱신하고,
+    preview()는 아직 진행 중인 캔들에 대한 값을 상태 변경 없이 계산한다.
+    """
+
+    def __init__(self, history=500):
+        self.bb = RollingStats(20)
+        self.rsi = RSI(14)
+        self.macd = MACD(12, 26, 9)
+        self.ema_12 = EMA(span=12)
+        self.last_ts = None
+        # 프롬프트 구간을 채우기 위한 최근 지표 값
+        self.history = deque(maxlen=history)
+
+    @staticmethod
+    def _row(bb, rsi, macd, ema_12):
+        mavg, std = bb
+        macd_line, macd_signal, macd_diff = macd
+        return {
+            "bb_bbm": mavg,
+            "bb_bbh": mavg + 2 * std,
+            "bb_bbl": mavg - 2 * std,
+            "rsi": rsi,
+            "macd": macd_line,
+            "macd_signal": macd_signal,
+            "macd_diff": macd_diff,
+            "sma_20": mavg,
+            "ema_12": ema_12,
+        }
+
+    def push(self, close, ts=None):
+        row = self._row(
+            self.bb.update(close),
+            self.rsi.update(close),
+            self.macd.update(close),
+            self.ema_12.update(close),
+        )
+        self.last_ts = ts
+        self.history.append((ts, row))
+        return row
+
+    def preview(self, close):
+        return self._row(
+            self.bb.preview(close),
+            self.rsi.preview(close),
+            self.macd.preview(close),
+            self.ema_12.preview(close),
+        )
+
+    def window(self, index):
+        """history에서 index(타임스탬프)에 해당하는 지표 행들을 반환"""
+        rows = dict(self.history)
+        return [rows.get(ts) for ts in index]
+
+
+def compute_indicators(df):
+    """
+    엔진으로 전체 DataFrame의 지표를 계산한다 (add_indicators()와 같은 결과).
+    """
+    engine = IndicatorEngine(history=len(df))
+    rows = [engine.push(float(close), ts) for ts, close in df["close"].items()]
+    out = df.copy()
+    values = pd.DataFrame(rows, index=df.index, columns=INDICATOR_COLUMNS)
+    for column in INDICATOR_COLUMNS:
+        out[column] = values[column]
+    return out
+
+
+# (ticker, interval) -> IndicatorEngine, 사이클 간에 유지
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def apply_indicators(df, ticker, interval):
+    """
+    저장된 캔들 이력(df)에 지표 컬럼을 추가한다.
+
+    마지막 행은 진행 중인 캔들로 보고 preview()로 계산한다. 그 이전 행 중
+    엔진이 아직 보지 못한 마감 캔들만 push()하므로, 매 사이클 전체를
+    다시 계산하지 않는다. 이력이 이어지지 않으면 df로 엔진을 다시 시드한다.
+    """
+    if df.empty:
+        return df.copy()
+
+    closed = df.iloc[:-1]
+    key = (ticker, interval)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None or engine.last_ts is None or engine.last_ts not in closed.index:
+            if engine is not None:
+                logger.info(f"Reseeding indicator engine for {ticker} {interval}")
+            engine = IndicatorEngine()
+            new_closed = closed
+        else:
+            new_closed = closed.loc[closed.index > engine.last_ts]
+
+        for ts, close in new_closed["close"].items():
+            engine.push(float(close), ts)
+        _engines[key] = engine
+
+        rows = engine.window(closed.index)
+        rows.append(engine.preview(float(df["close"].iloc[-1])))
+
+    empty = dict.fromkeys(INDICATOR_COLUMNS, NAN)
+    values = pd.DataFrame(
+        [row if row is not None else empty for row in rows],
+        index=df.index,
+        columns=INDICATOR_COLUMNS,
+    )
+    out = df.copy()
+    for column in INDICATOR_COLUMNS:
+        out[column] = values[column]
+    return out
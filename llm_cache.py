@@ -0,0 +1,140 @@
+"""
+OpenAI 응답 캐시 (record/replay)
+
+요청의 model, messages, response_format을 해시한 키로 chat completion 응답을
+SQLite에 저장한다. LLM_CACHE_MODE 환경 변수로 동작을 선택한다.
+
+- passthrough: 캐시를 사용하지 않는다 (기본값)
+- record: 같은 요청의 저장된 응답이 있으면 재사용하고, 없으면 API를 호출해 저장한다.
+  하위 단계 실패로 사이클을 다시 실행해도 같은 요청에 다시 비용을 쓰지 않는다.
+- replay: 저장된 응답만 사용하고 없으면 LLMCacheMiss를 발생시킨다.
+  네트워크 없이 결정적으로 사이클/백테스트를 재현할 때 사용한다.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from openai.types.chat import ChatCompletion
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = "llm_cache.db"
+MODES = ("passthrough", "record", "replay")
+
+# 키에 포함하는 요청 필드
+KEY_FIELDS = ("model", "messages", "response_format")
+
+
+class LLMCacheMiss(KeyError):
+    """replay 모드에서 저장된 응답이 없는 요청"""
+
+
+def cache_key(request):
+    payload = {name: request.get(name) for name in KEY_FIELDS}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path=CACHE_PATH, mode=None):
+        self.path = path
+        self._mode = mode
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {"hit": 0, "miss": 0}
+
+    @property
+    def mode(self):
+        """
+        mode를 지정하지 않았으면 처음 사용할 때 LLM_CACHE_MODE를 읽는다
+        (모듈 import 이후 load_dotenv()로 읽은 .env 값도 반영된다)
+        """
+        if self._mode is None or self._mode not in MODES:
+            mode = (self._mode or os.getenv("LLM_CACHE_MODE", "passthrough")).lower()
+            if mode not in MODES:
+                logger.warning(f"Unknown LLM_CACHE_MODE '{mode}', falling back to 'passthrough'")
+                mode = "passthrough"
+            self._mode = mode
+        return self._mode
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS llm_responses
+                         (key TEXT PRIMARY KEY,
+                          model TEXT,
+                          request TEXT,
+                          response TEXT,
+                          created_at TEXT)"""
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _load(self, key):
+        with self._lock:
+            row = (
+                self._connection()
+                .execute("SELECT response FROM llm_responses WHERE key = ?", (key,))
+                .fetchone()
+            )
+        return ChatCompletion.model_validate_json(row[0]) if row else None
+
+    def _save(self, key, request, response):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, request, response, created_at) VALUES (?, ?, ?, ?, ?)",
+                (
+                    key,
+                    request.get("model"),
+                    json.dumps(request, ensure_ascii=False),
+                    response.model_dump_json(),
+                    datetime.now().isoformat(),
+                ),
+            )
+            conn.commit()
+
+    def _count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def complete(self, request, client_factory):
+        """
+        client_factory().chat.completions.create(**request)를 모드에 따라 캐시한다.
+
+        클라이언트는 API를 실제로 호출할 때만 생성하므로 replay 모드에서는
+        OpenAI API 키 없이도 동작한다.
+        """
+        if self.mode == "passthrough":
+            return client_factory().chat.completions.create(**request)
+
+        key = cache_key(request)
+        response = self._load(key)
+        if response is not None:
+            self._count("hit")
+            logger.info(f"LLM cache hit ({key[:12]}, {self.stats})")
+            return response
+
+        self._count("miss")
+        if self.mode == "replay":
+            raise LLMCacheMiss(f"No recorded response for request {key[:12]}")
+
+        response = client_factory().chat.completions.create(**request)
+        self._save(key, request, response)
+        logger.info(f"LLM response recorded ({key[:12]}, {self.stats})")
+        return response
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+llm_cache = LLMCache()
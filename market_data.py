@@ -0,0 +1,156 @@
+"""
+시장 데이터 병렬 수집 (gather stage)
+
+ai_trading()이 매 사이클마다 호출하는 잔고/차트/호가/공포탐욕지수/뉴스 조회는
+서로 독립적이므로 스레드 풀에서 동시에 실행한다. 사이클 지연 시간은 모든
+소스의 합이 아니라 가장 느린 소스 하나로 결정된다.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from multi_market import DEFAULT_MAX_CONCURRENT_MARKETS
+
+logger = logging.getLogger(__name__)
+
+# 소스별 기본 타임아웃 (초)
+DEFAULT_TIMEOUTS = {
+    "status": 5.0,
+    "df_daily": 10.0,
+    "df_hourly": 10.0,
+    "orderbook": 5.0,
+    "fear_greed_index": 5.0,
+    "news_headlines": 10.0,
+}
+DEFAULT_TIMEOUT = 10.0
+
+# pyupbit/requests 호출은 모두 블로킹 I/O이므로 스레드 풀을 사용한다.
+# 타임아웃된 작업이 끝날 때까지 사이클이 기다리지 않도록 풀은 프로세스 전체에서 공유한다.
+# future.cancel()은 실행 중인 작업을 멈추지 못하므로, 작업 자체는 호출하는 쪽에서
+# 타임아웃으로 끝나게 하고(resilience.call + 요청 타임아웃), 풀은 동시에 처리하는 마켓의
+# 모든 소스가 한 번 더 밀려 있어도 자리가 남도록 잡는다 (MARKET_DATA_WORKERS로 변경).
+# 반성 내용 생성처럼 오래 걸리는 LLM 호출은 별도 풀에서 실행해 소스 수집 자리를 차지하지 않는다
+# (BACKGROUND_WORKERS, 기본 4).
+# 풀 크기는 .env가 로드된 뒤 반영되도록 처음 제출할 때 환경 변수에서 읽는다.
+DEFAULT_BACKGROUND_WORKERS = 4
+
+_executor = None
+_background = None
+_pools_lock = threading.Lock()
+
+
+def _market_data_workers():
+    markets = int(os.getenv("MAX_CONCURRENT_MARKETS", DEFAULT_MAX_CONCURRENT_MARKETS))
+    return int(os.getenv("MARKET_DATA_WORKERS", 2 * len(DEFAULT_TIMEOUTS) * markets))
+
+
+def _source_pool():
+    global _executor
+    with _pools_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_market_data_workers(), thread_name_prefix="market-data")
+        return _executor
+
+
+def _background_pool():
+    global _background
+    with _pools_lock:
+        if _background is None:
+            workers = int(os.getenv("BACKGROUND_WORKERS", DEFAULT_BACKGROUND_WORKERS))
+            _background = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="background")
+        return _background
+
+
+def submit_sources(sources):
+    """
+    각 소스 함수를 스레드 풀에 제출하고 {name: Future}를 반환한다.
+    """
+    pool = _source_pool()
+    return {name: pool.submit(fetch) for name, fetch in sources.items()}
+
+
+def collect_sources(futures, timeouts=None, default_timeout=DEFAULT_TIMEOUT, started_at=None):
+    """
+    제출된 소스들의 결과를 모은다.
+
+    각 소스는 자신의 타임아웃 안에 끝나야 하며, 실패하거나 타임아웃된 소스는
+    None으로 채우고 errors에 원인을 기록한다 (부분 실패 허용).
+
+    Returns:
+        (results, errors): {name: result or None}, {name: error message}
+    """
+    timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+    started_at = time.monotonic() if started_at is None else started_at
+    deadlines = {
+        name: started_at + timeouts.get(name, default_timeout) for name in futures
+    }
+
+    results = {}
+    errors = {}
+    pending = {future: name for name, future in futures.items()}
+
+    while pending:
+        now = time.monotonic()
+        # 마감 시간이 지난 소스는 타임아웃 처리
+        for future, name in list(pending.items()):
+            if not future.done() and deadlines[name] <= now:
+                # 이미 실행 중이면 취소되지 않고 자신의 요청 타임아웃까지 계속 실행된다
+                future.cancel()
+                results[name] = None
+                errors[name] = f"timed out after {timeouts.get(name, default_timeout)}s"
+                del pending[future]
+        if not pending:
+            break
+
+        next_deadline = min(deadlines[name] for name in pending.values())
+        done, _ = wait(
+            pending.keys(),
+            timeout=max(0.0, next_deadline - time.monotonic()),
+            return_when=FIRST_COMPLETED,
+        )
+        for future in done:
+            name = pending.pop(future)
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = None
+                errors[name] = str(e)
+
+    for name, error in errors.items():
+        logger.warning(f"Market data source '{name}' failed: {error}")
+
+    return results, errors
+
+
+def gather_market_data(sources, timeouts=None, default_timeout=DEFAULT_TIMEOUT):
+    """
+    독립적인 시장 데이터 소스들을 병렬로 조회한다.
+
+    Args:
+        sources (dict): {name: 인자 없는 조회 함수}
+        timeouts (dict, optional): 소스별 타임아웃(초). DEFAULT_TIMEOUTS를 덮어쓴다.
+        default_timeout (float): timeouts에 없는 소스의 타임아웃
+
+    Returns:
+        (results, errors): {name: result or None}, {name: error message}
+    """
+    started_at = time.monotonic()
+    futures = submit_sources(sources)
+    results, errors = collect_sources(
+        futures, timeouts, default_timeout, started_at=started_at
+    )
+    elapsed = time.monotonic() - started_at
+    logger.info(
+        f"Gathered {len(results) - len(errors)}/{len(results)} market data sources in {elapsed:.2f}s"
+    )
+    return results, errors
+
+
+def submit(fn, *args, **kwargs):
+    """
+    백그라운드 풀에 단일 작업을 제출한다 (반성 내용 생성 등 오래 걸리는 I/O 작업용).
+    """
+    return _background_pool().submit(fn, *args, **kwargs)
@@ -0,0 +1,598 @@
+"""
+로컬 모의 서비스 (Upbit / alternative.me / SerpAPI / OpenAI)
+
+실제 API 없이 성능을 측정하고 회귀를 잡기 위해 pyupbit와 OpenAI 클라이언트가
+사용하는 엔드포인트를 한 HTTP 서버에서 흉내 낸다.
+
+- Upbit: 캔들(분/일), 현재가, 호가, 마켓 목록, 계좌, 시장가 주문, 개별 주문 조회
+- alternative.me: /fng/
+- SerpAPI: /search.json
+- OpenAI: /v1/chat/completions (response_format이 있으면 거래 결정 JSON을 반환)
+
+서비스별 응답 지연, 오류율, 초당 요청 수 제한을 설정할 수 있다. 가격은 시각의
+결정적 함수이고 주문은 현재가에 즉시 체결되며 계좌 잔고에 반영된다.
+
+봇의 요청은 clients.py의 {SERVICE}_BASE_URL과 OPENAI_BASE_URL로 이 서버에 보낸다
+(MockServer.env() 참고).
+
+    python mock_services.py --port 8765 --openai-latency 1.5 --error-rate 0.01
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid as uuid_lib
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from rate_limiter import UPBIT_RATE_LIMITS
+
+logger = logging.getLogger(__name__)
+
+SERVICES = ("upbit", "alternative_me", "serpapi", "openai")
+
+# 서비스별 기본 응답 지연 (초). 실제 사이클에서 관측되는 수준
+DEFAULT_LATENCY = {"upbit": 0.03, "alternative_me": 0.2, "serpapi": 0.5, "openai": 1.0}
+
+# Upbit Remaining-Req 그룹별 초당 요청 수 (봇의 요청 수 제한과 같은 값)
+DEFAULT_RATE_LIMITS = UPBIT_RATE_LIMITS
+
+# 모의 시세 기준 가격 (KRW)
+BASE_PRICES = {"KRW-BTC": 90_000_000, "KRW-ETH": 4_000_000, "KRW-XRP": 800, "KRW-SOL": 200_000}
+DEFAULT_BASE_PRICE = 10_000
+KST = timezone(timedelta(hours=9))
+FEE_RATE = 0.0005
+
+
+@dataclass
+class MockConfig:
+    latency: dict = field(default_factory=lambda: dict(DEFAULT_LATENCY))
+    # 지연 시간에 더하는 균등 분포 비율 (0.2면 ±20%)
+    jitter: float = 0.2
+    # 서비스별 오류 응답(5xx) 비율
+    error_rate: dict = field(default_factory=lambda: dict.fromkeys(SERVICES, 0.0))
+    # 그룹 이름 -> 초당 요청 수. None이면 제한하지 않는다
+    rate_limits: dict = field(default_factory=lambda: dict(DEFAULT_RATE_LIMITS))
+    initial_krw: float = 10_000_000
+    # 주문 후 개별 주문 조회에서 체결(done)로 보이기까지의 시간 (초)
+    fill_delay: float = 0.2
+    seed: int = 0
+
+
+class TokenBucket:
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+
+    def take(self):
+        """토큰을 하나 쓰고 남은 수를 반환. 없으면 None"""
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return None
+        self.tokens -= 1
+        return int(self.tokens)
+
+
+def _noise(*parts):
+    """parts에 대해 결정적인 [-1, 1) 값"""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2**63 - 1
+
+
+class MockMarket:
+    """시각의 결정적 함수인 시세와 즉시 체결되는 계좌"""
+
+    def __init__(self, initial_krw, seed=0, fill_delay=0.0):
+        self.seed = seed
+        self.fill_delay = fill_delay
+        self._lock = threading.Lock()
+        self.balances = {"KRW": {"balance": initial_krw, "avg_buy_price": 0.0}}
+        self.orders = {}
+
+    def price(self, ticker, ts):
+        """ts(epoch 초) 시점의 가격. 주/일 주기 파동에 분 단위 잡음을 더한다"""
+        base = BASE_PRICES.get(ticker, DEFAULT_BASE_PRICE)
+        phase = _noise(self.seed, ticker) * math.pi
+        wave = 0.06 * math.sin(ts / (7 * 86400) * 2 * math.pi + phase)
+        wave += 0.02 * math.sin(ts / 86400 * 2 * math.pi + phase)
+        wave += 0.002 * _noise(self.seed, ticker, int(ts // 60))
+        return round(base * (1 + wave), 2 if base < 1000 else 0)
+
+    def candles(self, ticker, step, count, to):
+        """to 이전에 시작한 캔들 count개 (최신순, Upbit 응답 형식)"""
+        last = (int(to) - 1) // step * step
+        rows = []
+        for i in range(count):
+            start = last - i * step
+            prices = [self.price(ticker, start + step * k / 4) for k in range(5)]
+            volume = 10 + 5 * _noise(self.seed, ticker, start, "volume")
+            rows.append(
+                {
+                    "market": ticker,
+                    "candle_date_time_utc": datetime.fromtimestamp(start, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+                    "candle_date_time_kst": datetime.fromtimestamp(start, KST).strftime("%Y-%m-%dT%H:%M:%S"),
+                    "opening_price": prices[0],
+                    "high_price": max(prices),
+                    "low_price": min(prices),
+                    "trade_price": prices[-1],
+                    "timestamp": int(start * 1000),
+                    "candle_acc_trade_volume": volume,
+                    "candle_acc_trade_price": volume * prices[-1],
+                    "unit": step // 60,
+                }
+            )
+        return rows
+
+    def ticker(self, ticker, now):
+        price = self.price(ticker, now)
+        return {
+            "market": ticker,
+            "trade_price": price,
+            "opening_price": self.price(ticker, now - now % 86400),
+            "prev_closing_price": self.price(ticker, now - now % 86400 - 1),
+            "timestamp": int(now * 1000),
+        }
+
+    def orderbook(self, ticker, now, depth=15):
+        price = self.price(ticker, now)
+        tick = max(price * 0.0001, 0.01)
+        # 호가 단계마다 대략 25~125백만 KRW 규모의 잔량
+        depth_krw = 50_000_000 / price
+        units = [
+            {
+                "ask_price": round(price + tick * (i + 1), 2),
+                "bid_price": round(price - tick * (i + 1), 2),
+                "ask_size": round(depth_krw * (0.5 + 2 * abs(_noise(self.seed, ticker, i, "ask", int(now)))), 8),
+                "bid_size": round(depth_krw * (0.5 + 2 * abs(_noise(self.seed, ticker, i, "bid", int(now)))), 8),
+            }
+            for i in range(depth)
+        ]
+        return {
+            "market": ticker,
+            "timestamp": int(now * 1000),
+            "total_ask_size": sum(u["ask_size"] for u in units),
+            "total_bid_size": sum(u["bid_size"] for u in units),
+            "orderbook_units": units,
+        }
+
+    def accounts(self):
+        with self._lock:
+            return [
+                {
+                    "currency": currency,
+                    "balance": f"{values['balance']:.8f}",
+                    "locked": "0.0",
+                    "avg_buy_price": f"{values['avg_buy_price']:.8f}",
+                    "avg_buy_price_modified": False,
+                    "unit_currency": "KRW",
+                }
+                for currency, values in self.balances.items()
+            ]
+
+    def place_order(self, params, now):
+        """시장가 주문을 현재가로 즉시 체결한다. 잔고가 부족하면 None"""
+        ticker = params["market"]
+        currency = ticker.split("-")[1]
+        price = self.price(ticker, now)
+        with self._lock:
+            krw = self.balances["KRW"]
+            coin = self.balances.setdefault(currency, {"balance": 0.0, "avg_buy_price": 0.0})
+            if params["side"] == "bid":
+                funds = float(params["price"])
+                fee = funds * FEE_RATE
+                if funds + fee > krw["balance"]:
+                    return None
+                volume = funds / price
+                krw["balance"] -= funds + fee
+                total = coin["balance"] + volume
+                coin["avg_buy_price"] = (coin["balance"] * coin["avg_buy_price"] + funds) / total
+                coin["balance"] = total
+            else:
+                volume = float(params["volume"])
+                # 잔고 문자열은 소수점 8자리로 반올림되므로 그만큼의 차이는 허용한다
+                if volume > coin["balance"] + 1e-8:
+                    return None
+                volume = min(volume, coin["balance"])
+                funds = volume * price
+                fee = funds * FEE_RATE
+                coin["balance"] -= volume
+                krw["balance"] += funds - fee
+
+            order = {
+                "uuid": str(uuid_lib.uuid4()),
+                "side": params["side"],
+                "ord_type": params["ord_type"],
+                "price": params.get("price"),
+                "state": "done",
+                "market": ticker,
+                "created_at": datetime.fromtimestamp(now, KST).isoformat(),
+                "volume": params.get("volume"),
+                "remaining_volume": "0.0",
+                "reserved_fee": f"{fee:.8f}",
+                "remaining_fee": "0.0",
+                "paid_fee": f"{fee:.8f}",
+                "locked": "0.0",
+                "executed_volume": f"{volume:.8f}",
+                "trades_count": 1,
+                "trades": [
+                    {
+                        "market": ticker,
+                        "uuid": str(uuid_lib.uuid4()),
+                        "price": str(price),
+                        "volume": f"{volume:.8f}",
+                        "funds": f"{funds:.8f}",
+                        "side": params["side"],
+                        "created_at": datetime.fromtimestamp(now, KST).isoformat(),
+                    }
+                ],
+            }
+            self.orders[order["uuid"]] = (now + self.fill_delay, order)
+        # 주문 응답은 대기 상태로 반환한다 (체결은 개별 주문 조회로 확인)
+        return self._pending(order)
+
+    @staticmethod
+    def _pending(order):
+        pending = {k: v for k, v in order.items() if k != "trades"}
+        pending.update(state="wait", executed_volume="0.0", paid_fee="0.0", trades_count=0)
+        return pending
+
+    def get_order(self, order_uuid, now):
+        """fill_delay가 지나기 전에는 대기(wait) 상태로 보인다"""
+        with self._lock:
+            entry = self.orders.get(order_uuid)
+        if entry is None:
+            return None
+        filled_at, order = entry
+        if now < filled_at:
+            return dict(self._pending(order), trades=[])
+        return order
+
+
+def _decision_content(rng):
+    decision = rng.choice(["buy", "sell", "hold", "hold"])
+    percentage = 0 if decision == "hold" else rng.choice([10, 20, 30, 50])
+    return json.dumps(
+        {"decision": decision, "percentage": percentage, "reason": f"Mock {decision} decision."}
+    )
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def _params(self):
+        """쿼리 문자열과 (pyupbit가 GET에도 보내는) 폼/JSON 본문을 합친다"""
+        parts = urlsplit(self.path)
+        params = {k: v[0] if len(v) == 1 else v for k, v in parse_qs(parts.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if body:
+            try:
+                parsed = json.loads(body)
+                if isinstance(parsed, dict):
+                    params.update(parsed)
+            except ValueError:
+                params.update({k: v[0] for k, v in parse_qs(body.decode()).items()})
+        return parts.path, params
+
+    def _send(self, status, payload, headers=None, text=False):
+        body = payload.encode() if text else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain" if text else "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        path, params = self._params()
+        service, group, handler = self.mock.route(method, path)
+        if handler is None:
+            self._send(404, {"error": {"name": "not_found", "message": path}})
+            return
+
+        self.mock.simulate_latency(service)
+        remaining = self.mock.take_token(group)
+        if remaining is None:
+            self.mock.count(service, "rate_limited")
+            if service == "upbit":
+                # pyupbit는 429 응답의 본문 텍스트로 TooManyRequests를 판별한다
+                self._send(429, "Too many API requests.", text=True)
+            else:
+                self._send(429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit"}})
+            return
+        if self.mock.inject_error(service):
+            self.mock.count(service, "errors")
+            self._send(500, {"error": {"name": "server_error", "message": "Injected failure", "type": "server_error"}})
+            return
+
+        self.mock.count(service, "requests")
+        status, payload = handler(params)
+        headers = {}
+        if service == "upbit":
+            headers["Remaining-Req"] = f"group={group}; min=1800; sec={remaining}"
+        self._send(status, payload, headers)
+
+
+class MockServer:
+    """
+    모의 서비스 서버. with 문이나 start()/stop()으로 사용한다.
+
+    port=0이면 빈 포트를 사용하며, 실제 주소는 start() 후 url로 알 수 있다.
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or MockConfig()
+        self.market = MockMarket(self.config.initial_krw, self.config.seed, self.config.fill_delay)
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._buckets = {
+            group: TokenBucket(rate) for group, rate in self.config.rate_limits.items() if rate
+        }
+        self.stats = {service: {"requests": 0, "errors": 0, "rate_limited": 0} for service in SERVICES}
+        self._httpd = ThreadingHTTPServer((host, port), MockHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """봇의 요청을 이 서버로 보내는 환경 변수"""
+        return {
+            "UPBIT_BASE_URL": self.url,
+            "ALTERNATIVE_ME_BASE_URL": self.url,
+            "SERPAPI_BASE_URL": self.url,
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "UPBIT_ACCESS_KEY": "mock-upbit-access-key-0000000000000000",
+            "UPBIT_SECRET_KEY": "mock-upbit-secret-key-0000000000000000",
+            "OPENAI_API_KEY": "mock-openai-key",
+            "SERPAPI_API_KEY": "mock-serpapi-key",
+        }
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-services", daemon=True)
+        self._thread.start()
+        logger.info(f"Mock services listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # 지연/오류/요청 제한 ---------------------------------------------------
+
+    def _random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def simulate_latency(self, service):
+        latency = self.config.latency.get(service, 0.0)
+        if latency > 0:
+            time.sleep(latency * (1 + self.config.jitter * (2 * self._random() - 1)))
+
+    def inject_error(self, service):
+        rate = self.config.error_rate.get(service, 0.0)
+        return rate > 0 and self._random() < rate
+
+    def take_token(self, group):
+        """요청 제한 그룹의 토큰을 쓴다. 제한이 없으면 최대값, 초과하면 None"""
+        bucket = self._buckets.get(group)
+        if bucket is None:
+            return 999
+        with self._lock:
+            return bucket.take()
+
+    def count(self, service, key):
+        with self._lock:
+            self.stats[service][key] += 1
+
+    # 라우팅 ----------------------------------------------------------------
+
+    def route(self, method, path):
+        """(서비스, 요청 제한 그룹, 핸들러)"""
+        if method == "POST" and path == "/v1/chat/completions":
+            return "openai", "openai", self.chat_completion
+        if method == "GET" and path == "/fng/":
+            return "alternative_me", "alternative_me", self.fear_greed
+        if method == "GET" and path == "/search.json":
+            return "serpapi", "serpapi", self.news
+        if path.startswith("/v1/candles/") and method == "GET":
+            return "upbit", "candles", functools.partial(self.candles, path)
+        routes = {
+            ("GET", "/v1/ticker"): ("ticker", self.ticker),
+            ("GET", "/v1/orderbook"): ("orderbook", self.orderbook),
+            ("GET", "/v1/market/all"): ("market", self.market_all),
+            ("GET", "/v1/accounts"): ("default", self.accounts),
+            ("GET", "/v1/order"): ("default", self.order),
+            ("POST", "/v1/orders"): ("order", self.place_order),
+        }
+        group, handler = routes.get((method, path), (None, None))
+        return "upbit", group, handler
+
+    @staticmethod
+    def _markets(params):
+        markets = params.get("markets", "KRW-BTC")
+        if isinstance(markets, list):
+            return markets
+        return markets.split(",")
+
+    def candles(self, path, params):
+        # /v1/candles/days, /v1/candles/weeks, /v1/candles/minutes/{unit}
+        kind = path.rstrip("/").split("/")
+        if "minutes" in kind:
+            step = int(kind[-1]) * 60
+        elif kind[-1] == "weeks":
+            step = 7 * 86400
+        else:
+            step = 86400
+        to = params.get("to")
+        if to:
+            to_ts = datetime.strptime(to, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+        else:
+            to_ts = time.time()
+        count = min(int(params.get("count", 1)), 200)
+        return 200, self.market.candles(params["market"], step, count, to_ts)
+
+    def ticker(self, params):
+        now = time.time()
+        return 200, [self.market.ticker(market, now) for market in self._markets(params)]
+
+    def orderbook(self, params):
+        now = time.time()
+        return 200, [self.market.orderbook(market, now) for market in self._markets(params)]
+
+    def market_all(self, params):
+        return 200, [
+            {"market": market, "korean_name": market, "english_name": market} for market in BASE_PRICES
+        ]
+
+    def accounts(self, params):
+        return 200, self.market.accounts()
+
+    def order(self, params):
+        order = self.market.get_order(params.get("uuid"), time.time())
+        if order is None:
+            return 404, {"error": {"name": "order_not_found", "message": "주문을 찾지 못했습니다."}}
+        return 200, order
+
+    def place_order(self, params):
+        order = self.market.place_order(params, time.time())
+        if order is None:
+            return 400, {"error": {"name": "insufficient_funds_bid", "message": "주문가능한 금액이 부족합니다."}}
+        return 201, order
+
+    def fear_greed(self, params):
+        value = int(50 + 40 * _noise(self.config.seed, "fng", int(time.time() // 86400)))
+        label = "Fear" if value < 45 else "Greed" if value > 55 else "Neutral"
+        return 200, {
+            "name": "Fear and Greed Index",
+            "data": [{"value": str(value), "value_classification": label, "timestamp": str(int(time.time()))}],
+        }
+
+    def news(self, params):
+        query = params.get("q", "btc")
+        return 200, {
+            "news_results": [
+                {"title": f"Mock headline {i + 1} about {query}", "date": datetime.now().strftime("%m/%d/%Y")}
+                for i in range(8)
+            ]
+        }
+
+    def chat_completion(self, params):
+        messages = params.get("messages", [])
+        prompt_text = "".join(str(m.get("content", "")) for m in messages)
+        if params.get("response_format"):
+            with self._lock:
+                content = _decision_content(self._rng)
+        else:
+            content = "Mock reflection: keep position sizes small and follow the trend."
+        prompt_tokens = _estimate_tokens(prompt_text)
+        completion_tokens = _estimate_tokens(content)
+        return 200, {
+            "id": f"chatcmpl-mock-{uuid_lib.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": params.get("model", "mock"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                    "logprobs": None,
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+def add_arguments(parser):
+    """모의 서비스 설정용 명령행 옵션 (벤치마크와 공유)"""
+    for service in SERVICES:
+        option = service.replace("_", "-")
+        parser.add_argument(
+            f"--{option}-latency", type=float, default=DEFAULT_LATENCY[service], help=f"{service} 응답 지연 (초)"
+        )
+    parser.add_argument("--jitter", type=float, default=0.2, help="지연 시간 변동 비율")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="모든 서비스의 오류 응답 비율")
+    parser.add_argument("--no-rate-limit", action="store_true", help="Upbit 요청 수 제한을 끈다")
+    parser.add_argument("--fill-delay", type=float, default=0.2, help="주문 체결 확인까지의 지연 (초)")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def config_from_args(args):
+    return MockConfig(
+        latency={service: getattr(args, f"{service}_latency") for service in SERVICES},
+        jitter=args.jitter,
+        error_rate=dict.fromkeys(SERVICES, args.error_rate),
+        rate_limits={} if args.no_rate_limit else dict(DEFAULT_RATE_LIMITS),
+        fill_delay=args.fill_delay,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = MockServer(config_from_args(args), host=args.host, port=args.port)
+    for key, value in server.env().items():
+        print(f"{key}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
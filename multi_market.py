@@ -0,0 +1,128 @@
+"""
+멀티 마켓 트레이딩 엔진
+
+TRADING_TICKERS에 지정된 여러 Upbit KRW 마켓을 한 프로세스에서 처리한다.
+- 호가/현재가는 티커 리스트로 한 번에 조회한다 (pyupbit 배치 조회)
+- 마켓별 데이터 수집과 LLM 결정은 동시 실행 수가 제한된 워커 풀에서 실행한다
+
+캔들은 Upbit에 다중 티커 조회 API가 없으므로 캔들 저장소의 증분 조회로
+마켓당 최소한의 호출만 한다.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pyupbit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TICKERS = "KRW-BTC"
+DEFAULT_MAX_CONCURRENT_MARKETS = 4
+# 배치로 조회한 호가/현재가를 그대로 쓸 수 있는 시간 (초, QUOTE_MAX_AGE)
+DEFAULT_QUOTE_MAX_AGE = 5.0
+
+# pyupbit 배치 조회 한 번에 넣을 최대 티커 수
+BATCH_SIZE = 100
+
+
+def get_trading_tickers():
+    """TRADING_TICKERS 환경 변수 (쉼표 구분, 예: KRW-BTC,KRW-ETH)"""
+    tickers = os.getenv("TRADING_TICKERS", DEFAULT_TICKERS)
+    return [t.strip().upper() for t in tickers.split(",") if t.strip()]
+
+
+def get_currency(ticker):
+    """KRW-BTC -> BTC"""
+    return ticker.split("-")[1]
+
+
+def _batches(tickers):
+    for i in range(0, len(tickers), BATCH_SIZE):
+        yield tickers[i : i + BATCH_SIZE]
+
+
+def fetch_quotes(tickers):
+    """
+    여러 마켓의 호가와 현재가를 배치로 조회한다.
+
+    Returns:
+        dict: {ticker: {"orderbook": ..., "current_price": ..., "fetched_at": ...}}
+        조회에 실패한 항목은 빠지며, 마켓별 수집 단계에서 개별 조회한다.
+        fetched_at은 time.monotonic() 기준 조회 시각이다.
+    """
+    quotes = {ticker: {"fetched_at": time.monotonic()} for ticker in tickers}
+    for batch in _batches(tickers):
+        try:
+            orderbooks = pyupbit.get_orderbook(batch)
+            if isinstance(orderbooks, dict):
+                orderbooks = [orderbooks]
+            for orderbook in orderbooks or []:
+                quotes[orderbook["market"]]["orderbook"] = orderbook
+        except Exception as e:
+            logger.warning(f"Batched orderbook fetch failed: {e}")
+        try:
+            prices = pyupbit.get_current_price(batch)
+            if not isinstance(prices, dict):
+                prices = {batch[0]: prices}
+            for ticker, price in prices.items():
+                quotes[ticker]["current_price"] = price
+        except Exception as e:
+            logger.warning(f"Batched price fetch failed: {e}")
+    return quotes
+
+
+def fresh_quote(quote, max_age=None):
+    """
+    조회한 지 max_age초(기본 QUOTE_MAX_AGE)가 지난 배치 시세는 버린다.
+    동시 실행 수 제한으로 늦게 시작한 마켓은 빈 dict를 받아 사이클 시작 시점에 다시 조회한다.
+    """
+    if not quote:
+        return {}
+    if max_age is None:
+        max_age = float(os.getenv("QUOTE_MAX_AGE", DEFAULT_QUOTE_MAX_AGE))
+    if time.monotonic() - quote.get("fetched_at", 0.0) > max_age:
+        return {}
+    return quote
+
+
+def run_markets(tickers, trade_fn, max_workers=None):
+    """
+    각 마켓에 대해 trade_fn(ticker, quote)를 동시 실행 수를 제한해 실행한다.
+
+    한 마켓의 실패는 다른 마켓에 영향을 주지 않는다.
+
+    Returns:
+        dict: {ticker: None(성공) 또는 예외}
+    """
+    if max_workers is None:
+        max_workers = int(
+            os.getenv("MAX_CONCURRENT_MARKETS", DEFAULT_MAX_CONCURRENT_MARKETS)
+        )
+    started_at = time.monotonic()
+    quotes = fetch_quotes(tickers)
+
+    results = {}
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(tickers))),
+        thread_name_prefix="market",
+    ) as pool:
+        futures = {
+            ticker: pool.submit(trade_fn, ticker, quotes.get(ticker) or {})
+            for ticker in tickers
+        }
+        for ticker, future in futures.items():
+            try:
+                future.result()
+                results[ticker] = None
+            except Exception as e:
+                logger.error(f"Trading failed for {ticker}: {e}")
+                logger.exception("상세 에러:")
+                results[ticker] = e
+
+    failed = sum(1 for error in results.values() if error is not None)
+    logger.info(
+        f"Processed {len(tickers)} markets ({failed} failed) in {time.monotonic() - started_at:.1f}s"
+    )
+    return results
@@ -0,0 +1,183 @@
+"""
+LLM 호출 전 사전 필터
+
+직전 LLM 결정이 hold였고 그 이후 가격/지표/잔고가 거의 변하지 않았다면
+같은 결론이 나올 가능성이 높으므로 반성/결정 LLM 호출을 건너뛰고 hold로 기록한다.
+비교 기준은 건너뛴 사이클이 아니라 마지막으로 LLM이 결정한 시점의 상태이므로
+작은 변화가 누적되어도 결국 임계값을 넘으면 다시 결정한다.
+
+임계값 (환경 변수)
+- PREFILTER_PRICE_CHANGE: 현재가 상대 변화 (기본 0.01 = 1%)
+- PREFILTER_RSI_CHANGE: 시간봉 RSI 변화 (기본 5)
+- PREFILTER_BB_CHANGE: 볼린저 밴드 내 위치(0~1) 변화 (기본 0.2)
+- PREFILTER_BALANCE_CHANGE: KRW/코인 잔고 상대 변화 (기본 0.01)
+- PREFILTER_MAX_SKIP_AGE: 마지막 결정 이후 이 시간(초)이 지나면 항상 결정 (기본 14400)
+- PREFILTER_ENABLED: false로 설정하면 항상 LLM을 호출
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Thresholds:
+    price_change: float = 0.01
+    rsi_change: float = 5.0
+    bb_change: float = 0.2
+    balance_change: float = 0.01
+    max_skip_age: float = 4 * 3600
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            **{
+                name: float(os.getenv(f"PREFILTER_{name.upper()}", default))
+                for name, default in asdict(cls()).items()
+            }
+        )
+
+
+def init_prefilter(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS decision_states
+                 (ticker TEXT PRIMARY KEY,
+                  decision TEXT,
+                  features TEXT,
+                  decided_at REAL)"""
+    )
+    conn.commit()
+
+
+def extract_features(df_hourly, status):
+    """지표가 추가된 시간봉(마지막 행은 진행 중인 캔들)과 계좌 상태로 특징 벡터 생성"""
+    last = df_hourly.iloc[-1]
+    band = last["bb_bbh"] - last["bb_bbl"]
+    bb_position = (status["current_price"] - last["bb_bbl"]) / band if band > 0 else None
+    return {
+        "price": float(status["current_price"]),
+        "rsi": float(last["rsi"]),
+        "macd_diff": float(last["macd_diff"]),
+        "bb_position": float(bb_position) if bb_position is not None else None,
+        "krw_balance": float(status["krw_balance"]),
+        "coin_balance": float(status["coin_balance"]),
+    }
+
+
+def _relative_change(previous, current):
+    if previous == 0:
+        return 0.0 if current == 0 else float("inf")
+    return abs(current - previous) / abs(previous)
+
+
+def _missing(value):
+    return value is None or value != value
+
+
+def compare(previous, current, thresholds):
+    """임계값을 넘은 변화 목록. 비어 있으면 변화가 없는 것으로 본다."""
+    changes = []
+    for name in current:
+        if _missing(previous.get(name)) or _missing(current[name]):
+            if _missing(previous.get(name)) != _missing(current[name]):
+                changes.append(f"{name} availability changed")
+    if changes:
+        return changes
+
+    def check(name, change, limit, label):
+        if change > limit:
+            changes.append(f"{label} {change:.3g} > {limit:g}")
+
+    check("price", _relative_change(previous["price"], current["price"]), thresholds.price_change, "price change")
+    if not _missing(current["rsi"]):
+        check("rsi", abs(current["rsi"] - previous["rsi"]), thresholds.rsi_change, "RSI change")
+    if not _missing(current["bb_position"]):
+        check("bb_position", abs(current["bb_position"] - previous["bb_position"]), thresholds.bb_change, "BB position change")
+    for name in ("krw_balance", "coin_balance"):
+        check(name, _relative_change(previous[name], current[name]), thresholds.balance_change, f"{name} change")
+    if not _missing(current["macd_diff"]) and (previous["macd_diff"] > 0) != (current["macd_diff"] > 0):
+        changes.append("MACD histogram sign flipped")
+    return changes
+
+
+def _enabled_from_env():
+    return os.getenv("PREFILTER_ENABLED", "true").lower() not in ("false", "0", "off")
+
+
+class PreFilter:
+    """
+    thresholds/enabled를 지정하지 않으면 처음 사용할 때 환경 변수에서 읽는다
+    (모듈 수준에서 만들어도 이후 load_dotenv()로 읽은 .env 값이 반영된다)
+    """
+
+    def __init__(self, thresholds=None, enabled=None):
+        self._thresholds = thresholds
+        self._enabled = enabled
+        self._lock = threading.Lock()
+        self.stats = {"skip": 0, "decide": 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(Thresholds.from_env(), enabled=_enabled_from_env())
+
+    @property
+    def thresholds(self):
+        if self._thresholds is None:
+            self._thresholds = Thresholds.from_env()
+        return self._thresholds
+
+    @property
+    def enabled(self):
+        if self._enabled is None:
+            self._enabled = _enabled_from_env()
+        return self._enabled
+
+    def _count(self, ticker, outcome, reason):
+        with self._lock:
+            self.stats[outcome] += 1
+            stats = dict(self.stats)
+        logger.info(f"[{ticker}] Pre-filter {outcome}: {reason} ({stats})")
+
+    def should_skip(self, conn, ticker, features, now=None):
+        """
+        LLM 호출을 건너뛸지 판단한다.
+
+        Returns:
+            (skip, reason)
+        """
+        now = time.time() if now is None else now
+        if not self.enabled:
+            return False, "disabled"
+
+        row = conn.execute(
+            "SELECT decision, features, decided_at FROM decision_states WHERE ticker = ?",
+            (ticker,),
+        ).fetchone()
+        if row is None:
+            reason = "no previous decision"
+        elif row[0] != "hold":
+            reason = f"last decision was {row[0]}"
+        elif now - row[2] >= self.thresholds.max_skip_age:
+            reason = f"last decision is {(now - row[2]) / 3600:.1f}h old"
+        else:
+            changes = compare(json.loads(row[1]), features, self.thresholds)
+            if not changes:
+                self._count(ticker, "skip", "no significant change since last hold")
+                return True, "no significant change since last hold"
+            reason = ", ".join(changes)
+
+        self._count(ticker, "decide", reason)
+        return False, reason
+
+    def record_decision(self, conn, ticker, features, decision, now=None):
+        """LLM이 결정한 시점의 상태를 다음 비교 기준으로 저장"""
+        conn.execute(
+            "INSERT OR REPLACE INTO decision_states (ticker, decision, features, decided_at) VALUES (?, ?, ?, ?)",
+            (ticker, decision, json.dumps(features), time.time() if now is None else now),
+        )
+        conn.commit()
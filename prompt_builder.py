@@ -0,0 +1,168 @@
+"""
+프롬프트 빌더
+
+반성/결정 요청의 messages를 한 번만 조립해 토큰 계산과 API 요청에 같은
+객체를 사용한다. 고정 지시문과 워뇨띠 매매기법(strategy.txt)은 파일이
+바뀔 때만 다시 읽어 사이클 간에 재사용한다.
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field
+
+from token_accounting import count_tokens
+
+MODEL = "gpt-4o-2024-11-20"
+
+# 프롬프트에 쓸 자산 이름 (없으면 심볼 그대로 사용)
+ASSET_NAMES = {"BTC": "Bitcoin", "ETH": "Ethereum", "XRP": "XRP", "SOL": "Solana"}
+
+REFLECTION_SYSTEM_PROMPT = "You are an AI trading assistant tasked with analyzing recent trading performance and current market conditions to generate insights and improvements for future trading decisions."
+
+DECISION_SYSTEM_PROMPT = """You are an expert in {asset} investing. Analyze the provided data and determine whether to buy, sell, or hold at the current moment. Consider the following in your analysis:
+
+                - Technical indicators and market data
+                - Recent news headlines and their potential impact on {asset} price
+                - The Fear and Greed Index and its implications
+                - Overall market sentiment
+                - Patterns and trends visible in the chart image
+                - Recent trading performance and reflection
+
+                Particularly important is to always refer to the trading method of 'Wonyyotti', a legendary Korean investor, to assess the current situation and make trading decisions. Wonyyotti's trading method is as follows:
+
+                {youtube_transcript}
+
+                Based on this trading method, analyze the current market situation and make a judgment by synthesizing it with the provided data and recent performance reflection.
+
+                Response format:
+                1. Decision (buy, sell, or hold)
+                2. If the decision is 'buy', provide a percentage (1-100) of available KRW to use for buying.
+                If the decision is 'sell', provide a percentage (1-100) of held {currency} to sell.
+                If the decision is 'hold', set the percentage to 0.
+                3. Reason for your decision
+
+                Ensure that the percentage is an integer between 1 and 100 for buy/sell decisions, and exactly 0 for hold decisions.
+                Your percentage should reflect the strength of your conviction in the decision based on the analyzed data."""
+
+DECISION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "trading_decision",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "decision": {
+                    "type": "string",
+                    "enum": ["buy", "sell", "hold"],
+                },
+                "percentage": {"type": "integer"},
+                "reason": {"type": "string"},
+            },
+            "required": ["decision", "percentage", "reason"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+@dataclass
+class Prompt:
+    """토큰 계산과 API 요청에 함께 쓰이는 완성된 요청"""
+
+    messages: list
+    model: str = MODEL
+    options: dict = field(default_factory=dict)
+    token_count: int = 0
+
+    def request(self):
+        """client.chat.completions.create()에 넘길 인자"""
+        return {"model": self.model, "messages": self.messages, **self.options}
+
+
+class PromptBuilder:
+    def __init__(self, strategy_path="strategy.txt"):
+        self.strategy_path = strategy_path
+        self._lock = threading.Lock()
+        self._strategy_mtime = None
+        self._youtube_transcript = None
+        # ticker -> 고정 지시문 메시지
+        self._decision_system_messages = {}
+        self._reflection_system_message = {
+            "role": "developer",
+            "content": REFLECTION_SYSTEM_PROMPT,
+        }
+
+    def decision_system_message(self, ticker="KRW-BTC"):
+        """매매기법이 포함된 고정 지시문. strategy.txt가 바뀐 경우에만 다시 만든다."""
+        mtime = os.path.getmtime(self.strategy_path)
+        with self._lock:
+            if self._youtube_transcript is None or mtime != self._strategy_mtime:
+                # YOUTUBE 워뇨띠 매매기법 가져오기
+                with open(self.strategy_path, "r", encoding="utf-8") as f:
+                    self._youtube_transcript = f.read()
+                self._strategy_mtime = mtime
+                self._decision_system_messages.clear()
+
+            if ticker not in self._decision_system_messages:
+                currency = ticker.split("-")[1]
+                self._decision_system_messages[ticker] = {
+                    "role": "developer",
+                    "content": DECISION_SYSTEM_PROMPT.format(
+                        asset=ASSET_NAMES.get(currency, currency),
+                        currency=currency,
+                        youtube_transcript=self._youtube_transcript,
+                    ),
+                }
+            return self._decision_system_messages[ticker]
+
+    def reflection_prompt(self, trades_df, current_market_data, performance):
+        messages = [
+            self._reflection_system_message,
+            {
+                "role": "user",
+                "content": f"""
+                Last 24 trades data:
+                {trades_df.to_json(orient='records')}
+
+                Current market data:
+                {current_market_data}
+
+                Overall performance: {performance:.2f}%
+
+                Please analyze this data and provide:
+                1. A brief reflection on the recent 24 trading decisions
+                2. Patterns in successful and unsuccessful trades
+                3. Key market conditions that influenced these trades
+                4. Specific suggestions for improvement in future trading decisions
+
+                Limit your response to 250 words or less, focusing on actionable insights.
+                """,
+            },
+        ]
+        return Prompt(messages=messages, token_count=count_tokens(messages))
+
+    def decision_prompt(self, reflection, market_prompt, ticker="KRW-BTC"):
+        # 고정 지시문을 앞에 두고 사이클마다 바뀌는 반성 내용은 별도 메시지로 보낸다
+        messages = [
+            self.decision_system_message(ticker),
+            {
+                "role": "developer",
+                "content": f"""Recent trading reflection:
+                {reflection}""",
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": market_prompt,
+                    }
+                ],
+            },
+        ]
+        return Prompt(
+            messages=messages,
+            options={"response_format": DECISION_RESPONSE_FORMAT, "max_tokens": 4095},
+            token_count=count_tokens(messages),
+        )
@@ -0,0 +1,220 @@
+"""
+프롬프트용 시장 데이터 직렬화
+
+df.to_json()과 json.dumps(orderbook)를 그대로 넣으면 epoch-ms 키와
+소수점 15자리 숫자가 입력 토큰의 대부분을 차지한다. 여기서는
+- 캔들/지표를 반올림된 CSV 형태의 표로,
+- 지표가 비어 있는 행은 제외하고,
+- 호가는 상위 N호가만
+직렬화하고, 토큰 예산을 넘으면 덜 중요한 섹션부터 줄인다.
+"""
+
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+# 가격 크기와 관계없는 컬럼의 소수점 자릿수
+PRECISION = {
+    "volume": 3,
+    "value": 0,
+    "rsi": 1,
+}
+
+# 가격 단위 컬럼은 종가 크기 기준, MACD 계열은 컬럼 값의 크기 기준으로 유효 숫자를 남긴다
+# (KRW-BTC는 정수, 수백 원대 마켓은 소수점 둘째 자리까지)
+PRICE_COLUMNS = ["open", "high", "low", "close", "bb_bbm", "bb_bbh", "bb_bbl", "sma_20", "ema_12"]
+OSCILLATOR_COLUMNS = ["macd", "macd_signal", "macd_diff"]
+PRICE_SIGNIFICANT_DIGITS = 5
+OSCILLATOR_SIGNIFICANT_DIGITS = 3
+MAX_DIGITS = 8
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+INDICATOR_COLUMNS = [
+    "bb_bbm",
+    "bb_bbh",
+    "bb_bbl",
+    "rsi",
+    "macd",
+    "macd_signal",
+    "macd_diff",
+    "sma_20",
+    "ema_12",
+]
+
+# 예산 초과 시 순서대로 적용하는 축소 단계 (섹션별 행/항목 수)
+SHRINK_STEPS = [
+    {"hourly_rows": 24, "daily_rows": 30, "orderbook_depth": 5, "news": 5},
+    {"hourly_rows": 24, "daily_rows": 14, "orderbook_depth": 5, "news": 5},
+    {"hourly_rows": 12, "daily_rows": 14, "orderbook_depth": 3, "news": 5},
+    {"hourly_rows": 12, "daily_rows": 7, "orderbook_depth": 3, "news": 3},
+    {"hourly_rows": 6, "daily_rows": 7, "orderbook_depth": 1, "news": 3},
+    {"hourly_rows": 6, "daily_rows": 3, "orderbook_depth": 1, "news": 0},
+]
+
+
+def _format_number(value, digits):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if digits == 0:
+        return str(int(round(value)))
+    return f"{value:.{digits}f}".rstrip("0").rstrip(".")
+
+
+def significant_digits(magnitude, significant=PRICE_SIGNIFICANT_DIGITS):
+    """magnitude 크기의 값을 유효 숫자 significant개로 표시하는 소수점 자릿수"""
+    if not magnitude or not math.isfinite(magnitude):
+        return 0
+    return min(MAX_DIGITS, max(0, significant - 1 - math.floor(math.log10(abs(magnitude)))))
+
+
+def column_precision(df, columns):
+    """직렬화할 구간의 값 크기에 맞춘 컬럼별 소수점 자릿수"""
+    price_digits = significant_digits(df["close"].abs().median()) if "close" in df else 0
+    precision = {}
+    for column in columns:
+        if column in PRICE_COLUMNS:
+            precision[column] = price_digits
+        elif column in OSCILLATOR_COLUMNS:
+            precision[column] = significant_digits(df[column].abs().max(), OSCILLATOR_SIGNIFICANT_DIGITS)
+        else:
+            precision[column] = PRECISION.get(column, 2)
+    return precision
+
+
+def serialize_candles(df, max_rows=None, time_format="%Y-%m-%d %H:%M"):
+    """
+    캔들 + 지표 DataFrame을 CSV 형태의 표로 직렬화한다.
+
+    전부 비어 있는 지표 컬럼은 빼고, 남은 지표 중 값이 비어 있는 행은 제외한다.
+    """
+    indicators = [c for c in INDICATOR_COLUMNS if c in df and df[c].notna().any()]
+    columns = [c for c in OHLCV_COLUMNS if c in df] + indicators
+    if indicators:
+        df = df.dropna(subset=indicators)
+    if max_rows is not None:
+        df = df.tail(max_rows)
+
+    precision = column_precision(df, columns)
+    lines = [",".join(["time"] + columns)]
+    for ts, row in zip(df.index, df[columns].itertuples(index=False, name=None)):
+        cells = [ts.strftime(time_format)]
+        cells += [_format_number(v, precision[c]) for c, v in zip(columns, row)]
+        lines.append(",".join(cells))
+    return "\n".join(lines)
+
+
+def serialize_orderbook(orderbook, depth=5):
+    """호가 상위 depth단계와 총 잔량만 직렬화"""
+    if not orderbook:
+        return "unavailable"
+    units = orderbook.get("orderbook_units", [])[:depth]
+    price_digits = significant_digits(units[0]["ask_price"]) if units else 0
+    lines = [
+        f"total_ask_size={_format_number(orderbook.get('total_ask_size'), 4)}, "
+        f"total_bid_size={_format_number(orderbook.get('total_bid_size'), 4)}",
+        "ask_price,ask_size,bid_price,bid_size",
+    ]
+    for unit in units:
+        lines.append(
+            ",".join(
+                [
+                    _format_number(unit["ask_price"], price_digits),
+                    _format_number(unit["ask_size"], 4),
+                    _format_number(unit["bid_price"], price_digits),
+                    _format_number(unit["bid_size"], 4),
+                ]
+            )
+        )
+    return "\n".join(lines)
+
+
+def serialize_news(headlines, limit=5):
+    if not headlines or limit == 0:
+        return "none"
+    return "\n".join(f"- {item['title']} ({item['date']})" for item in headlines[:limit])
+
+
+def serialize_fear_greed(index):
+    if not index:
+        return "unavailable"
+    return f"{index.get('value')} ({index.get('value_classification')})"
+
+
+def serialize_status(status, currency="BTC"):
+    return "\n".join(
+        [
+            f"- KRW Balance: {status['krw_balance']}",
+            f"- {currency} Balance: {status['coin_balance']}",
+            f"- Average Buy Price: {status['avg_buy_price']}",
+            f"- Current Price: {status['current_price']}",
+        ]
+    )
+
+
+def _render(ticker, sections):
+    return f"""Market: {ticker}
+
+Current Balance Status:
+{sections['status']}
+
+Technical Analysis Data (CSV, KST):
+Daily Chart:
+{sections['daily']}
+
+Hourly Chart:
+{sections['hourly']}
+
+Order Book:
+{sections['orderbook']}
+
+News Headlines:
+{sections['news']}
+
+Fear and Greed Index: {sections['fear_greed']}"""
+
+
+def build_market_prompt(
+    ticker,
+    status,
+    df_daily,
+    df_hourly,
+    orderbook,
+    news_headlines,
+    fear_greed_index,
+    count_fn,
+    token_budget=None,
+):
+    """
+    결정 프롬프트의 시장 데이터 부분을 토큰 예산 안에서 생성한다.
+
+    Args:
+        count_fn (callable): 문자열의 토큰 수를 반환하는 함수
+        token_budget (int, optional): 최대 토큰 수. None이면 제한 없음
+
+    Returns:
+        (text, usage): 프롬프트 문자열, {section: tokens, "total": tokens}
+    """
+    for step in SHRINK_STEPS:
+        sections = {
+            "status": serialize_status(status, currency=ticker.split("-")[1]),
+            "daily": serialize_candles(
+                df_daily, max_rows=step["daily_rows"], time_format="%Y-%m-%d"
+            ),
+            "hourly": serialize_candles(df_hourly, max_rows=step["hourly_rows"]),
+            "orderbook": serialize_orderbook(orderbook, depth=step["orderbook_depth"]),
+            "news": serialize_news(news_headlines, limit=step["news"]),
+            "fear_greed": serialize_fear_greed(fear_greed_index),
+        }
+        text = _render(ticker, sections)
+        total = count_fn(text)
+        if token_budget is None or total <= token_budget:
+            break
+    else:
+        logger.warning(
+            f"Market data prompt ({total} tokens) exceeds budget of {token_budget} tokens"
+        )
+
+    usage = {name: count_fn(section) for name, section in sections.items()}
+    usage["total"] = total
+    return text, usage
@@ -0,0 +1,204 @@
+"""
+Upbit 요청 수 제한 스케줄러
+
+Upbit은 Remaining-Req 그룹별로 초당 요청 수를 제한한다. 마켓이나 실행 주기를
+늘리면 429가 나기 쉬우므로 Upbit 세션의 모든 요청이 보내기 전에 그룹의 토큰을
+받도록 한다.
+
+- 그룹마다 토큰 버킷을 두고, 응답의 Remaining-Req 헤더(sec=남은 요청 수)로
+  버킷을 서버 기준에 맞춘다 (다른 프로세스가 같은 키를 써도 맞춰진다)
+- 토큰을 기다리는 요청은 우선순위 순으로 받는다: 주문 > 계좌 > 시세
+- 429를 받으면 해당 그룹을 잠시 멈추고 같은 요청을 다시 보낸다
+- 요청 타임아웃(resilience.call_timeout()으로 남은 시도 시간에 맞춰진 값) 안에
+  토큰을 받지 못하면 보내지 않고 RateLimitTimeout을 던진다
+
+여러 마켓의 현재가/호가는 multi_market.fetch_quotes()가 이미 한 번의 요청으로
+묶어서 조회하므로, 여기서는 요청을 합치지 않고 순서와 속도만 조절한다.
+"""
+
+import heapq
+import itertools
+import logging
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# 그룹별 초당 요청 수 (Upbit 공개 제한)
+UPBIT_RATE_LIMITS = {
+    "market": 10,
+    "candles": 10,
+    "ticker": 10,
+    "orderbook": 10,
+    "trades": 10,
+    "default": 30,
+    "order": 8,
+}
+
+PRIORITY_ORDER = 0
+PRIORITY_ACCOUNT = 1
+PRIORITY_MARKET_DATA = 2
+
+# 429 이후 그룹을 멈추는 시간 (초)
+THROTTLE_PAUSE = 1.0
+
+_REMAINING_REQ = re.compile(r"group=([a-z\-]+); min=([0-9]+); sec=([0-9]+)")
+
+
+class RateLimitTimeout(TimeoutError):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._clock = clock
+        self.tokens = float(self.capacity)
+        self.updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """토큰 하나를 쓸 수 있을 때까지 남은 시간 (초)"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def limit(self, remaining):
+        """서버가 알려준 남은 요청 수보다 많이 보내지 않도록 맞춘다"""
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+    def pause(self, seconds):
+        self._refill()
+        self.tokens = min(self.tokens, 1 - self.rate * seconds)
+
+
+def upbit_group(method, url):
+    """요청이 속한 Remaining-Req 그룹"""
+    path = urlsplit(url).path
+    if path.startswith("/v1/candles/"):
+        return "candles"
+    if path.startswith("/v1/trades/"):
+        return "trades"
+    for group in ("ticker", "orderbook"):
+        if path == f"/v1/{group}":
+            return group
+    if path.startswith("/v1/market/"):
+        return "market"
+    if (method.upper() == "POST" and path == "/v1/orders") or (method.upper() == "DELETE" and path == "/v1/order"):
+        return "order"
+    return "default"
+
+
+def upbit_priority(method, url):
+    path = urlsplit(url).path
+    # 주문 접수/취소와 체결 확인 조회
+    if path in ("/v1/orders", "/v1/order"):
+        return PRIORITY_ORDER
+    if path == "/v1/accounts":
+        return PRIORITY_ACCOUNT
+    return PRIORITY_MARKET_DATA
+
+
+class RateLimiter:
+    """
+    그룹별 토큰 버킷과 우선순위 대기열
+
+    acquire()는 같은 그룹에서 우선순위가 가장 높은(값이 작은) 대기 요청부터
+    토큰을 받는다. 같은 우선순위는 먼저 온 순서대로 받는다.
+    """
+
+    def __init__(self, rates=None, max_retries=2, clock=time.monotonic):
+        self.rates = dict(rates or UPBIT_RATE_LIMITS)
+        self.max_retries = max_retries
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._buckets = {group: TokenBucket(rate, clock=clock) for group, rate in self.rates.items()}
+        self._waiting = {group: [] for group in self.rates}
+        self._seq = itertools.count()
+        self.stats = {"requests": 0, "waited": 0, "wait_seconds": 0.0, "throttled": 0, "timed_out": 0}
+
+    def acquire(self, group, priority=PRIORITY_MARKET_DATA, deadline=None):
+        """
+        토큰을 받을 때까지 기다린다. 기다린 시간(초)을 반환.
+        deadline(clock 기준 시각)까지 받지 못하면 RateLimitTimeout
+        """
+        bucket = self._buckets.get(group)
+        if bucket is None:
+            return 0.0
+        started = self._clock()
+        entry = (priority, next(self._seq))
+        waiting = self._waiting[group]
+        with self._cond:
+            heapq.heappush(waiting, entry)
+            try:
+                while True:
+                    wait = bucket.wait_time()
+                    if waiting[0] == entry and wait <= 0:
+                        bucket.take()
+                        break
+                    now = self._clock()
+                    if deadline is not None and now + wait >= deadline:
+                        self.stats["timed_out"] += 1
+                        raise RateLimitTimeout(
+                            f"No Upbit '{group}' rate limit token within {deadline - started:.2f}s"
+                        )
+                    # 앞선 요청이 토큰을 받으면 깨어나고, 아니어도 토큰이 찰 시간에 다시 확인한다
+                    timeout = max(wait, 0.001)
+                    if deadline is not None:
+                        timeout = min(timeout, deadline - now)
+                    self._cond.wait(timeout=timeout)
+            finally:
+                waiting.remove(entry)
+                heapq.heapify(waiting)
+                self._cond.notify_all()
+
+            waited = self._clock() - started
+            self.stats["requests"] += 1
+            if waited > 0.001:
+                self.stats["waited"] += 1
+                self.stats["wait_seconds"] += waited
+        return waited
+
+    def observe(self, group, response):
+        """응답의 Remaining-Req 헤더와 429를 버킷에 반영한다"""
+        bucket = self._buckets.get(group)
+        if bucket is None:
+            return
+        with self._cond:
+            if response.status_code == 429:
+                self.stats["throttled"] += 1
+                bucket.pause(THROTTLE_PAUSE)
+                logger.warning(f"Upbit rate limit hit for group '{group}', pausing {THROTTLE_PAUSE}s")
+                return
+            matched = _REMAINING_REQ.search(response.headers.get("Remaining-Req", ""))
+            if matched:
+                # 그룹은 서버가 알려준 이름을 우선한다
+                bucket = self._buckets.get(matched.group(1), bucket)
+                bucket.limit(int(matched.group(3)))
+
+    def request(self, send, method, url, timeout=None):
+        """
+        send()를 요청 수 제한에 맞춰 실행한다. 429는 그룹을 멈춘 뒤 max_retries번까지 다시 보낸다
+        (429는 요청이 처리되지 않았다는 뜻이므로 주문도 다시 보내도 안전하다).
+        토큰 대기는 재시도를 포함해 timeout(초) 안에서만 한다.
+        """
+        group = upbit_group(method, url)
+        priority = upbit_priority(method, url)
+        deadline = self._clock() + timeout if timeout is not None else None
+        for _ in range(self.max_retries + 1):
+            self.acquire(group, priority, deadline)
+            response = send()
+            self.observe(group, response)
+            if response.status_code != 429:
+                break
+        return response
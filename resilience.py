@@ -0,0 +1,247 @@
+"""
+외부 호출 복원력 (재시도 / 회로 차단기 / 대체 값)
+
+잔고, 캔들, 호가, 공포탐욕지수, 뉴스, OpenAI 호출은 실패하면 None을 반환하거나
+예외를 던져 사이클 전체가 다음 정각까지 중단되곤 했다. 의존 서비스마다 정책을 두고
+Resilience.call()로 감싸 호출한다.
+
+- 시도마다 타임아웃(정책의 timeout과 남은 마감 시간 중 짧은 쪽)을 둔다.
+  같은 스레드의 PooledSession 요청은 call_timeout()으로 이 값을 따른다
+- 실패(예외 또는 None)는 full jitter 지수 백오프로 재시도하되 마감 시간을 넘기지 않는다
+- 연속 실패가 failure_threshold에 이르면 회로를 열어 reset_timeout 동안 호출하지 않고,
+  그 뒤 한 번의 시험 호출이 성공하면 닫는다
+- 모두 실패하면 max_stale 안의 마지막 성공 값을 반환하고, 없으면 마지막 예외를 던진다
+
+사이클 마감 시간은 CYCLE_DEADLINE(초, 기본 240)으로 정한다.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CYCLE_DEADLINE = 240.0
+# 마감이 임박해도 요청 하나에 주는 최소 타임아웃 (초)
+MIN_CALL_TIMEOUT = 0.5
+
+
+@dataclass(frozen=True)
+class Policy:
+    timeout: float = 10.0
+    attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 2.0
+    failure_threshold: int = 5
+    reset_timeout: float = 60.0
+    # 마지막 성공 값을 대체 값으로 쓸 수 있는 시간 (초). 0이면 사용하지 않는다
+    max_stale: float = 300.0
+
+
+POLICIES = {
+    "upbit_account": Policy(timeout=5.0, reset_timeout=30.0),
+    "upbit_quotation": Policy(timeout=5.0, reset_timeout=30.0),
+    "alternative_me": Policy(timeout=5.0, attempts=2, reset_timeout=300.0, max_stale=24 * 3600),
+    "serpapi": Policy(timeout=10.0, attempts=2, reset_timeout=300.0, max_stale=12 * 3600),
+    # LLM 응답은 요청마다 다르므로 이전 응답을 대체 값으로 쓰지 않는다
+    "openai": Policy(timeout=60.0, base_delay=1.0, max_delay=8.0, failure_threshold=3, reset_timeout=120.0, max_stale=0),
+}
+DEFAULT_POLICY = Policy()
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline:
+    def __init__(self, seconds, clock=time.monotonic):
+        self._clock = clock
+        self.expires_at = clock() + seconds
+
+    @classmethod
+    def from_env(cls):
+        return cls(float(os.getenv("CYCLE_DEADLINE", DEFAULT_CYCLE_DEADLINE)))
+
+    def remaining(self):
+        return max(0.0, self.expires_at - self._clock())
+
+    def earliest(self, other):
+        if other is None or self.expires_at <= other.expires_at:
+            return self
+        return other
+
+
+_local = threading.local()
+
+
+def call_timeout(default):
+    """현재 스레드에서 진행 중인 시도의 남은 시간과 default 중 짧은 쪽"""
+    deadline = getattr(_local, "deadline", None)
+    if deadline is None:
+        return default
+    return max(MIN_CALL_TIMEOUT, min(default, deadline.remaining()))
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and self._clock() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._trial = False
+            if self.state == "closed":
+                return True
+            # half_open에서는 시험 호출 하나만 보낸다
+            if self.state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"Circuit '{self.name}' closed")
+            self.state = "closed"
+            self.failures = 0
+            self._trial = False
+
+    def release(self):
+        """성공/실패를 기록하지 않고 끝난 시험 호출의 자리를 돌려준다"""
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                logger.warning(
+                    f"Circuit '{self.name}' opened after {self.failures} failures, "
+                    f"retrying in {self.reset_timeout:.0f}s"
+                )
+                self.state = "open"
+                self.opened_at = self._clock()
+                self._trial = False
+
+
+class Resilience:
+    def __init__(self, policies=None, sleep=time.sleep, clock=time.monotonic):
+        self.policies = dict(policies or POLICIES)
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._breakers = {}
+        self._last_good = {}
+        self.stats = {}
+
+    def policy(self, dependency):
+        return self.policies.get(dependency, DEFAULT_POLICY)
+
+    def breaker(self, dependency):
+        with self._lock:
+            if dependency not in self._breakers:
+                policy = self.policy(dependency)
+                self._breakers[dependency] = CircuitBreaker(
+                    dependency, policy.failure_threshold, policy.reset_timeout, clock=self._clock
+                )
+            return self._breakers[dependency]
+
+    def _count(self, dependency, key):
+        with self._lock:
+            counts = self.stats.setdefault(dependency, {"success": 0, "failure": 0, "retry": 0, "fallback": 0})
+            counts[key] += 1
+
+    def _fallback(self, key, max_stale):
+        with self._lock:
+            entry = self._last_good.get(key)
+        if entry is None or max_stale <= 0:
+            return None, None
+        value, stored_at = entry
+        age = self._clock() - stored_at
+        return (value, age) if age <= max_stale else (None, None)
+
+    def call(self, dependency, fn, key=None, deadline=None, no_retry=(), max_stale=None):
+        """
+        fn()을 dependency의 정책에 따라 호출한다.
+
+        Args:
+            key (str, optional): 마지막 성공 값을 구분하는 키 (기본값은 dependency)
+            deadline (Deadline, optional): 재시도를 포함해 이 시각을 넘기지 않는다
+            no_retry (tuple): 재시도/실패 집계 없이 그대로 전달할 예외 타입
+            max_stale (float, optional): 정책의 max_stale 대신 사용 (0이면 대체 값 없음)
+        """
+        policy = self.policy(dependency)
+        breaker = self.breaker(dependency)
+        key = key or dependency
+        error = None
+        for attempt in range(policy.attempts):
+            # 마감 확인을 먼저 한다 (allow()가 half_open의 시험 호출 자리를 잡기 전에)
+            attempt_deadline = Deadline(policy.timeout, clock=self._clock).earliest(deadline)
+            if attempt_deadline.remaining() <= 0:
+                error = error or DeadlineExceeded(f"No time left for {dependency}")
+                break
+            if not breaker.allow():
+                error = CircuitOpenError(f"Circuit '{dependency}' is open")
+                break
+
+            previous, _local.deadline = getattr(_local, "deadline", None), attempt_deadline
+            try:
+                result = fn()
+            except no_retry:
+                # 의존 서비스의 실패가 아니므로 집계하지 않고 시험 호출 자리만 돌려준다
+                breaker.release()
+                raise
+            except Exception as e:
+                error = e
+            else:
+                if result is not None:
+                    breaker.record_success()
+                    self._count(dependency, "success")
+                    with self._lock:
+                        self._last_good[key] = (result, self._clock())
+                    return result
+                error = ValueError(f"{dependency} returned no data")
+            finally:
+                _local.deadline = previous
+
+            breaker.record_failure()
+            self._count(dependency, "failure")
+            if attempt + 1 == policy.attempts:
+                break
+            delay = random.uniform(0, min(policy.max_delay, policy.base_delay * 2**attempt))
+            if deadline is not None and deadline.remaining() <= delay + MIN_CALL_TIMEOUT:
+                break
+            logger.warning(f"{dependency} call failed ({error}), retrying in {delay:.2f}s")
+            self._count(dependency, "retry")
+            self._sleep(delay)
+
+        value, age = self._fallback(key, policy.max_stale if max_stale is None else max_stale)
+        if value is not None:
+            logger.warning(f"{dependency} unavailable ({error}), using last good {key} from {age:.0f}s ago")
+            self._count(dependency, "fallback")
+            return value
+        raise error
+
+    def states(self):
+        with self._lock:
+            return {name: breaker.state for name, breaker in self._breakers.items()}
+
+
+# 봇 프로세스 전체에서 공유 (회로 상태와 마지막 성공 값은 사이클 간에 유지된다)
+resilience = Resilience()
@@ -0,0 +1,293 @@
+"""
+거래 기록 집계 (rollup)
+
+대시보드가 렌더링할 때마다 전체 거래를 다시 훑지 않도록 log_trade()가 행을
+기록할 때 함께 갱신하는 두 테이블을 둔다.
+- trade_rollups: 마켓별 일/주 단위 코인 평가액 OHLC와 가격 범위,
+  ACCOUNT 행은 계좌 전체 가치 OHLC
+- trade_metrics: 마켓별 포지션 손익(실현 + 평단가 대비 미실현)과 매도 승률,
+  ACCOUNT 행은 계좌 전체 가치의 손익과 최고점 대비 최대 낙폭
+
+KRW 잔고는 모든 마켓이 공유하므로 마켓별 가치에 넣지 않는다. 계좌 전체 가치는
+거래 시점의 KRW 잔고에 마켓별 마지막 코인 평가액을 더해 한 번만 계산한다.
+
+긴 구간의 원시 시계열은 차트 해상도에 맞게 LTTB 또는 구간별 최소/최대로 줄인다.
+"""
+
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 집계 단위 이름 -> 초
+BUCKETS = {"1d": 86400, "1w": 7 * 86400}
+# 계좌 전체 집계 행의 ticker
+ACCOUNT = "ACCOUNT"
+
+
+def init_rollups(conn):
+    # 마켓별 가치에 KRW 잔고를 포함하던 이전 집계는 버리고 다시 만든다 (init_db가 재구성)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(trade_metrics)")]
+    if columns and "realized_pnl" not in columns:
+        conn.execute("DROP TABLE trade_metrics")
+        conn.execute("DROP TABLE IF EXISTS trade_rollups")
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS trade_rollups
+                 (ticker TEXT,
+                  bucket TEXT,
+                  bucket_ts INTEGER,
+                  open REAL,
+                  high REAL,
+                  low REAL,
+                  close REAL,
+                  price_low REAL,
+                  price_high REAL,
+                  price_close REAL,
+                  trades INTEGER,
+                  PRIMARY KEY (ticker, bucket, bucket_ts))"""
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS trade_metrics
+                 (ticker TEXT PRIMARY KEY,
+                  last_id INTEGER,
+                  first_value REAL,
+                  last_value REAL,
+                  peak_value REAL,
+                  max_drawdown REAL,
+                  sells INTEGER,
+                  winning_sells INTEGER,
+                  avg_buy_price REAL,
+                  coin_balance REAL,
+                  price REAL,
+                  realized_pnl REAL,
+                  updated_at INTEGER)"""
+    )
+    conn.commit()
+
+
+def _bucket_ts(ts, seconds):
+    """로컬 자정(주 단위는 월요일) 기준 구간 시작 시각"""
+    offset = time.localtime(ts).tm_gmtoff
+    local = ts + offset
+    if seconds == BUCKETS["1w"]:
+        # epoch(1970-01-01)은 목요일이므로 월요일 기준으로 3일 당긴다
+        local += 3 * 86400
+        return (local // seconds * seconds) - 3 * 86400 - offset
+    return local // seconds * seconds - offset
+
+
+def _update_bucket(conn, ticker, ts, value, price):
+    for bucket, seconds in BUCKETS.items():
+        conn.execute(
+            """INSERT INTO trade_rollups
+                     (ticker, bucket, bucket_ts, open, high, low, close, price_low, price_high, price_close, trades)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+                     ON CONFLICT (ticker, bucket, bucket_ts) DO UPDATE SET
+                       high = max(high, excluded.high),
+                       low = min(low, excluded.low),
+                       close = excluded.close,
+                       price_low = min(price_low, excluded.price_low),
+                       price_high = max(price_high, excluded.price_high),
+                       price_close = excluded.price_close,
+                       trades = trades + 1""",
+            (ticker, bucket, _bucket_ts(ts, seconds), value, value, value, value, price, price, price),
+        )
+
+
+def _update_position(conn, trade_id, ticker, ts, decision, percentage, coin_balance, avg_buy_price, price):
+    """마켓별 포지션 상태와 손익. 이미 반영한 거래면 False"""
+    row = conn.execute(
+        "SELECT last_id, sells, winning_sells, avg_buy_price, coin_balance, realized_pnl FROM trade_metrics WHERE ticker = ?",
+        (ticker,),
+    ).fetchone()
+    value = coin_balance * price
+    if row is None:
+        conn.execute(
+            """INSERT INTO trade_metrics
+                     (ticker, last_id, first_value, last_value, peak_value, max_drawdown, sells, winning_sells,
+                      avg_buy_price, coin_balance, price, realized_pnl, updated_at)
+                     VALUES (?, ?, ?, ?, ?, 0, 0, 0, ?, ?, ?, 0, ?)""",
+            (ticker, trade_id, value, value, value, avg_buy_price, coin_balance, price, ts),
+        )
+        return True
+    last_id, sells, winning_sells, previous_avg_buy_price, previous_balance, realized_pnl = row
+    if trade_id <= last_id:
+        return False
+
+    # 매도 승률: 직전 평단가보다 높은 가격에 실제로 매도한 비율
+    if decision == "sell" and percentage > 0:
+        sells += 1
+        if previous_avg_buy_price and price > previous_avg_buy_price:
+            winning_sells += 1
+        sold = (previous_balance or 0.0) - coin_balance
+        if sold > 0 and previous_avg_buy_price:
+            realized_pnl += sold * (price - previous_avg_buy_price)
+    conn.execute(
+        """UPDATE trade_metrics SET last_id = ?, last_value = ?, peak_value = max(peak_value, ?),
+                 sells = ?, winning_sells = ?, avg_buy_price = ?, coin_balance = ?, price = ?,
+                 realized_pnl = ?, updated_at = ?
+                 WHERE ticker = ?""",
+        (trade_id, value, value, sells, winning_sells, avg_buy_price, coin_balance, price, realized_pnl, ts, ticker),
+    )
+    return True
+
+
+def _update_account(conn, trade_id, ts, krw_balance):
+    """KRW 잔고(공유) + 마켓별 마지막 코인 평가액으로 계좌 전체 가치를 갱신한다"""
+    coin_value = conn.execute(
+        "SELECT COALESCE(SUM(coin_balance * price), 0) FROM trade_metrics WHERE ticker != ?",
+        (ACCOUNT,),
+    ).fetchone()[0]
+    value = krw_balance + coin_value
+    _update_bucket(conn, ACCOUNT, ts, value, None)
+
+    row = conn.execute("SELECT peak_value, max_drawdown FROM trade_metrics WHERE ticker = ?", (ACCOUNT,)).fetchone()
+    if row is None:
+        conn.execute(
+            """INSERT INTO trade_metrics
+                     (ticker, last_id, first_value, last_value, peak_value, max_drawdown, sells, winning_sells, updated_at)
+                     VALUES (?, ?, ?, ?, ?, 0, 0, 0, ?)""",
+            (ACCOUNT, trade_id, value, value, value, ts),
+        )
+        return
+    peak, max_drawdown = row
+    peak = max(peak, value)
+    drawdown = (peak - value) / peak if peak > 0 else 0.0
+    conn.execute(
+        """UPDATE trade_metrics SET last_id = ?, last_value = ?, peak_value = ?, max_drawdown = ?, updated_at = ?
+                 WHERE ticker = ?""",
+        (trade_id, value, peak, max(max_drawdown, drawdown), ts, ACCOUNT),
+    )
+
+
+def update_rollups(
+    conn,
+    trade_id,
+    ticker,
+    ts,
+    decision,
+    percentage,
+    coin_balance,
+    krw_balance,
+    avg_buy_price,
+    price,
+):
+    """
+    거래 한 건을 집계 테이블에 반영한다. 커밋은 호출한 쪽에서 한다.
+    """
+    if not _update_position(conn, trade_id, ticker, ts, decision, percentage, coin_balance, avg_buy_price, price):
+        return
+    _update_bucket(conn, ticker, ts, coin_balance * price, price)
+    _update_account(conn, trade_id, ts, krw_balance)
+
+
+def rebuild_rollups(conn, trades):
+    """
+    집계 테이블을 trades(DataFrame, ts 오름차순)로 다시 만든다.
+    trades에는 id, ticker, ts, decision, percentage, btc_balance, krw_balance,
+    btc_avg_buy_price, btc_krw_price 컬럼이 필요하다.
+    """
+    conn.execute("DELETE FROM trade_rollups")
+    conn.execute("DELETE FROM trade_metrics")
+    for row in trades.itertuples(index=False):
+        update_rollups(
+            conn,
+            int(row.id),
+            row.ticker,
+            int(row.ts),
+            row.decision,
+            row.percentage or 0,
+            row.btc_balance or 0.0,
+            row.krw_balance or 0.0,
+            row.btc_avg_buy_price or 0.0,
+            row.btc_krw_price or 0.0,
+        )
+    conn.commit()
+    logger.info(f"Rebuilt trade rollups from {len(trades)} trades")
+
+
+def load_rollups(conn, bucket="1d", ticker=None, start_ts=None, end_ts=None):
+    query = "SELECT ticker, bucket_ts, open, high, low, close, price_low, price_high, price_close, trades FROM trade_rollups WHERE bucket = ?"
+    params = [bucket]
+    if ticker is not None:
+        query += " AND ticker = ?"
+        params.append(ticker)
+    if start_ts is not None:
+        query += " AND bucket_ts >= ?"
+        params.append(start_ts)
+    if end_ts is not None:
+        query += " AND bucket_ts <= ?"
+        params.append(end_ts)
+    return pd.read_sql_query(query + " ORDER BY ticker, bucket_ts", conn, params=params)
+
+
+def load_metrics(conn):
+    """
+    마켓별 포지션 손익/승률과 계좌 전체(ACCOUNT 행) 손익/낙폭.
+    마켓별 pnl은 서로 더할 수 있고, pnl_pct와 max_drawdown은 ACCOUNT 행에만 의미가 있다.
+    """
+    df = pd.read_sql_query("SELECT * FROM trade_metrics ORDER BY ticker", conn)
+    account = df["ticker"] == ACCOUNT
+    position_pnl = df["realized_pnl"] + df["coin_balance"] * (df["price"] - df["avg_buy_price"])
+    df["pnl"] = position_pnl.where(~account, df["last_value"] - df["first_value"])
+    df["pnl_pct"] = (df["pnl"] / df["first_value"].where(df["first_value"] > 0) * 100).where(account)
+    df["win_rate"] = df["winning_sells"] / df["sells"].where(df["sells"] > 0) * 100
+    return df
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets 다운샘플링. 선택된 점의 인덱스를 반환한다.
+    x는 오름차순 숫자 배열이어야 한다.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_downsample(y, n_buckets):
+    """구간마다 최솟값과 최댓값의 인덱스를 남긴다 (급등락 보존)"""
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    indices = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        chunk = y[start:end]
+        indices += sorted({start + int(np.argmin(chunk)), start + int(np.argmax(chunk))})
+    return np.array(indices)
+
+
+def downsample(df, x, y, max_points=2000, method="lttb"):
+    """df를 y 컬럼 기준으로 max_points개 이하로 줄인다"""
+    if len(df) <= max_points:
+        return df
+    if method == "minmax":
+        index = minmax_downsample(df[y].to_numpy(), max_points // 2)
+    else:
+        xs = df[x]
+        if pd.api.types.is_datetime64_any_dtype(xs):
+            xs = xs.astype("int64")
+        index = lttb(xs.to_numpy(), df[y].to_numpy(), max_points)
+    return df.iloc[index]
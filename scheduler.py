@@ -0,0 +1,207 @@
+"""
+asyncio 기반 스케줄러
+
+schedule 라이브러리의 1초 폴링 루프 대신 다음 실행 시각까지 잠들었다가
+작업을 워커 스레드에서 실행한다. 작업마다 주기(1h, 15m, 5m ...)와
+실행이 겹칠 때의 정책을 지정할 수 있다.
+
+- skip: 이전 실행이 끝나지 않았으면 이번 실행을 건너뛴다
+- queue: 이전 실행이 끝나는 즉시 이번 실행을 시작한다
+- cancel: 이전 실행에 취소를 요청하고(cancel_event), 정리되면 이번 실행을 시작한다
+
+실행마다 예정 시각과 실제 시작 시각의 차이(jitter)를 schedule_runs 테이블에 기록한다.
+"""
+
+import asyncio
+import logging
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "trading_history.db"
+OVERLAP_POLICIES = ("skip", "queue", "cancel")
+
+# 예정 시각이 이 시간(초) 안에 지났으면 놓치지 않고 바로 실행한다
+DEFAULT_GRACE = 60.0
+
+_CADENCE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_cadence(cadence):
+    """'1h', '15m', '30s' 형식의 주기를 초 단위로 변환"""
+    match = re.fullmatch(r"\s*(\d+)\s*([smhd])\s*", str(cadence).lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid cadence '{cadence}' (expected e.g. 1h, 15m, 30s)")
+    return int(match.group(1)) * _CADENCE_UNITS[match.group(2)]
+
+
+def _utc_offset():
+    return time.localtime().tm_gmtoff
+
+
+def last_deadline(now, interval):
+    """now 이전의 마지막 정렬된 실행 시각 (현지 시간 기준 :00 정렬)"""
+    offset = _utc_offset()
+    return (now + offset) // interval * interval - offset
+
+
+def init_schedule_log(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS schedule_runs
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  job TEXT,
+                  scheduled_at TEXT,
+                  started_at TEXT,
+                  finished_at TEXT,
+                  jitter_ms REAL,
+                  duration_ms REAL,
+                  status TEXT)"""
+    )
+    conn.commit()
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).isoformat() if ts is not None else None
+
+
+@dataclass
+class Job:
+    name: str
+    fn: callable
+    cadence: str = "1h"
+    overlap: str = "skip"
+    grace: float = DEFAULT_GRACE
+
+    def __post_init__(self):
+        self.interval = parse_cadence(self.cadence)
+        if self.overlap not in OVERLAP_POLICIES:
+            raise ValueError(
+                f"Unknown overlap policy '{self.overlap}' for job '{self.name}'"
+            )
+
+
+@dataclass
+class Run:
+    job: Job
+    scheduled_at: float
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    started_at: float = None
+    task: asyncio.Task = None
+
+
+class Scheduler:
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self.jobs = []
+
+    def add_job(self, name, fn, cadence="1h", overlap="skip", grace=DEFAULT_GRACE):
+        """
+        fn(cancel_event)를 cadence마다 실행한다.
+
+        fn은 블로킹 함수이며 워커 스레드에서 실행된다. cancel 정책에서는
+        cancel_event가 설정되면 가능한 빨리(주문 전에) 반환해야 한다.
+        """
+        job = Job(name=name, fn=fn, cadence=cadence, overlap=overlap, grace=grace)
+        self.jobs.append(job)
+        return job
+
+    def next_run_at(self, job, now=None, last_scheduled=None):
+        now = time.time() if now is None else now
+        last = last_deadline(now, job.interval)
+        if (last_scheduled is None or last > last_scheduled) and now - last <= job.grace:
+            return last
+        return last + job.interval
+
+    def _record(self, run, status, finished_at=None):
+        jitter_ms = (
+            (run.started_at - run.scheduled_at) * 1000
+            if run.started_at is not None
+            else None
+        )
+        duration_ms = (
+            (finished_at - run.started_at) * 1000
+            if finished_at is not None and run.started_at is not None
+            else None
+        )
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                init_schedule_log(conn)
+                conn.execute(
+                    """INSERT INTO schedule_runs
+                             (job, scheduled_at, started_at, finished_at, jitter_ms, duration_ms, status)
+                             VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    (
+                        run.job.name,
+                        _iso(run.scheduled_at),
+                        _iso(run.started_at),
+                        _iso(finished_at),
+                        jitter_ms,
+                        duration_ms,
+                        status,
+                    ),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to record schedule run for '{run.job.name}': {e}")
+
+    async def _execute(self, run):
+        run.started_at = time.time()
+        logger.info(
+            f"Job '{run.job.name}' started "
+            f"(jitter {(run.started_at - run.scheduled_at) * 1000:.0f}ms)"
+        )
+        status = "ok"
+        try:
+            await asyncio.to_thread(run.job.fn, run.cancel_event)
+            if run.cancel_event.is_set():
+                status = "cancelled"
+        except Exception as e:
+            status = "error"
+            logger.error(f"Job '{run.job.name}' failed: {e}")
+            logger.exception("상세 에러:")
+        finished_at = time.time()
+        logger.info(
+            f"Job '{run.job.name}' finished with status '{status}' "
+            f"in {finished_at - run.started_at:.1f}s"
+        )
+        await asyncio.to_thread(self._record, run, status, finished_at)
+
+    async def _job_loop(self, job):
+        current = None
+        last_scheduled = None
+        while True:
+            scheduled_at = self.next_run_at(job, last_scheduled=last_scheduled)
+            logger.info(f"Next '{job.name}' run at {_iso(scheduled_at)}")
+            await asyncio.sleep(max(0.0, scheduled_at - time.time()))
+            last_scheduled = scheduled_at
+            run = Run(job=job, scheduled_at=scheduled_at)
+
+            if current is not None and not current.task.done():
+                if job.overlap == "skip":
+                    logger.warning(
+                        f"Skipping '{job.name}' run: previous run still in progress"
+                    )
+                    await asyncio.to_thread(self._record, run, "skipped")
+                    continue
+                if job.overlap == "cancel":
+                    logger.warning(f"Cancelling previous '{job.name}' run")
+                    current.cancel_event.set()
+                # queue/cancel 모두 이전 실행이 정리된 뒤 시작한다
+                await asyncio.shield(current.task)
+
+            run.task = asyncio.create_task(self._execute(run))
+            current = run
+
+    async def run(self):
+        """등록된 모든 작업을 실행한다. 취소될 때까지 반환하지 않는다."""
+        if not self.jobs:
+            raise ValueError("No jobs scheduled")
+        await asyncio.gather(*(self._job_loop(job) for job in self.jobs))
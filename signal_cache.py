@@ -0,0 +1,134 @@
+"""
+느리게 변하는 외부 지표(공포탐욕지수, 뉴스) 캐시
+
+alternative.me 공포탐욕지수는 하루 한 번 갱신되고 뉴스 헤드라인도 천천히
+바뀌므로 매시간 네트워크(와 유료 SerpAPI 쿼터)를 쓸 필요가 없다.
+
+- 소스별 TTL 안의 값은 그대로 반환한다 (hit)
+- TTL이 지났지만 max_stale 안이면 기존 값을 즉시 반환하고 백그라운드에서 갱신한다
+  (stale-while-revalidate)
+- 그 외에는 동기적으로 조회한다 (miss). 조회가 실패하면 max_stale이 지난
+  값이라도 남아 있으면 반환한다 (expired)
+
+캐시는 JSON 파일로 저장되어 재시작 후에도 유지된다.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from market_data import submit
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = "signal_cache.json"
+
+# 소스별 TTL / 추가로 허용하는 stale 구간 (초)
+# 환경 변수 {NAME}_CACHE_TTL 로 TTL을 바꿀 수 있다 (예: NEWS_HEADLINES_CACHE_TTL=1800)
+CACHE_POLICIES = {
+    "fear_greed_index": {"ttl": 4 * 3600, "max_stale": 24 * 3600},
+    "news_headlines": {"ttl": 3 * 3600, "max_stale": 12 * 3600},
+}
+DEFAULT_POLICY = {"ttl": 3600, "max_stale": 3600}
+
+
+class SignalCache:
+    def __init__(self, path=CACHE_PATH, policies=None):
+        self.path = path
+        self.policies = policies or CACHE_POLICIES
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._entries = self._load()
+        self.stats = {"hit": 0, "stale": 0, "miss": 0, "expired": 0}
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable signal cache {self.path}: {e}")
+            return {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def policy(self, name):
+        # "news_headlines:ETH"처럼 마켓별 키는 같은 소스의 정책을 따른다
+        source = name.split(":")[0]
+        policy = dict(self.policies.get(source, DEFAULT_POLICY))
+        ttl = os.getenv(f"{source.upper()}_CACHE_TTL")
+        if ttl is not None:
+            policy["ttl"] = float(ttl)
+        return policy
+
+    def _store(self, name, value):
+        # 실패(None/빈 결과)는 캐시하지 않는다
+        if not value:
+            return False
+        with self._lock:
+            self._entries[name] = {"value": value, "fetched_at": time.time()}
+            self._save()
+        return True
+
+    def _refresh(self, name, fetch):
+        try:
+            self._store(name, fetch())
+        except Exception as e:
+            logger.warning(f"Background refresh of '{name}' failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(name)
+
+    def _count(self, name, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+            stats = dict(self.stats)
+        logger.info(f"Signal cache {outcome} for '{name}' ({stats})")
+
+    def get(self, name, fetch):
+        """
+        name에 해당하는 캐시 값을 반환하고, 필요하면 fetch()로 갱신한다.
+        """
+        policy = self.policy(name)
+        with self._lock:
+            entry = self._entries.get(name)
+        age = time.time() - entry["fetched_at"] if entry else None
+
+        if entry and age < policy["ttl"]:
+            self._count(name, "hit")
+            return entry["value"]
+
+        if entry and age < policy["ttl"] + policy["max_stale"]:
+            self._count(name, "stale")
+            with self._lock:
+                start = name not in self._refreshing
+                self._refreshing.add(name)
+            if start:
+                submit(self._refresh, name, fetch)
+            return entry["value"]
+
+        self._count(name, "miss")
+        try:
+            value = fetch()
+        except Exception as e:
+            if not entry:
+                raise
+            # 장애 중에는 오래된 값이라도 없는 것보다 낫다
+            logger.warning(f"Fetching '{name}' failed ({e}), serving expired value from {age:.0f}s ago")
+            self._count(name, "expired")
+            return entry["value"]
+        if not self._store(name, value) and entry:
+            logger.warning(f"Fetching '{name}' returned no data, serving expired value from {age:.0f}s ago")
+            self._count(name, "expired")
+            return entry["value"]
+        return value
+
+
+signal_cache = SignalCache()
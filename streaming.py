@@ -0,0 +1,351 @@
+"""
+실시간 스트리밍 모드
+
+정각 사이클 사이에도 시장을 지켜보다가 급격한 움직임이 있으면 결정 파이프라인을
+바로 실행한다. Upbit WebSocket 체결 스트림(또는 캔들 저장소를 재생하는 테스트용
+소스)으로 진행 중인 시간봉과 지표를 메모리에서 갱신하고, 트리거 조건이
+충족되면 on_trigger(ticker, reasons)를 워커 스레드에서 호출한다.
+
+트리거 (환경 변수로 조정)
+- RSI: STREAM_RSI_LOW 이하 / STREAM_RSI_HIGH 이상 (기본 30 / 70)
+- 볼린저 밴드: 가격이 상단/하단 밴드를 벗어남
+- 거래량: 진행 중인 캔들의 거래량이 최근 캔들 평균의 STREAM_VOLUME_SPIKE배 이상 (기본 3)
+
+각 트리거는 조건에 새로 진입할 때만 발동하고, 마켓별로 STREAM_COOLDOWN초
+(기본 900초) 안에는 다시 결정하지 않는다.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+
+from candle_store import DB_PATH, interval_seconds, load_candles, _now_kst, _to_ts
+from indicators import IndicatorEngine
+
+logger = logging.getLogger(__name__)
+
+UPBIT_WEBSOCKET_URL = "wss://api.upbit.com/websocket/v1"
+CANDLE_INTERVAL = "minute60"
+KST_OFFSET = 9 * 3600
+
+# 거래량 평균을 낼 최근 마감 캔들 수
+VOLUME_LOOKBACK = 24
+
+RECONNECT_DELAYS = [1, 2, 5, 10, 30]
+
+
+@dataclass
+class TriggerConfig:
+    rsi_low: float = 30.0
+    rsi_high: float = 70.0
+    volume_spike: float = 3.0
+    cooldown: float = 900.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            rsi_low=float(os.getenv("STREAM_RSI_LOW", cls.rsi_low)),
+            rsi_high=float(os.getenv("STREAM_RSI_HIGH", cls.rsi_high)),
+            volume_spike=float(os.getenv("STREAM_VOLUME_SPIKE", cls.volume_spike)),
+            cooldown=float(os.getenv("STREAM_COOLDOWN", cls.cooldown)),
+        )
+
+
+def _bucket(trade_timestamp_ms, interval):
+    """체결 시각(UTC ms)을 캔들 저장소 ts 형식(KST 기준 epoch 초)의 캔들 시작 시각으로 변환"""
+    seconds = interval_seconds(interval)
+    return (trade_timestamp_ms // 1000 + KST_OFFSET) // seconds * seconds
+
+
+class LiveMarket:
+    """한 마켓의 진행 중인 캔들, 지표 엔진, 트리거 상태"""
+
+    def __init__(self, ticker, interval=CANDLE_INTERVAL):
+        self.ticker = ticker
+        self.interval = interval
+        self.engine = IndicatorEngine(history=1)
+        self.volumes = deque(maxlen=VOLUME_LOOKBACK)
+        self.candle = None  # 진행 중인 캔들 {ts, open, high, low, close, volume}
+        self.active = set()  # 현재 충족 중인 트리거
+        self.last_fired = 0.0
+
+    def seed(self, df):
+        """
+        저장된 캔들로 엔진을 시드한다. 마지막 행은 진행 중인 캔들로 이어받는다.
+        """
+        if df.empty:
+            return
+        timestamps = _to_ts(df.index)
+        rows = list(zip(timestamps, df.itertuples(index=False)))
+        for ts, row in rows[:-1]:
+            self.engine.push(float(row.close), ts)
+            self.volumes.append(float(row.volume))
+        ts, row = rows[-1]
+        self.candle = {
+            "ts": ts,
+            "open": float(row.open),
+            "high": float(row.high),
+            "low": float(row.low),
+            "close": float(row.close),
+            "volume": float(row.volume),
+        }
+
+    def on_trade(self, price, volume, trade_timestamp_ms):
+        """체결 하나를 반영하고, 진행 중인 캔들 기준 지표를 반환한다."""
+        ts = _bucket(trade_timestamp_ms, self.interval)
+        candle = self.candle
+        if candle is not None and ts < candle["ts"]:
+            # 재연결 등으로 늦게 도착한 이전 캔들 체결은 무시
+            return None
+        if candle is None or ts > candle["ts"]:
+            if candle is not None:
+                self.engine.push(candle["close"], candle["ts"])
+                self.volumes.append(candle["volume"])
+            candle = self.candle = {
+                "ts": ts,
+                "open": price,
+                "high": price,
+                "low": price,
+                "close": price,
+                "volume": 0.0,
+            }
+        candle["high"] = max(candle["high"], price)
+        candle["low"] = min(candle["low"], price)
+        candle["close"] = price
+        candle["volume"] += volume
+        return self.engine.preview(price)
+
+    def conditions(self, row, config):
+        """현재 충족 중인 트리거 조건 {name: 설명}"""
+        price = self.candle["close"]
+        conditions = {}
+        rsi = row["rsi"]
+        if rsi == rsi:  # NaN 제외
+            if rsi <= config.rsi_low:
+                conditions["rsi_low"] = f"RSI {rsi:.1f} <= {config.rsi_low:g}"
+            elif rsi >= config.rsi_high:
+                conditions["rsi_high"] = f"RSI {rsi:.1f} >= {config.rsi_high:g}"
+        if row["bb_bbh"] == row["bb_bbh"]:
+            if price > row["bb_bbh"]:
+                conditions["bb_upper"] = f"price {price:.0f} above upper band {row['bb_bbh']:.0f}"
+            elif price < row["bb_bbl"]:
+                conditions["bb_lower"] = f"price {price:.0f} below lower band {row['bb_bbl']:.0f}"
+        if self.volumes:
+            average = sum(self.volumes) / len(self.volumes)
+            if average > 0 and self.candle["volume"] >= config.volume_spike * average:
+                conditions["volume_spike"] = (
+                    f"volume {self.candle['volume']:.3f} >= {config.volume_spike:g}x "
+                    f"average {average:.3f}"
+                )
+        return conditions
+
+    def check(self, row, config, now):
+        """
+        새로 충족된 트리거가 있고 쿨다운이 지났으면 발동 사유 목록을 반환한다.
+        last_fired는 실제로 사이클을 실행할 때 호출한 쪽에서 기록한다.
+        """
+        conditions = self.conditions(row, config)
+        entered = [conditions[name] for name in conditions if name not in self.active]
+        self.active = set(conditions)
+        if not entered or now - self.last_fired < config.cooldown:
+            return []
+        return entered
+
+
+class UpbitWebSocketSource:
+    """Upbit 체결 스트림. 연결이 끊기면 점진적으로 대기하며 재연결한다."""
+
+    def __init__(self, tickers, types=("trade",), url=UPBIT_WEBSOCKET_URL):
+        self.tickers = tickers
+        self.types = types
+        self.url = url
+
+    def _subscription(self):
+        request = [{"ticket": str(uuid.uuid4())}]
+        request += [{"type": t, "codes": self.tickers} for t in self.types]
+        return json.dumps(request)
+
+    async def __aiter__(self):
+        import websockets
+
+        attempt = 0
+        while True:
+            try:
+                async with websockets.connect(self.url, ping_interval=60) as ws:
+                    await ws.send(self._subscription())
+                    logger.info(f"Subscribed to Upbit {', '.join(self.types)} for {', '.join(self.tickers)}")
+                    attempt = 0
+                    async for message in ws:
+                        yield json.loads(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                delay = RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)]
+                attempt += 1
+                logger.warning(f"Upbit WebSocket disconnected ({e}), reconnecting in {delay}s")
+                await asyncio.sleep(delay)
+
+
+class ReplaySource:
+    """
+    캔들 저장소의 분봉을 체결 이벤트로 재생하는 테스트용 소스
+
+    캔들마다 종가/거래량을 가진 체결 하나를 캔들 마감 직전 시각으로 만든다.
+    speed가 0이면 기다리지 않고, 아니면 실제 시간의 speed배 속도로 재생한다.
+    """
+
+    def __init__(self, tickers, interval="minute1", start=None, end=None, speed=0, db_path=DB_PATH):
+        self.tickers = tickers
+        self.interval = interval
+        self.start = start
+        self.end = end
+        self.speed = speed
+        self.db_path = db_path
+
+    def _events(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            events = []
+            seconds = interval_seconds(self.interval)
+            for ticker in self.tickers:
+                df = load_candles(conn, ticker, self.interval, start=self.start, end=self.end)
+                for ts, row in zip(_to_ts(df.index), df.itertuples(index=False)):
+                    trade_ms = (ts + seconds - 1 - KST_OFFSET) * 1000
+                    events.append(
+                        {
+                            "type": "trade",
+                            "code": ticker,
+                            "trade_price": float(row.close),
+                            "trade_volume": float(row.volume),
+                            "trade_timestamp": trade_ms,
+                        }
+                    )
+        finally:
+            conn.close()
+        return sorted(events, key=lambda event: event["trade_timestamp"])
+
+    async def __aiter__(self):
+        previous = None
+        for event in self._events():
+            if self.speed and previous is not None:
+                await asyncio.sleep((event["trade_timestamp"] - previous) / 1000 / self.speed)
+            previous = event["trade_timestamp"]
+            yield event
+            await asyncio.sleep(0)
+
+
+class StreamMonitor:
+    """
+    체결 스트림으로 마켓별 실시간 캔들/지표를 유지하고 트리거 시 결정 파이프라인을 실행한다.
+    """
+
+    def __init__(self, tickers, source, on_trigger, config=None, history=200, db_path=DB_PATH, clock=time.time):
+        self.tickers = tickers
+        self.source = source
+        self.on_trigger = on_trigger
+        self.config = config or TriggerConfig.from_env()
+        self.history = history
+        self.db_path = db_path
+        self.clock = clock
+        self.markets = {ticker: LiveMarket(ticker) for ticker in tickers}
+        # 결정 중인 마켓 (완료 콜백은 실행 스레드에서 호출된다)
+        self.running = set()
+        self._running_lock = threading.Lock()
+        self.fired = []
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(tickers)), thread_name_prefix="stream-trigger")
+
+    def seed(self):
+        # 재생 소스는 재생 시작 이전 캔들로만 시드한다 (재생 구간 거래량 중복 방지)
+        end = getattr(self.source, "start", None)
+        if end is not None:
+            end = end - timedelta(seconds=1)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for ticker, market in self.markets.items():
+                market.seed(
+                    load_candles(conn, ticker, CANDLE_INTERVAL, count=self.history, end=end)
+                )
+        finally:
+            conn.close()
+
+    def _fire(self, market, reasons, now):
+        """이미 결정 중인 마켓이면 실행하지 않고 False를 반환한다 (쿨다운도 시작하지 않음)"""
+        ticker = market.ticker
+        with self._running_lock:
+            if ticker in self.running:
+                return False
+            self.running.add(ticker)
+        market.last_fired = now
+        logger.info(f"[{ticker}] Stream trigger: {'; '.join(reasons)}")
+        self.fired.append((ticker, reasons))
+        future = self._executor.submit(self.on_trigger, ticker, reasons)
+
+        def done(f):
+            with self._running_lock:
+                self.running.discard(ticker)
+            if f.exception() is not None:
+                logger.error(f"[{ticker}] Triggered trading failed: {f.exception()}")
+
+        future.add_done_callback(done)
+        return True
+
+    def handle(self, event):
+        if event.get("type") != "trade":
+            return
+        market = self.markets.get(event.get("code"))
+        if market is None:
+            return
+        row = market.on_trade(
+            float(event["trade_price"]),
+            float(event["trade_volume"]),
+            int(event["trade_timestamp"]),
+        )
+        if row is None:
+            return
+        # 이미 결정 중인 마켓은 조건 상태만 갱신한다
+        now = self.clock()
+        reasons = market.check(row, self.config, now)
+        if reasons:
+            self._fire(market, reasons, now)
+
+    async def run(self):
+        await asyncio.to_thread(self.seed)
+        async for event in self.source:
+            self.handle(event)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def build_source(tickers, mode=None):
+    """
+    STREAMING_MODE에 따른 이벤트 소스
+    - upbit: Upbit WebSocket
+    - replay: 캔들 저장소의 최근 STREAM_REPLAY_HOURS(기본 24)시간
+      STREAM_REPLAY_INTERVAL(기본 minute1) 캔들 재생 (봇은 모의 서버를 쓸 때만
+      트리거로 사이클을 실행하고, 그 외에는 트리거를 기록만 한다)
+    그 외(off, 미설정)는 None
+    """
+    mode = (mode or os.getenv("STREAMING_MODE", "off")).lower()
+    if mode == "upbit":
+        return UpbitWebSocketSource(tickers)
+    if mode == "replay":
+        hours = float(os.getenv("STREAM_REPLAY_HOURS", "24"))
+        return ReplaySource(
+            tickers,
+            start=_now_kst() - timedelta(hours=hours),
+            interval=os.getenv("STREAM_REPLAY_INTERVAL", "minute1"),
+            speed=float(os.getenv("STREAM_REPLAY_SPEED", "0")),
+        )
+    if mode not in ("off", "false", "0", ""):
+        logger.warning(f"Unknown STREAMING_MODE '{mode}', streaming disabled")
+    return None
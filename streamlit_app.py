@@ -1,35 +1,48 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime
 import os
+import sqlite3
+import time
+
+from dashboard_data import TradeCache, count_history, filter_trades, query_history
+from rollups import ACCOUNT, downsample, load_metrics, load_rollups
+from tracing import load_traces
+from trade_store import connect
+
+PAGE_SIZE = 50
+# 지연 시간 패널에 표시하는 최근 사이클 수
+TRACE_LIMIT = 200
+# 차트 하나에 그리는 최대 점 수
+MAX_CHART_POINTS = 2000
+# 선택 구간이 이보다 길면 일별 집계를 그린다
+ROLLUP_AFTER_DAYS = 90
 
 # 페이지 기본 설정
 st.set_page_config(
     page_title="Trading History Dashboard", page_icon="📈", layout="wide"
 )
 
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trading_history.db")
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive")
+
 
-# 데이터베이스 연결 함수
+# 데이터베이스 연결 함수 (읽기 전용, WAL 모드라 봇의 쓰기를 막지 않는다)
+@st.cache_resource
 def get_connection():
-    db_path = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)), "trading_history.db"
-    )
-    return sqlite3.connect(db_path)
+    return connect(DB_PATH, readonly=True)
+
+
+# 차트용 데이터는 세션 간에 공유하고 새 거래만 추가로 읽는다
+@st.cache_resource
+def get_trade_cache():
+    return TradeCache(DB_PATH, archive_dir=ARCHIVE_DIR)
 
 
 # 데이터 로드 함수
 def load_data():
-    conn = get_connection()
-    query = "SELECT * FROM trades ORDER BY timestamp DESC"
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-
-    # timestamp를 datetime으로 변환
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    return df
+    return get_trade_cache().refresh()
 
 
 # 대시보드 제목
@@ -37,69 +50,149 @@ st.title("📊 Trading History Dashboard")
 
 # 데이터 로드
 df = load_data()
+if df.empty:
+    st.info("No trades recorded yet.")
+    st.stop()
+
+# 필터링 섹션 (사이드바의 필터가 아래 모든 지표/차트/표에 적용된다)
+with st.sidebar:
+    st.subheader("🔍 Filters")
+    tickers = sorted(df["ticker"].unique())
+    ticker_filter = st.multiselect("Filter by Market", options=tickers, default=tickers)
+    decisions = sorted(df["decision"].unique())
+    decision_filter = st.multiselect(
+        "Filter by Decision", options=decisions, default=decisions
+    )
+    date_range = st.date_input(
+        "Select Date Range",
+        value=(df["datetime"].min().date(), df["datetime"].max().date()),
+    )
+    if st.button("Refresh"):
+        st.rerun()
+
+# 날짜를 하나만 고른 중간 상태에서는 기간 필터를 적용하지 않는다
+filters = {
+    "tickers": ticker_filter,
+    "decisions": decision_filter,
+    "date_range": date_range if len(date_range) == 2 else None,
+}
+filtered = filter_trades(df, **filters)
+latest = filtered.iloc[-1] if not filtered.empty else None
 
 # 기본 통계 지표
 col1, col2, col3, col4 = st.columns(4)
 with col1:
-    st.metric("Total Trades", len(df))
+    st.metric("Total Trades", len(filtered))
 with col2:
-    profit_trades = len(df[df["decision"] == "SELL"])
+    profit_trades = int((filtered["decision"] == "sell").sum())
     st.metric("Total Sells", profit_trades)
 with col3:
-    latest_btc = df.iloc[0]["btc_balance"] if not df.empty else 0
-    st.metric("Current BTC Balance", f"{latest_btc:.8f}")
+    latest_btc = latest["btc_balance"] if latest is not None else 0
+    st.metric("Current Coin Balance", f"{latest_btc:.8f}")
 with col4:
-    latest_krw = df.iloc[0]["krw_balance"] if not df.empty else 0
+    latest_krw = latest["krw_balance"] if latest is not None else 0
     st.metric("Current KRW Balance", f"{latest_krw:,.0f}")
 
+# 손익/낙폭/승률은 거래 기록 시 갱신되는 집계 테이블에서 읽는다
+conn = get_connection()
+metrics = load_metrics(conn)
+account = metrics[metrics["ticker"] == ACCOUNT]
+positions = metrics[metrics["ticker"].isin(ticker_filter)]
+if not account.empty:
+    account = account.iloc[0]
+    col1, col2, col3, col4 = st.columns(4)
+    # 계좌 전체 가치는 KRW 잔고를 공유하므로 마켓 필터와 관계없이 하나로 표시한다
+    with col1:
+        pnl_pct = f"{account['pnl_pct']:.2f}%" if pd.notna(account["pnl_pct"]) else None
+        st.metric("Account PnL (KRW)", f"{account['pnl']:,.0f}", pnl_pct)
+    with col2:
+        st.metric("Account Max Drawdown", f"{account['max_drawdown'] * 100:.2f}%")
+    # 마켓별 포지션 손익(실현 + 미실현)은 더할 수 있다
+    with col3:
+        st.metric("Position PnL (KRW)", f"{positions['pnl'].sum():,.0f}")
+    with col4:
+        sells = positions["sells"].sum()
+        win_rate = positions["winning_sells"].sum() / sells * 100 if sells else 0
+        st.metric("Sell Win Rate", f"{win_rate:.1f}%")
+
+
+def chart_points(df, y, method="lttb"):
+    """마켓별로 차트 해상도에 맞게 줄인다"""
+    groups = [group for _, group in df.groupby("ticker")]
+    if not groups:
+        return df
+    max_points = max(MAX_CHART_POINTS // len(groups), 100)
+    return pd.concat([downsample(g, "datetime", y, max_points, method) for g in groups])
+
+
+span = filtered["datetime"].max() - filtered["datetime"].min() if not filtered.empty else None
+use_rollups = span is not None and span > pd.Timedelta(days=ROLLUP_AFTER_DAYS)
+if use_rollups:
+    start_ts, end_ts = int(filtered["ts"].min()), int(filtered["ts"].max())
+    rollup_df = load_rollups(conn, "1d", start_ts=start_ts - 86400, end_ts=end_ts)
+    rollup_df["datetime"] = pd.to_datetime(rollup_df["bucket_ts"], unit="s") + pd.Timedelta(
+        seconds=time.localtime().tm_gmtoff
+    )
+    account_rollup_df = rollup_df[rollup_df["ticker"] == ACCOUNT]
+    rollup_df = rollup_df[rollup_df["ticker"].isin(ticker_filter)]
+
 # 차트 섹션
 st.subheader("📈 Price and Balance History")
 tab1, tab2 = st.tabs(["Price History", "Balance History"])
 
 with tab1:
-    # BTC 가격 변화 차트
+    # 코인 가격 변화 차트
+    if use_rollups:
+        st.caption("Showing daily closes (decision filter not applied)")
+        price_df = rollup_df.rename(columns={"price_close": "btc_krw_price"})
+    else:
+        price_df = chart_points(filtered, "btc_krw_price")
     fig_price = px.line(
-        df, x="timestamp", y="btc_krw_price", title="BTC-KRW Price History"
+        price_df, x="datetime", y="btc_krw_price", color="ticker", title="Price History (KRW)"
     )
     st.plotly_chart(fig_price, use_container_width=True)
 
 with tab2:
-    # BTC의 KRW 가치 계산
-    df['btc_value_in_krw'] = df['btc_balance'] * df['btc_krw_price']
-    # 총 KRW 가치 계산
-    df['total_value_in_krw'] = df['btc_value_in_krw'] + df['krw_balance']
-    
+    # 잔고는 급격한 변화가 보이도록 구간별 최소/최대로 줄인다
+    balance_df = chart_points(filtered, "krw_balance", method="minmax")
+    # 총 가치는 계좌 전체 기준이므로 마켓/결정 필터 없이 기간만 적용한다
+    if use_rollups:
+        value_df = account_rollup_df.rename(columns={"close": "total_value_in_krw"})
+    else:
+        account_df = filter_trades(df, date_range=filters["date_range"])
+        value_df = downsample(account_df, "datetime", "total_value_in_krw", MAX_CHART_POINTS)
+
     # 잔고 변화 차트
     fig_balance = go.Figure()
-    
-    # BTC 잔고
+
+    # 코인 잔고
     fig_balance.add_trace(
-        go.Scatter(x=df["timestamp"], y=df["btc_balance"], name="BTC Balance", yaxis="y")
+        go.Scatter(x=balance_df["datetime"], y=balance_df["btc_balance"], name="Coin Balance", yaxis="y")
     )
-    
+
     # KRW 잔고
     fig_balance.add_trace(
         go.Scatter(
-            x=df["timestamp"], y=df["krw_balance"], name="KRW Balance", yaxis="y2"
+            x=balance_df["datetime"], y=balance_df["krw_balance"], name="KRW Balance", yaxis="y2"
         )
     )
-    
+
     # 총 KRW 가치
     fig_balance.add_trace(
         go.Scatter(
-            x=df["timestamp"], 
-            y=df["total_value_in_krw"], 
-            name="Total Value (KRW)", 
+            x=value_df["datetime"],
+            y=value_df["total_value_in_krw"],
+            name="Total Value (KRW)",
             yaxis="y3",
             line=dict(color='green')
         )
     )
-    
+
     # 레이아웃 업데이트
     fig_balance.update_layout(
         title="Balance History",
         yaxis=dict(
-            title="BTC Balance",
+            title="Coin Balance",
             titlefont=dict(color="#1f77b4"),
             tickfont=dict(color="#1f77b4")
         ),
@@ -129,39 +222,75 @@ with tab2:
     )
     st.plotly_chart(fig_balance, use_container_width=True)
 
-# 거래 기록 테이블
+# 거래 사이클 단계별 지연 시간
+st.subheader("⏱️ Cycle Latency")
+try:
+    traces = load_traces(conn, limit=TRACE_LIMIT)
+except sqlite3.OperationalError:
+    # 추적 기록 도입 이전의 DB
+    traces = []
+traces = [t for t in traces if t["ticker"] in ticker_filter]
+if not traces:
+    st.info("No cycle traces recorded yet.")
+else:
+    stage_df = pd.DataFrame(
+        [
+            {
+                "id": t["id"],
+                "started_at": pd.to_datetime(t["started_at"]),
+                "ticker": t["ticker"],
+                "stage": stage,
+                "ms": ms,
+            }
+            for t in traces
+            for stage, ms in t["stages"].items()
+        ]
+    )
+    total_ms = pd.Series([t["total_ms"] for t in traces if t["total_ms"] is not None])
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Cycle p50", f"{total_ms.quantile(0.5) / 1000:.1f}s")
+    with col2:
+        st.metric("Cycle p99", f"{total_ms.quantile(0.99) / 1000:.1f}s")
+    with col3:
+        skipped = sum(t["status"] == "skipped" for t in traces)
+        st.metric("Pre-filter Skips", f"{skipped} / {len(traces)}")
+    with col4:
+        tokens = sum(t["total_tokens"] or 0 for t in traces)
+        st.metric("LLM Tokens", f"{tokens:,}", f"{tokens / len(traces):,.0f} per cycle", delta_color="off")
+
+    # 데이터 소스는 병렬로 실행되므로 막대 길이의 합은 사이클 시간보다 길 수 있다
+    fig_latency = px.bar(
+        stage_df.sort_values("started_at"),
+        x="started_at",
+        y="ms",
+        color="stage",
+        hover_data=["ticker"],
+        title=f"Stage Latency (last {len(traces)} cycles, ms)",
+    )
+    st.plotly_chart(fig_latency, use_container_width=True)
+
+    stage_summary = stage_df.groupby("stage")["ms"].describe(percentiles=[0.5, 0.99])
+    stage_summary = stage_summary[["count", "mean", "50%", "99%", "max"]].sort_values("99%", ascending=False)
+    st.dataframe(stage_summary.style.format("{:,.0f}"), use_container_width=True)
+
+# 거래 기록 테이블 (필터와 페이지를 SQL로 처리, 오래된 페이지는 아카이브에서 읽음)
 st.subheader("📝 Trading History")
-# 표시할 컬럼 선택
-display_columns = [
-    "timestamp",
-    "decision",
-    "percentage",
-    "reason",
-    "btc_balance",
-    "krw_balance",
-    "btc_krw_price",
-]
+total_rows = count_history(conn, archive_dir=ARCHIVE_DIR, **filters)
+total_pages = max(1, -(-total_rows // PAGE_SIZE))
+page = st.number_input("Page", min_value=1, max_value=total_pages, value=1, step=1)
+st.caption(f"{total_rows:,} trades, page {page} of {total_pages}")
+
+formatted_df = query_history(conn, page=page, page_size=PAGE_SIZE, archive_dir=ARCHIVE_DIR, **filters)
 # 데이터 포맷팅
-formatted_df = df[display_columns].copy()
-formatted_df["timestamp"] = formatted_df["timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S")
+formatted_df = formatted_df.drop(columns=["id"])
+formatted_df["timestamp"] = pd.to_datetime(
+    formatted_df["timestamp"], format="ISO8601"
+).dt.strftime("%Y-%m-%d %H:%M:%S")
 formatted_df["btc_balance"] = formatted_df["btc_balance"].map("{:.8f}".format)
 formatted_df["krw_balance"] = formatted_df["krw_balance"].map("{:,.0f}".format)
 formatted_df["btc_krw_price"] = formatted_df["btc_krw_price"].map("{:,.0f}".format)
 
 # 테이블 표시
 st.dataframe(formatted_df, use_container_width=True)
-
-# 필터링 섹션
-st.subheader("🔍 Filters")
-col1, col2 = st.columns(2)
-with col1:
-    decision_filter = st.multiselect(
-        "Filter by Decision",
-        options=df["decision"].unique(),
-        default=df["decision"].unique(),
-    )
-with col2:
-    date_range = st.date_input(
-        "Select Date Range",
-        value=(df["timestamp"].min().date(), df["timestamp"].max().date()),
-    )
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import BUY, FEE_FACTOR, FEE_RATE, HOLD, SELL, run_backtest, simulate, summarize
+
+CLOSE = np.array([100.0, 90.0, 110.0, 120.0, 80.0])
+
+
+def candles(close):
+    index = pd.date_range("2024-01-01", periods=len(close), freq="h")
+    return pd.DataFrame(
+        {"open": close, "high": close * 1.01, "low": close * 0.99, "close": close, "volume": 1.0},
+        index=index,
+    )
+
+
+def test_simulate_buy_then_sell():
+    decisions = [BUY, HOLD, SELL, HOLD, HOLD]
+    result = simulate(CLOSE, decisions, [50, 0, 100, 0, 0], krw_balance=1_000_000)
+
+    buy_amount = 1_000_000 * 0.5 * FEE_FACTOR
+    krw_after_buy = 1_000_000 - buy_amount * (1 + FEE_RATE)
+    volume = buy_amount / 100.0
+    assert result["executed"].tolist() == [True, False, True, False, False]
+    assert result["krw_balance"][:2] == pytest.approx([krw_after_buy, krw_after_buy])
+    assert result["coin_balance"][:2] == pytest.approx([volume, volume])
+    assert result["avg_buy_price"][0] == pytest.approx(100.0)
+
+    krw_after_sell = krw_after_buy + volume * 110.0 * (1 - FEE_RATE)
+    assert result["krw_balance"][2:] == pytest.approx([krw_after_sell] * 3)
+    assert result["coin_balance"][2:] == pytest.approx([0.0] * 3)
+    assert result["avg_buy_price"][2:] == pytest.approx([0.0] * 3)
+
+
+def test_simulate_skips_orders_below_minimum():
+    result = simulate(CLOSE, [BUY, SELL, HOLD, HOLD, HOLD], [100, 100, 0, 0, 0], krw_balance=4000)
+    assert not result["executed"].any()
+    assert result["krw_balance"] == pytest.approx([4000.0] * 5)
+
+
+def test_summarize_uses_starting_balances():
+    # 첫 캔들에서 매수해도 초기 가치는 수수료를 내기 전의 시작 잔고다
+    result = simulate(CLOSE, [BUY, HOLD, HOLD, HOLD, HOLD], [100, 0, 0, 0, 0], krw_balance=1_000_000)
+    summary = summarize(CLOSE, result)
+    final = result["krw_balance"][-1] + result["coin_balance"][-1] * CLOSE[-1]
+    assert summary["initial_value"] == pytest.approx(1_000_000)
+    assert summary["final_value"] == pytest.approx(final)
+    assert summary["return_pct"] == pytest.approx((final / 1_000_000 - 1) * 100)
+    assert summary["buy_and_hold_pct"] == pytest.approx(-20.0)
+    assert summary["orders"] == 1
+    # 최고점은 120원 시점, 최저점은 80원 시점
+    peak = result["krw_balance"][3] + result["coin_balance"][3] * 120.0
+    assert summary["max_drawdown_pct"] == pytest.approx((final - peak) / peak * 100)
+
+
+def test_summarize_values_initial_coin_at_first_close():
+    result = simulate(CLOSE, [HOLD] * 5, [0] * 5, krw_balance=1000, coin_balance=2.0, avg_buy_price=50.0)
+    summary = summarize(CLOSE, result)
+    assert summary["initial_value"] == pytest.approx(1200.0)
+    assert summary["return_pct"] == pytest.approx(summary["buy_and_hold_pct"] * 200 / 1200)
+
+
+def test_run_backtest_on_synthetic_candles():
+    def strategy(df):
+        n = len(df)
+        decisions = np.full(n, HOLD)
+        decisions[0], decisions[2] = BUY, SELL
+        percentages = np.where(decisions == HOLD, 0, 100)
+        return decisions, percentages, np.full(n, "test", dtype=object)
+
+    trades, summary = run_backtest(candles(CLOSE), strategy, krw_balance=1_000_000)
+    assert trades["decision"].tolist() == ["buy", "hold", "sell", "hold", "hold"]
+    assert trades["percentage"].tolist() == [100, 0, 100, 0, 0]
+    assert trades["btc_krw_price"].tolist() == CLOSE.tolist()
+    assert summary["initial_value"] == pytest.approx(1_000_000)
+    assert summary["final_value"] == pytest.approx(trades["krw_balance"].iloc[-1])
@@ -0,0 +1,180 @@
+import itertools
+import threading
+
+import pytest
+
+from execution import ExecutionConfig, Fill, OrderExecutor, estimate_impact, plan_slices
+
+ORDERBOOK = {
+    "orderbook_units": [
+        {"ask_price": 100.0, "ask_size": 100.0, "bid_price": 99.0, "bid_size": 100.0},
+        {"ask_price": 101.0, "ask_size": 100.0, "bid_price": 98.0, "bid_size": 100.0},
+        {"ask_price": 102.0, "ask_size": 100.0, "bid_price": 97.0, "bid_size": 100.0},
+    ]
+}
+
+CONFIG = ExecutionConfig(
+    poll_initial=0.001, poll_max=0.001, fill_timeout=0.05, max_impact=0.002, max_slices=5, slice_interval=0
+)
+
+
+class FakeUpbit:
+    """주문마다 final(uuid, side, amount)이 돌려주는 상태로 조회되는 Upbit 클라이언트"""
+
+    def __init__(self, final):
+        self.final = final
+        self.placed = []
+        self._ids = itertools.count(1)
+
+    def _place(self, side, amount):
+        order = {"uuid": f"order-{next(self._ids)}", "side": side, "state": "wait"}
+        self.placed.append((order["uuid"], side, amount))
+        return order
+
+    def buy_market_order(self, ticker, amount):
+        return self._place("bid", amount)
+
+    def sell_market_order(self, ticker, amount):
+        return self._place("ask", amount)
+
+    def get_individual_order(self, uuid):
+        _, side, amount = next(p for p in self.placed if p[0] == uuid)
+        return self.final(uuid, side, amount)
+
+
+def filled(uuid, side, amount, price=100.0, state="done"):
+    volume = amount / price if side == "bid" else amount
+    return {
+        "uuid": uuid,
+        "side": side,
+        "state": state,
+        "paid_fee": "0.05",
+        "trades": [{"volume": str(volume), "funds": str(volume * price)}],
+    }
+
+
+def make_executor(upbit):
+    return OrderExecutor(lambda: upbit, config=CONFIG, sleep=lambda _: None)
+
+
+def test_fill_from_order_sums_trades():
+    order = {
+        "uuid": "a",
+        "side": "bid",
+        "state": "done",
+        "paid_fee": "1.5",
+        "trades": [{"volume": "1.0", "funds": "100.0"}, {"volume": "2.0", "funds": "220.0"}],
+    }
+    fill = Fill.from_order(order, slice=2)
+    assert fill.volume == pytest.approx(3.0)
+    assert fill.funds == pytest.approx(320.0)
+    assert fill.fee == pytest.approx(1.5)
+    assert fill.price == pytest.approx(320.0 / 3.0)
+    assert fill.slice == 2
+
+
+def test_fill_from_order_without_trades_uses_executed_funds():
+    order = {"uuid": "a", "side": "ask", "state": "done", "executed_volume": "2.0", "executed_funds": "210.0"}
+    assert Fill.from_order(order).price == pytest.approx(105.0)
+
+
+def test_fill_from_order_without_trades_uses_limit_price():
+    order = {"uuid": "a", "side": "ask", "state": "done", "ord_type": "limit", "price": "105", "executed_volume": "2.0"}
+    assert Fill.from_order(order).funds == pytest.approx(210.0)
+
+
+def test_fill_from_order_without_funds_has_no_price():
+    order = {"uuid": "a", "side": "ask", "state": "done", "ord_type": "market", "executed_volume": "2.0"}
+    fill = Fill.from_order(order)
+    assert fill.volume == pytest.approx(2.0)
+    assert fill.funds is None
+    assert fill.price is None
+
+
+def test_fill_from_unfilled_order():
+    fill = Fill.from_order({"uuid": "a", "side": "bid", "state": "wait"})
+    assert fill.volume == 0
+    assert fill.price is None
+
+
+def test_estimate_impact():
+    assert estimate_impact("bid", 5000, ORDERBOOK) == 0.0
+    # 첫 호가 10,000원 + 둘째 호가 10,100원을 모두 소진
+    impact = estimate_impact("bid", 20100, ORDERBOOK)
+    assert impact == pytest.approx(20100 / 200 / 100 - 1)
+    assert estimate_impact("ask", 150, ORDERBOOK) == pytest.approx(1 - (99 * 100 + 98 * 50) / 150 / 99)
+    assert estimate_impact("bid", 10**9, ORDERBOOK) == float("inf")
+    assert estimate_impact("bid", 5000, {}) == 0.0
+
+
+def test_plan_slices():
+    assert plan_slices("bid", 5000, ORDERBOOK, 100, CONFIG) == 1
+    # 한 번에 사면 가격 영향이 max_impact를 넘으므로 첫 호가 안에 들어갈 때까지 나눈다
+    assert plan_slices("bid", 20000, ORDERBOOK, 100, CONFIG) == 2
+    # 조각은 최소 주문 금액 이상이어야 한다
+    assert plan_slices("bid", 9000, {"orderbook_units": ORDERBOOK["orderbook_units"][:1]}, 100, CONFIG) == 1
+    assert plan_slices("bid", 10**9, ORDERBOOK, 100, CONFIG) == CONFIG.max_slices
+
+
+def test_execute_single_fill():
+    upbit = FakeUpbit(filled)
+    result = make_executor(upbit).execute("KRW-TEST", "bid", 5000, ORDERBOOK)
+    assert result.executed
+    assert len(upbit.placed) == 1
+    assert result.volume == pytest.approx(50.0)
+    assert result.avg_price == pytest.approx(100.0)
+
+
+def test_execute_partial_fill():
+    # 시장가 매수가 일부만 체결되고 나머지는 취소된 경우
+    upbit = FakeUpbit(lambda uuid, side, amount: filled(uuid, side, amount / 2, state="cancel"))
+    result = make_executor(upbit).execute("KRW-TEST", "bid", 5000)
+    assert result.executed
+    assert result.fills[0].state == "cancel"
+    assert result.funds == pytest.approx(2500.0)
+
+
+def test_execute_timeout_without_fill():
+    upbit = FakeUpbit(lambda uuid, side, amount: {"uuid": uuid, "side": side, "state": "wait"})
+    result = make_executor(upbit).execute("KRW-TEST", "ask", 60.0, ORDERBOOK, price=99)
+    assert not result.executed
+    assert len(result.fills) == 1
+    assert result.fills[0].state == "wait"
+    assert result.avg_price is None
+
+
+def test_execute_unknown_funds_has_no_avg_price():
+    upbit = FakeUpbit(
+        lambda uuid, side, amount: {"uuid": uuid, "side": side, "state": "done", "executed_volume": str(amount)}
+    )
+    result = make_executor(upbit).execute("KRW-TEST", "ask", 60.0, ORDERBOOK, price=99)
+    assert result.executed
+    assert result.avg_price is None
+
+
+def test_execute_sliced_order_stops_when_cancelled():
+    cancel_event = threading.Event()
+
+    def final(uuid, side, amount):
+        cancel_event.set()
+        return filled(uuid, side, amount)
+
+    upbit = FakeUpbit(final)
+    result = make_executor(upbit).execute("KRW-TEST", "bid", 20000, ORDERBOOK, cancel_event=cancel_event)
+    assert len(upbit.placed) == 1
+    assert result.volume == pytest.approx(100.0)
+
+
+def test_execute_sliced_order_places_every_slice():
+    upbit = FakeUpbit(filled)
+    result = make_executor(upbit).execute("KRW-TEST", "bid", 20000, ORDERBOOK)
+    assert [amount for _, _, amount in upbit.placed] == [10000, 10000]
+    assert [fill.slice for fill in result.fills] == [0, 1]
+
+
+def test_execute_stops_on_rejected_order():
+    upbit = FakeUpbit(filled)
+    upbit.buy_market_order = lambda ticker, amount: {"error": {"name": "insufficient_funds_bid"}}
+    result = make_executor(upbit).execute("KRW-TEST", "bid", 5000)
+    assert not result.executed
+    assert result.fills == []
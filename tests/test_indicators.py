@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+import ta
+
+from indicators import INDICATOR_COLUMNS, IndicatorEngine, apply_indicators, compute_indicators
+
+RTOL = 1e-8
+ATOL = 1e-6
+
+
+def candles(count=300, seed=42):
+    rng = np.random.default_rng(seed)
+    close = 1.5e8 * np.exp(np.cumsum(rng.normal(0, 0.005, count)))
+    return pd.DataFrame(
+        {"open": close, "high": close * 1.002, "low": close * 0.998, "close": close, "volume": rng.random(count)},
+        index=pd.date_range("2024-01-01", periods=count, freq="h"),
+    )
+
+
+def ta_indicators(df):
+    close = df["close"]
+    bb = ta.volatility.BollingerBands(close=close, window=20, window_dev=2)
+    macd = ta.trend.MACD(close=close)
+    return pd.DataFrame(
+        {
+            "bb_bbm": bb.bollinger_mavg(),
+            "bb_bbh": bb.bollinger_hband(),
+            "bb_bbl": bb.bollinger_lband(),
+            "rsi": ta.momentum.RSIIndicator(close=close, window=14).rsi(),
+            "macd": macd.macd(),
+            "macd_signal": macd.macd_signal(),
+            "macd_diff": macd.macd_diff(),
+            "sma_20": ta.trend.SMAIndicator(close=close, window=20).sma_indicator(),
+            "ema_12": ta.trend.EMAIndicator(close=close, window=12).ema_indicator(),
+        }
+    )
+
+
+def assert_matches(actual, expected):
+    for column in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(
+            actual[column].to_numpy(dtype=float),
+            expected[column].to_numpy(dtype=float),
+            rtol=RTOL,
+            atol=ATOL,
+            equal_nan=True,
+            err_msg=column,
+        )
+
+
+def test_compute_indicators_matches_ta():
+    df = candles()
+    assert_matches(compute_indicators(df), ta_indicators(df))
+
+
+def test_apply_indicators_matches_ta_incrementally():
+    df = candles()
+    expected = ta_indicators(df)
+    # 처음엔 앞부분으로 시드하고, 이후 캔들이 하나씩 추가될 때마다 증분 갱신한다
+    for end in (200, 201, 202, 250, len(df)):
+        out = apply_indicators(df.iloc[:end], "TEST-INCREMENTAL", "minute60")
+        assert_matches(out, expected.iloc[:end])
+
+
+def test_apply_indicators_reseeds_on_gap():
+    df = candles()
+    apply_indicators(df.iloc[:100], "TEST-GAP", "minute60")
+    # 엔진이 본 마지막 캔들이 없는 이력이 오면 다시 시드한다
+    out = apply_indicators(df.iloc[150:], "TEST-GAP", "minute60")
+    assert_matches(out, ta_indicators(df.iloc[150:]))
+
+
+def test_preview_does_not_change_state():
+    df = candles(count=60)
+    engine = IndicatorEngine()
+    for close in df["close"].iloc[:-1]:
+        engine.push(float(close))
+    last = float(df["close"].iloc[-1])
+    preview = engine.preview(last * 1.05)
+    assert engine.preview(last * 1.05) == preview
+    row = engine.push(last)
+    expected = ta_indicators(df).iloc[-1]
+    for column in INDICATOR_COLUMNS:
+        assert row[column] == pytest.approx(expected[column], rel=RTOL, abs=ATOL)
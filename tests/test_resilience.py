@@ -0,0 +1,155 @@
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, Policy, Resilience
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Skip(Exception):
+    pass
+
+
+def make_resilience(clock, **policy):
+    policy = {"attempts": 1, "failure_threshold": 2, "reset_timeout": 10.0, "max_stale": 0, **policy}
+    return Resilience({"svc": Policy(**policy)}, sleep=lambda _: None, clock=clock)
+
+
+def fail():
+    raise ConnectionError("down")
+
+
+def open_breaker(res):
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            res.call("svc", fail)
+    assert res.breaker("svc").state == "open"
+
+
+def test_breaker_opens_after_threshold():
+    clock = FakeClock()
+    breaker = CircuitBreaker("svc", failure_threshold=2, reset_timeout=10.0, clock=clock)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_half_open_allows_single_trial():
+    clock = FakeClock()
+    breaker = CircuitBreaker("svc", failure_threshold=1, reset_timeout=10.0, clock=clock)
+    breaker.record_failure()
+    clock.now = 10.0
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+
+def test_half_open_trial_success_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker("svc", failure_threshold=1, reset_timeout=10.0, clock=clock)
+    breaker.record_failure()
+    clock.now = 10.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_half_open_trial_failure_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker("svc", failure_threshold=3, reset_timeout=10.0, clock=clock)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now = 10.0
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    clock.now = 20.0
+    assert breaker.allow()
+
+
+def test_release_returns_trial_slot():
+    clock = FakeClock()
+    breaker = CircuitBreaker("svc", failure_threshold=1, reset_timeout=10.0, clock=clock)
+    breaker.record_failure()
+    clock.now = 10.0
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_call_rejected_while_open():
+    clock = FakeClock()
+    res = make_resilience(clock)
+    open_breaker(res)
+    with pytest.raises(CircuitOpenError):
+        res.call("svc", lambda: "ok")
+
+
+def test_expired_deadline_does_not_take_trial_slot():
+    clock = FakeClock()
+    res = make_resilience(clock)
+    open_breaker(res)
+    clock.now = 10.0
+    with pytest.raises(DeadlineExceeded):
+        res.call("svc", lambda: "ok", deadline=Deadline(0, clock=clock))
+    assert res.call("svc", lambda: "ok") == "ok"
+    assert res.breaker("svc").state == "closed"
+
+
+def test_no_retry_exception_releases_trial_slot():
+    clock = FakeClock()
+    res = make_resilience(clock)
+    open_breaker(res)
+    clock.now = 10.0
+
+    def skip():
+        raise Skip()
+
+    with pytest.raises(Skip):
+        res.call("svc", skip, no_retry=(Skip,))
+    assert res.breaker("svc").state == "half_open"
+    assert res.call("svc", lambda: "ok") == "ok"
+    assert res.breaker("svc").state == "closed"
+
+
+def test_no_retry_exception_is_not_counted_as_failure():
+    clock = FakeClock()
+    res = make_resilience(clock, failure_threshold=1)
+
+    def skip():
+        raise Skip()
+
+    for _ in range(3):
+        with pytest.raises(Skip):
+            res.call("svc", skip, no_retry=(Skip,))
+    assert res.breaker("svc").state == "closed"
+
+
+def test_none_result_retries_then_falls_back_to_last_good():
+    clock = FakeClock()
+    res = make_resilience(clock, attempts=2, failure_threshold=5, max_stale=60)
+    assert res.call("svc", lambda: "fresh") == "fresh"
+    calls = []
+
+    def empty():
+        calls.append(1)
+        return None
+
+    clock.now = 30.0
+    assert res.call("svc", empty) == "fresh"
+    assert len(calls) == 2
+    clock.now = 100.0
+    with pytest.raises(ValueError):
+        res.call("svc", empty)
@@ -0,0 +1,87 @@
+"""
+토큰 계산
+
+tiktoken 인코더는 프로세스 전체에서 한 번만 만들고, 텍스트 단위로 토큰 수를
+메모이즈한다. strategy.txt가 포함된 고정 시스템 프롬프트는 첫 사이클에서만
+인코딩되고 이후에는 캐시에서 바로 반환된다.
+
+인코딩 파일을 내려받을 수 없는 오프라인 환경(모의 서비스 벤치마크, CI)에서는
+TIKTOKEN_CACHE_DIR에 미리 받아 둔 파일을 사용하거나, TOKEN_COUNT_MODE=estimate로
+글자 수 기반 추정을 명시적으로 켠다. 그 외에는 인코더를 만들지 못하면 예외를 던지고
+다음 호출에서 다시 시도한다 (토큰 예산이 추정값으로 조용히 바뀌지 않도록).
+"""
+
+import logging
+import os
+import threading
+from functools import lru_cache
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+TOKEN_MODEL = "gpt-4"
+
+# 메시지 하나당 포맷 오버헤드 ({"role": role, "content": content})
+TOKENS_PER_MESSAGE = 4
+
+# 인코더를 사용할 수 없을 때의 토큰당 평균 글자 수
+CHARS_PER_TOKEN = 4
+
+
+# 만들어진 인코더만 저장한다 (실패는 저장하지 않는다)
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def estimate_mode():
+    return os.getenv("TOKEN_COUNT_MODE", "tiktoken").lower() == "estimate"
+
+
+def get_encoding(model=TOKEN_MODEL):
+    """인코더. TOKEN_COUNT_MODE=estimate면 None"""
+    if estimate_mode():
+        return None
+    with _encodings_lock:
+        if model not in _encodings:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        return _encodings[model]
+
+
+@lru_cache(maxsize=256)
+def count_text_tokens(text):
+    """
+    Count tokens for a single prompt fragment.
+    """
+    encoding = get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def _content_texts(content):
+    if isinstance(content, str):
+        yield content
+    elif isinstance(content, list):
+        for content_item in content:
+            if content_item["type"] == "text":
+                yield content_item["text"]
+            # Add handling for other content types if needed
+
+
+def count_tokens(messages):
+    """
+    Count tokens for the messages to be sent to the GPT-4 API.
+    """
+    num_tokens = 0
+    for message in messages:
+        num_tokens += TOKENS_PER_MESSAGE
+        num_tokens += count_text_tokens(message["role"])
+        for text in _content_texts(message["content"]):
+            num_tokens += count_text_tokens(text)
+    return num_tokens
+
+
+def token_cache_stats():
+    info = count_text_tokens.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
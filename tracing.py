@@ -0,0 +1,231 @@
+"""
+거래 사이클 추적
+
+ai_trading() 한 번의 단계별 소요 시간(잔고/데이터 소스별 조회, 지표, 프롬프트
+생성, 토큰 계산, LLM 호출, 주문, DB 기록)과 LLM 토큰 사용량을 CycleTrace에 모아
+cycle_traces 테이블에 한 행으로 저장한다.
+
+저장된 추적은 Prometheus 텍스트 형식으로 내보낼 수 있다.
+PROMETHEUS_TEXTFILE 환경 변수를 지정하면 사이클마다 해당 파일을 갱신한다
+(node_exporter textfile collector용). `python tracing.py`는 표준 출력으로 출력한다.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "trading_history.db"
+METRIC_PREFIX = "gptbitcoin"
+# Prometheus 내보내기에 사용하는 최근 사이클 수
+EXPORT_WINDOW = 200
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def init_tracing(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS cycle_traces
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  ticker TEXT,
+                  trigger TEXT,
+                  started_at TEXT,
+                  ts INTEGER,
+                  status TEXT,
+                  total_ms REAL,
+                  stages TEXT,
+                  prompt_tokens INTEGER,
+                  completion_tokens INTEGER,
+                  total_tokens INTEGER)"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cycle_traces_ts ON cycle_traces (ts)")
+    conn.commit()
+
+
+class CycleTrace:
+    """한 마켓의 한 사이클. 여러 스레드에서 단계를 기록할 수 있다."""
+
+    def __init__(self, ticker, trigger="schedule"):
+        self.ticker = ticker
+        self.trigger = trigger
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = {}  # 단계 이름 -> ms (같은 이름은 합산)
+        self.usage = {}  # LLM 호출 이름 -> {prompt_tokens, completion_tokens, total_tokens}
+        self.status = "ok"
+        self.total_ms = None
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds * 1000
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def timed(self, name, fn):
+        """fn을 호출할 때마다 소요 시간을 name 단계에 더하는 함수를 반환"""
+
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    def add_usage(self, name, usage):
+        """chat completion 응답의 usage를 기록"""
+        if usage is None:
+            return
+        with self._lock:
+            self.usage[name] = {
+                "prompt_tokens": usage.prompt_tokens or 0,
+                "completion_tokens": usage.completion_tokens or 0,
+                "total_tokens": usage.total_tokens or 0,
+            }
+
+    def finish(self, status=None):
+        if status is not None:
+            self.status = status
+        self.total_ms = (time.perf_counter() - self._started) * 1000
+        return self
+
+    def tokens(self, key):
+        return sum(usage[key] for usage in self.usage.values())
+
+    def summary(self):
+        stages = ", ".join(f"{name}={ms:.0f}ms" for name, ms in self.stages.items())
+        return f"[{self.ticker}] cycle {self.status} in {self.total_ms:.0f}ms ({stages})"
+
+
+def save_trace(conn, trace):
+    conn.execute(
+        """INSERT INTO cycle_traces
+                 (ticker, trigger, started_at, ts, status, total_ms, stages, prompt_tokens, completion_tokens, total_tokens)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            trace.ticker,
+            trace.trigger,
+            datetime.fromtimestamp(trace.started_at).isoformat(),
+            int(trace.started_at),
+            trace.status,
+            trace.total_ms,
+            json.dumps({"stages": trace.stages, "usage": trace.usage}),
+            trace.tokens("prompt_tokens"),
+            trace.tokens("completion_tokens"),
+            trace.tokens("total_tokens"),
+        ),
+    )
+
+
+def load_traces(conn, limit=EXPORT_WINDOW):
+    """최근 추적을 [{ticker, status, total_ms, stages, usage, ...}] 형태로 반환 (최신순)"""
+    rows = conn.execute(
+        """SELECT id, ticker, trigger, started_at, status, total_ms, stages,
+                  prompt_tokens, completion_tokens, total_tokens
+           FROM cycle_traces ORDER BY id DESC LIMIT ?""",
+        (limit,),
+    ).fetchall()
+    traces = []
+    for row in rows:
+        detail = json.loads(row[6])
+        traces.append(
+            {
+                "id": row[0],
+                "ticker": row[1],
+                "trigger": row[2],
+                "started_at": row[3],
+                "status": row[4],
+                "total_ms": row[5],
+                "stages": detail.get("stages", {}),
+                "usage": detail.get("usage", {}),
+                "prompt_tokens": row[7],
+                "completion_tokens": row[8],
+                "total_tokens": row[9],
+            }
+        )
+    return traces
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _summary(lines, name, labels, values):
+    label_text = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    for q in QUANTILES:
+        sep = "," if label_text else ""
+        lines.append(f'{name}{{{label_text}{sep}quantile="{q}"}} {np.quantile(values, q):.6f}')
+    suffix = f"{{{label_text}}}" if label_text else ""
+    lines.append(f"{name}_sum{suffix} {float(np.sum(values)):.6f}")
+    lines.append(f"{name}_count{suffix} {len(values)}")
+
+
+def render_prometheus(traces):
+    """추적 목록을 Prometheus 텍스트 형식으로 변환 (지연 시간은 초 단위)"""
+    lines = []
+    name = f"{METRIC_PREFIX}_cycle_seconds"
+    lines += [f"# HELP {name} Trading cycle latency.", f"# TYPE {name} summary"]
+    for ticker in sorted({t["ticker"] for t in traces}):
+        values = [t["total_ms"] / 1000 for t in traces if t["ticker"] == ticker and t["total_ms"] is not None]
+        if values:
+            _summary(lines, name, {"ticker": ticker}, values)
+
+    name = f"{METRIC_PREFIX}_cycle_stage_seconds"
+    lines += [f"# HELP {name} Latency of each trading cycle stage.", f"# TYPE {name} summary"]
+    stage_values = {}
+    for trace in traces:
+        for stage, ms in trace["stages"].items():
+            stage_values.setdefault(stage, []).append(ms / 1000)
+    for stage in sorted(stage_values):
+        _summary(lines, name, {"stage": stage}, stage_values[stage])
+
+    name = f"{METRIC_PREFIX}_cycles"
+    lines += [f"# HELP {name} Traced cycles in the export window by status.", f"# TYPE {name} gauge"]
+    statuses = {}
+    for trace in traces:
+        statuses[trace["status"]] = statuses.get(trace["status"], 0) + 1
+    for status in sorted(statuses):
+        lines.append(f'{name}{{status="{_escape(status)}"}} {statuses[status]}')
+
+    name = f"{METRIC_PREFIX}_llm_tokens"
+    lines += [f"# HELP {name} LLM tokens used in the export window.", f"# TYPE {name} gauge"]
+    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        lines.append(f'{name}{{type="{key}"}} {sum(t[key] or 0 for t in traces)}')
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(conn, path):
+    """Prometheus textfile collector가 읽을 파일을 원자적으로 갱신"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus(load_traces(conn)))
+    os.replace(tmp_path, path)
+
+
+def export_trace(conn, trace):
+    """추적을 저장하고, 설정되어 있으면 Prometheus 파일을 갱신한다."""
+    save_trace(conn, trace)
+    conn.commit()
+    path = os.getenv("PROMETHEUS_TEXTFILE")
+    if path:
+        try:
+            write_textfile(conn, path)
+        except OSError as e:
+            logger.warning(f"Failed to write Prometheus metrics to {path}: {e}")
+
+
+if __name__ == "__main__":
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    print(render_prometheus(load_traces(conn)), end="")
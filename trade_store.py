@@ -0,0 +1,137 @@
+"""
+거래 기록 저장소 (SQLite)
+
+- WAL 모드: 대시보드가 읽는 동안에도 봇의 쓰기가 막히지 않는다
+- 프로세스 전체에서 하나의 연결을 재사용한다. sqlite3 모듈은 연결마다
+  컴파일된 문장을 캐시하므로 같은 쿼리는 다시 파싱하지 않는다
+- PRAGMA user_version 기반 마이그레이션으로 기존 trading_history.db를 갱신한다
+- timestamp(ISO 문자열) 외에 정수 epoch 컬럼 ts를 두고 (ticker, ts)에 인덱스를 건다
+"""
+
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "trading_history.db"
+BUSY_TIMEOUT_MS = 5000
+
+
+def _create_tables(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS trades
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  timestamp TEXT,
+                  decision TEXT,
+                  percentage INTEGER,
+                  reason TEXT,
+                  btc_balance REAL,
+                  krw_balance REAL,
+                  btc_avg_buy_price REAL,
+                  btc_krw_price REAL,
+                  reflection TEXT)"""
+    )
+    # 직전 거래 id 기준으로 미리 계산해 둔 반성 내용
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS reflections
+                 (trade_id INTEGER PRIMARY KEY,
+                  reflection TEXT,
+                  created_at TEXT)"""
+    )
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _add_ticker(conn):
+    # 멀티 마켓 지원 이전 DB에는 ticker 컬럼이 없다.
+    # btc_* 컬럼은 해당 행의 ticker 기준 코인 잔고/평단가/가격을 의미한다.
+    if "ticker" not in _columns(conn, "trades"):
+        conn.execute("ALTER TABLE trades ADD COLUMN ticker TEXT NOT NULL DEFAULT 'KRW-BTC'")
+
+
+def backfill_ts(conn):
+    """ts가 비어 있는 행을 timestamp(로컬 시간 ISO 문자열)로 채운다"""
+    conn.execute(
+        "UPDATE trades SET ts = CAST(strftime('%s', timestamp, 'utc') AS INTEGER) WHERE ts IS NULL"
+    )
+
+
+def _add_ts(conn):
+    if "ts" not in _columns(conn, "trades"):
+        conn.execute("ALTER TABLE trades ADD COLUMN ts INTEGER")
+    backfill_ts(conn)
+
+
+def _add_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_ticker_ts ON trades (ticker, ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_ts ON trades (ts)")
+
+
+# 순서대로 적용되며 적용된 개수가 user_version에 기록된다. 항목은 추가만 한다.
+MIGRATIONS = [_create_tables, _add_ticker, _add_ts, _add_indexes]
+
+
+def migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with conn:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+        logger.info(f"Applied trade store migration {number} ({migration.__name__})")
+    return conn
+
+
+def connect(db_path=DB_PATH, readonly=False):
+    """WAL/동기화/대기 시간이 설정된 연결. readonly면 쓰기 잠금을 잡지 않는다."""
+    if readonly:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+
+class TradeStore:
+    """
+    여러 스레드(마켓 워커, 반성 미리 계산)가 공유하는 단일 연결
+
+    connection()은 잠금을 잡은 채 연결을 넘기고, 블록이 끝나면 커밋한다.
+    """
+
+    def __init__(self, path=DB_PATH, setup=None):
+        self.path = path
+        self._setup = setup
+        self._lock = threading.RLock()
+        self._conn = None
+
+    def open(self):
+        with self._lock:
+            if self._conn is None:
+                if self._setup is not None:
+                    self._conn = self._setup(self.path)
+                else:
+                    self._conn = migrate(connect(self.path))
+            return self._conn
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            conn = self.open()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None